@@ -0,0 +1,347 @@
+# -*- coding: utf-8 -*-
+"""
+/***************************************************************************
+ GeodesicDensifier
+                                 A QGIS plugin
+ Adds vertices to geometry along geodesic lines
+                              -------------------
+        copyright            : (C) 2018 by Jonah Sullivan
+        email                : jonah.sullivan@ga.gov.au
+ ***************************************************************************/
+
+/***************************************************************************
+ *                                                                         *
+ *   This program is free software; you can redistribute it and/or modify  *
+ *   it under the terms of the Apache 2.0 License.                         *
+ *                                                                         *
+ ***************************************************************************/
+
+ Geodesic backends.  The densification engine only needs three operations:
+ the inverse problem for each segment, a line from the segment start and the
+ positions of the waypoints along that line.  Each backend provides them on
+ top of a different library.
+"""
+from array import array
+import importlib
+import math
+import os
+import sys
+
+PLUGIN_DIR = os.path.dirname(os.path.abspath(__file__))
+
+
+class GeodesicBackend:
+    """Interface of a geodesic backend.
+
+    :param a: Equatorial radius of the ellipsoid in metres.
+    :type a: float
+
+    :param f: Flattening of the ellipsoid.
+    :type f: float
+    """
+
+    # name used to select the backend in the settings
+    name = None
+
+    def __init__(self, a, f):
+        self.a = float(a)
+        self.f = float(f)
+
+    @classmethod
+    def available(cls):
+        """ True when the libraries the backend needs can be imported """
+        return True
+
+    def inverse(self, lat1, lon1, lat2, lon2):
+        """Solve the inverse problem between two points in degrees.
+
+        :returns: The distance in metres and the azimuth at the first point.
+        :rtype: (float, float)
+        """
+        raise NotImplementedError
+
+    def line(self, lat1, lon1, azi1):
+        """ return an object describing the geodesic from a point along an azimuth """
+        raise NotImplementedError
+
+    def positions(self, line, step, first, count):
+        """Compute points along a line at distances step * k.
+
+        :param line: A line returned by :meth:`line`.
+
+        :param step: Distance between the points in metres.
+        :type step: float
+
+        :param first: Multiple of *step* of the first point.
+        :type first: int
+
+        :param count: Number of points.
+        :type count: int
+
+        :returns: Interleaved lon, lat values in degrees.  Longitudes are
+            unrolled, so they are continuous along the line.
+        :rtype: array('d')
+        """
+        raise NotImplementedError
+
+
+class GeographiclibBackend(GeodesicBackend):
+    """Backend over a geographiclib Geodesic.
+
+    :param geod: An existing Geodesic to use, otherwise one is created
+        from *a* and *f* with :meth:`geodesic_class`.
+    :type geod: geographiclib.geodesic.Geodesic
+    """
+
+    name = 'geographiclib'
+
+    def __init__(self, a, f, geod=None):
+        GeodesicBackend.__init__(self, a, f)
+        self.geod = geod if geod is not None else self.geodesic_class()(a, f)
+        # the bundled geographiclib returns tuples instead of dicts, a system
+        # copy may not have these methods
+        self._tuples = hasattr(self.geod, 'InverseTuple')
+        self._inverse_mask = self.geod.AZIMUTH | self.geod.DISTANCE
+        self._line_caps = self.geod.LATITUDE | self.geod.LONGITUDE | self.geod.DISTANCE_IN
+        self._position_mask = self.geod.LATITUDE | self.geod.LONGITUDE | self.geod.LONG_UNROLL
+
+    @classmethod
+    def geodesic_class(cls):
+        """ the geographiclib Geodesic class used by the backend """
+        from geographiclib.geodesic import Geodesic
+        return Geodesic
+
+    def inverse(self, lat1, lon1, lat2, lon2):
+        if self._tuples:
+            _, s12, azi1, _ = self.geod.InverseTuple(lat1, lon1, lat2, lon2, self._inverse_mask)
+            return s12, azi1
+        g = self.geod.Inverse(lat1, lon1, lat2, lon2, self._inverse_mask)
+        return g['s12'], g['azi1']
+
+    def line(self, lat1, lon1, azi1):
+        return self.geod.Line(lat1, lon1, azi1, self._line_caps)
+
+    def positions(self, line, step, first, count):
+        xy = array('d')
+        mask = self._position_mask
+        if self._tuples:
+            for k in range(first, first + count):
+                _, lat, lon = line.PositionTuple(step * k, mask)
+                xy.append(lon)
+                xy.append(lat)
+        else:
+            for k in range(first, first + count):
+                g = line.Position(step * k, mask)
+                xy.append(g['lon2'])
+                xy.append(g['lat2'])
+        return xy
+
+
+class SystemBackend(GeographiclibBackend):
+    """geographiclib installed in the Python environment of QGIS."""
+
+    name = 'system'
+
+    @classmethod
+    def available(cls):
+        try:
+            import geographiclib
+        except ImportError:
+            return False
+        return not is_bundled(geographiclib)
+
+
+class BundledBackend(GeographiclibBackend):
+    """The pure Python geographiclib shipped with the plugin."""
+
+    name = 'bundled'
+
+    @classmethod
+    def geodesic_class(cls):
+        return bundled_geodesic()
+
+
+class NumpyBackend(GeographiclibBackend):
+    """Bundled geographiclib with the waypoints of a line computed in one
+    NumPy batch.
+
+    The batch evaluates the series of a GeodesicLine for an array of
+    distances at once, following GeodesicLine._GenPosition, so it relies
+    on the internals of the bundled copy.
+    """
+
+    name = 'numpy'
+
+    @classmethod
+    def available(cls):
+        try:
+            import numpy
+        except ImportError:
+            return False
+        return True
+
+    @classmethod
+    def geodesic_class(cls):
+        return bundled_geodesic()
+
+    def __init__(self, a, f, geod=None):
+        GeographiclibBackend.__init__(self, a, f, geod)
+        import numpy
+        self._numpy = numpy
+        self._series = self.geodesic_class()._SinCosSeries
+
+    def positions(self, line, step, first, count):
+        np = self._numpy
+        series = self._series
+        s12 = step * np.arange(first, first + count, dtype=float)
+        tau12 = s12 / (line._b * (1 + line._A1m1))
+        s = np.sin(tau12)
+        c = np.cos(tau12)
+        B12 = - series(True, line._stau1 * c + line._ctau1 * s, line._ctau1 * c - line._stau1 * s, line._C1pa)
+        sig12 = tau12 - (B12 - line._B11)
+        ssig12 = np.sin(sig12)
+        csig12 = np.cos(sig12)
+        if abs(line.f) > 0.01:
+            # one Newton iteration, as in GeodesicLine._GenPosition
+            ssig2 = line._ssig1 * csig12 + line._csig1 * ssig12
+            csig2 = line._csig1 * csig12 - line._ssig1 * ssig12
+            B12 = series(True, ssig2, csig2, line._C1a)
+            serr = (1 + line._A1m1) * (sig12 + (B12 - line._B11)) - s12 / line._b
+            sig12 = sig12 - serr / np.sqrt(1 + line._k2 * ssig2 ** 2)
+            ssig12 = np.sin(sig12)
+            csig12 = np.cos(sig12)
+        ssig2 = line._ssig1 * csig12 + line._csig1 * ssig12
+        csig2 = line._csig1 * csig12 - line._ssig1 * ssig12
+        sbet2 = line._calp0 * ssig2
+        cbet2 = np.hypot(line._salp0, line._calp0 * csig2)
+        degenerate = cbet2 == 0
+        if degenerate.any():
+            cbet2[degenerate] = csig2[degenerate] = self.geod.tiny_
+        somg2 = line._salp0 * ssig2
+        E = math.copysign(1, line._salp0)
+        omg12 = E * (sig12
+                     - (np.arctan2(ssig2, csig2) - math.atan2(line._ssig1, line._csig1))
+                     + (np.arctan2(E * somg2, csig2) - math.atan2(E * line._somg1, line._comg1)))
+        lam12 = omg12 + line._A3c * (sig12 + (series(True, ssig2, csig2, line._C3a) - line._B31))
+        xy = np.empty(2 * count)
+        xy[0::2] = line.lon1 + np.degrees(lam12)
+        xy[1::2] = np.degrees(np.arctan2(sbet2, line._f1 * cbet2))
+        return array('d', xy.tobytes())
+
+
+class PyprojBackend(GeodesicBackend):
+    """pyproj's Geod, which wraps the C version of geographiclib."""
+
+    name = 'pyproj'
+
+    @classmethod
+    def available(cls):
+        try:
+            import pyproj
+        except ImportError:
+            return False
+        return True
+
+    def __init__(self, a, f):
+        GeodesicBackend.__init__(self, a, f)
+        from pyproj import Geod
+        self.geod = Geod(a=a, f=f)
+
+    def inverse(self, lat1, lon1, lat2, lon2):
+        azi1, _, s12 = self.geod.inv(lon1, lat1, lon2, lat2)
+        return s12, azi1
+
+    def line(self, lat1, lon1, azi1):
+        return lat1, lon1, azi1
+
+    def positions(self, line, step, first, count):
+        lat1, lon1, azi1 = line
+        lons, lats, _ = self.geod.fwd([lon1] * count, [lat1] * count, [azi1] * count,
+                                      [step * k for k in range(first, first + count)])
+        xy = array('d')
+        # pyproj reduces longitudes to [-180, 180], unroll them from the start
+        previous = lon1
+        for lon, lat in zip(lons, lats):
+            previous += (lon - previous + 180) % 360 - 180
+            xy.append(previous)
+            xy.append(lat)
+        return xy
+
+
+# in the order 'auto' tries them
+BACKENDS = (SystemBackend, BundledBackend, NumpyBackend, PyprojBackend)
+
+
+def available_backends():
+    """ names of the backends that can be used in this environment """
+    return [backend.name for backend in BACKENDS if backend.available()]
+
+
+def make_backend(name, a, f):
+    """Create a backend by name.
+
+    :param name: One of the BACKENDS names, or 'auto' for the system
+        geographiclib when installed and the bundled copy otherwise.
+    :type name: str
+
+    :param a: Equatorial radius of the ellipsoid in metres.
+    :type a: float
+
+    :param f: Flattening of the ellipsoid.
+    :type f: float
+
+    :raises ValueError: If the backend is unknown or can't be imported.
+
+    :rtype: GeodesicBackend
+    """
+    if name == 'auto':
+        name = SystemBackend.name if SystemBackend.available() else BundledBackend.name
+    for backend in BACKENDS:
+        if backend.name == name:
+            if not backend.available():
+                raise ValueError("geodesic backend {} is not installed".format(name))
+            return backend(a, f)
+    raise ValueError("unknown geodesic backend {}".format(name))
+
+
+def is_bundled(module):
+    """ True when a geographiclib module is the copy shipped with the plugin """
+    path = os.path.abspath(module.__file__)
+    return path.startswith(os.path.join(PLUGIN_DIR, 'geographiclib') + os.sep)
+
+
+_bundled = None
+
+
+def bundled_geodesic():
+    """Return the Geodesic class of the geographiclib shipped with the plugin.
+
+    When a system geographiclib is imported under the same name, the
+    bundled package is imported with the plugin directory first on the
+    path, then the system modules are put back.  The bundled modules keep
+    references to each other, so they work after being taken out of
+    sys.modules.
+    """
+    global _bundled
+    if _bundled is None:
+        try:
+            from geographiclib import geodesic
+        except ImportError:
+            geodesic = None
+        if geodesic is not None and is_bundled(geodesic):
+            _bundled = geodesic.Geodesic
+        else:
+            system = {}
+            for module in list(sys.modules):
+                if module == 'geographiclib' or module.startswith('geographiclib.'):
+                    system[module] = sys.modules.pop(module)
+            sys.path.insert(0, PLUGIN_DIR)
+            try:
+                _bundled = importlib.import_module('geographiclib.geodesic').Geodesic
+            finally:
+                sys.path.remove(PLUGIN_DIR)
+                for module in list(sys.modules):
+                    if module == 'geographiclib' or module.startswith('geographiclib.'):
+                        del sys.modules[module]
+                sys.modules.update(system)
+    return _bundled
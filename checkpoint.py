@@ -0,0 +1,153 @@
+# -*- coding: utf-8 -*-
+"""
+/***************************************************************************
+ GeodesicDensifier
+                                 A QGIS plugin
+ Adds vertices to geometry along geodesic lines
+                              -------------------
+        copyright            : (C) 2018 by Jonah Sullivan
+        email                : jonah.sullivan@ga.gov.au
+ ***************************************************************************/
+
+/***************************************************************************
+ *                                                                         *
+ *   This program is free software; you can redistribute it and/or modify  *
+ *   it under the terms of the Apache 2.0 License.                         *
+ *                                                                         *
+ ***************************************************************************/
+
+ Checkpoints of long runs, so a run stopped by a crash can be resumed
+ instead of started over.
+"""
+import hashlib
+import json
+import os
+import re
+import time
+
+FORMAT = 'geodesic-densifier-checkpoint'
+VERSION = 1
+
+
+def fingerprint(values):
+    """ digest of JSON values, e.g. of a list of feature ids too long to keep """
+    return hashlib.sha1(json.dumps(values, sort_keys=True).encode('utf-8')).hexdigest()
+
+
+class Checkpoint:
+    """Progress of a run writing to a file, kept in a small JSON sidecar.
+
+    Input features are counted in the order they are read.  Once a
+    checkpoint is due, the caller commits the output and calls
+    :meth:`save`, so the sidecar never counts more than the output holds.
+    A run with the same parameters can then skip the features the sidecar
+    counts and append to the output.
+
+    :param path: The sidecar file.
+    :type path: str
+
+    :param parameters: JSON values describing the run: the input, the
+        densification settings and anything else that changes the output.
+    :type parameters: dict
+
+    :param output: The output file.
+    :type output: str
+
+    :param interval: Seconds between saves.
+    :type interval: float
+
+    :param max_pending: Input features between saves, so the output held
+        back until the next save stays small.
+    :type max_pending: int
+    """
+
+    def __init__(self, path, parameters, output=None, interval=60.0, max_pending=10000):
+        self.path = path
+        self.parameters = parameters
+        self.output = output
+        self.interval = interval
+        self.max_pending = max_pending
+        # input features completed, the id of the last one, output features and vertices
+        self.position = 0
+        self.fid = None
+        self.rows = 0
+        self.vertices = 0
+        self.pending = 0
+        self._saved = time.time()
+
+    @staticmethod
+    def sidecar_path(directory, name, parameters):
+        """ the sidecar of a run, named after the output layer and the parameters """
+        name = re.sub(r'[^A-Za-z0-9_.-]+', '_', name)
+        return os.path.join(directory, "{}_{}.checkpoint.json".format(name, fingerprint(parameters)[:12]))
+
+    @classmethod
+    def load(cls, path, parameters, interval=60.0):
+        """Read a sidecar written by :meth:`save`.
+
+        :returns: The checkpoint, or None when there is none or it was
+            written for other parameters.
+        :rtype: Checkpoint
+        """
+        try:
+            with open(path) as f:
+                data = json.load(f)
+        except (OSError, ValueError):
+            return None
+        # compare through JSON, so tuples and lists are equal
+        if (data.get('format') != FORMAT or data.get('version') != VERSION or
+                data.get('parameters') != json.loads(json.dumps(parameters))):
+            return None
+        checkpoint = cls(path, parameters, data['output'], interval)
+        checkpoint.position = data['position']
+        checkpoint.fid = data['fid']
+        checkpoint.rows = data['rows']
+        checkpoint.vertices = data['vertices']
+        return checkpoint
+
+    def done(self, position, fid):
+        """Record a completed input feature.
+
+        :param position: Index of the feature in the input order.
+        :type position: int
+
+        :param fid: Feature id.
+        :type fid: int
+
+        :returns: True when a save is due.
+        :rtype: bool
+        """
+        self.position = position + 1
+        self.fid = fid
+        self.pending += 1
+        return self.pending >= self.max_pending or time.time() - self._saved >= self.interval
+
+    def save(self, rows, vertices):
+        """Write the sidecar, replacing the previous one in one step.
+
+        :param rows: Features committed to the output.
+        :type rows: int
+
+        :param vertices: Vertices produced so far.
+        :type vertices: int
+        """
+        self.rows = rows
+        self.vertices = vertices
+        data = {'format': FORMAT, 'version': VERSION, 'parameters': self.parameters, 'output': self.output,
+                'position': self.position, 'fid': self.fid, 'rows': rows, 'vertices': vertices,
+                'saved': time.strftime("%Y-%m-%d %H:%M:%S")}
+        temporary = self.path + '.tmp'
+        with open(temporary, 'w') as f:
+            json.dump(data, f, indent=1)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(temporary, self.path)
+        self.pending = 0
+        self._saved = time.time()
+
+    def remove(self):
+        """ delete the sidecar once the run is complete """
+        try:
+            os.remove(self.path)
+        except OSError:
+            pass
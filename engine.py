@@ -0,0 +1,717 @@
+# -*- coding: utf-8 -*-
+"""
+/***************************************************************************
+ GeodesicDensifier
+                                 A QGIS plugin
+ Adds vertices to geometry along geodesic lines
+                              -------------------
+        copyright            : (C) 2018 by Jonah Sullivan
+        email                : jonah.sullivan@ga.gov.au
+ ***************************************************************************/
+
+/***************************************************************************
+ *                                                                         *
+ *   This program is free software; you can redistribute it and/or modify  *
+ *   it under the terms of the Apache 2.0 License.                         *
+ *                                                                         *
+ ***************************************************************************/
+
+ Densification engine.  This module has no QGIS dependency: it works on
+ sequences of (longitude, latitude) pairs in degrees and a geodesic backend,
+ so it can be used outside of the plugin.  The same holds for every module
+ but geodesic_densifier, its dialog and output.
+"""
+from array import array
+import math
+import os
+import sys
+import threading
+
+from .backends import GeodesicBackend, GeographiclibBackend
+from .spill import SpillBuffer
+
+# cost model used by the estimate, measured with the bundled geographiclib
+SEGMENT_SECONDS = 1.2e-4
+VERTEX_SECONDS = 1.5e-5
+# memory held by the output, per vertex, per feature and per attribute
+VERTEX_BYTES = 24
+FEATURE_BYTES = 128
+ATTRIBUTE_BYTES = 32
+
+# segments cached per block before they go into a SpillBuffer
+SEGMENT_BLOCK = 65536
+# approximate lengths scaled by this are longer than the geodesics, see
+# Densifier.approximate_length
+LENGTH_MARGIN = 1.01
+
+
+class VertexBudget:
+    """Caps on the number of vertices a densification run may produce.
+
+    :param segment_waypoints: Maximum number of waypoints inserted between
+        two input vertices.
+    :type segment_waypoints: int
+
+    :param feature_vertices: Maximum number of vertices in one output
+        feature, original vertices included.
+    :type feature_vertices: int
+
+    :param total_vertices: Maximum number of vertices written by the run.
+        Original vertices are always kept, so once the total is used up
+        features are copied without waypoints.
+    :type total_vertices: int
+    """
+
+    def __init__(self,
+                 segment_waypoints=100000,
+                 feature_vertices=1000000,
+                 total_vertices=10000000):
+        self.segment_waypoints = int(segment_waypoints)
+        self.feature_vertices = int(feature_vertices)
+        self.total_vertices = int(total_vertices)
+        # number of vertices produced so far
+        self.used = 0
+        # held while a feature is fitted and charged to the budget, so
+        # features densified on several threads don't overdraw it
+        self.lock = threading.Lock()
+
+    def remaining(self):
+        """ number of vertices the run may still produce """
+        return max(self.total_vertices - self.used, 0)
+
+
+class Estimate:
+    """Predicted size and cost of a densification run."""
+
+    def __init__(self):
+        self.features = 0
+        self.vertices = 0
+        self.segments = 0
+        self.bytes = 0
+        self.seconds = 0.0
+
+    def scale(self, factor):
+        """ scale a sample estimate up to the whole layer """
+        self.features = int(self.features * factor)
+        self.vertices = int(self.vertices * factor)
+        self.segments = int(self.segments * factor)
+        self.bytes = int(self.bytes * factor)
+        self.seconds *= factor
+
+    def summary(self):
+        """ short human readable description of the estimate """
+        return "~{:,} features, ~{:,} vertices, ~{:.1f} MB, ~{:.0f} s".format(
+            self.features, self.vertices, self.bytes / 1048576.0, self.seconds)
+
+
+class Plan:
+    """How the segments of a feature are densified, from
+    :meth:`Densifier.plan`.
+
+    :param azimuths: Azimuth at the first vertex of each segment, part
+        after part.
+    :type azimuths: buffer
+
+    :param lengths: Geodesic length of each segment.
+    :type lengths: buffer
+
+    :param waypoints: Waypoints inserted in each segment, within the caps.
+    :type waypoints: buffer
+
+    :param adapted: True when the caps cut the waypoints short.
+    :type adapted: bool
+    """
+
+    def __init__(self, azimuths, lengths, waypoints, adapted=False):
+        self.azimuths = azimuths
+        self.lengths = lengths
+        self.waypoints = waypoints
+        self.adapted = adapted
+
+    def take(self, ranges):
+        """ the plan of the segments in the (start, end) ranges, for a piece of the feature """
+        azimuths, lengths, waypoints = array('d'), array('d'), array('l')
+        for start, end in ranges:
+            azimuths.extend(self.azimuths[start:end])
+            lengths.extend(self.lengths[start:end])
+            waypoints.extend(self.waypoints[start:end])
+        return Plan(azimuths, lengths, waypoints)
+
+
+class Densifier:
+    """Insert waypoints along the geodesics joining consecutive vertices.
+
+    :param backend: The geodesic backend and ellipsoid to densify on.  A
+        geographiclib Geodesic is accepted as well.
+    :type backend: backends.GeodesicBackend
+
+    :param method: 'spacing' to insert a waypoint at least every *spacing*
+        metres, 'count' to split every segment into *count* pieces.
+    :type method: str
+
+    :param spacing: Maximum distance between output vertices in metres.
+    :type spacing: float
+
+    :param count: Number of pieces each segment is split into.
+    :type count: int
+
+    :param budget: Vertex caps for the run, defaults to VertexBudget().
+    :type budget: VertexBudget
+    """
+
+    def __init__(self, backend, method='spacing', spacing=900, count=10, budget=None):
+        if not isinstance(backend, GeodesicBackend):
+            backend = GeographiclibBackend(backend.a, backend.f, backend)
+        self.backend = backend
+        self.method = method
+        self.spacing = float(spacing)
+        self.count = int(count)
+        self.budget = budget if budget is not None else VertexBudget()
+        # ids of the features whose spacing was widened to fit the budget
+        self.adapted = []
+        # vertices asked from the backend per positions() call by
+        # densify_array, see tuning.autotune
+        self.chunk_size = 65536
+        # spill.MemoryBudget of the segment caches and densified features,
+        # None to keep them in memory whatever their size
+        self.memory_budget = None
+
+    def waypoint_count(self, length, capped=True):
+        """ number of waypoints to insert in a segment of the given length, within segment_waypoints when capped """
+        if length <= 0:
+            return 0
+        if self.method == 'count':
+            n = self.count - 1
+        else:
+            n = int(math.ceil(length / self.spacing)) - 1
+        if capped:
+            n = min(n, self.budget.segment_waypoints)
+        return max(n, 0)
+
+    def approximate_length(self, lon1, lat1, lon2, lat2):
+        """ great circle length on the mean sphere, within 0.5% of the geodesic """
+        radius = self.backend.a * (1 - self.backend.f / 3)
+        phi1 = math.radians(lat1)
+        phi2 = math.radians(lat2)
+        h = (math.sin((phi2 - phi1) / 2) ** 2 +
+             math.cos(phi1) * math.cos(phi2) * math.sin(math.radians(lon2 - lon1) / 2) ** 2)
+        return 2 * radius * math.asin(min(1.0, math.sqrt(h)))
+
+    def estimate(self, features, field_count=0, point_mode=False):
+        """Predict the output of a run without solving any geodesics.
+
+        :param features: Iterable with the parts of each feature, as for
+            :meth:`densify`.  In point mode each feature is a single point
+            and consecutive points are joined.
+        :type features: iterable
+
+        :param field_count: Number of attributes of each output feature.
+        :type field_count: int
+
+        :param point_mode: True when every output vertex is a feature.
+        :type point_mode: bool
+
+        :rtype: Estimate
+        """
+        return self.estimate_arrays((pack_parts(parts) for parts in features), field_count, point_mode)
+
+    def estimate_arrays(self, features, field_count=0, point_mode=False):
+        """Predict the output of a run as :meth:`estimate` does, from the
+        coordinates of each feature in flat buffers.
+
+        :param features: Iterable of (xy, offsets), as for
+            :meth:`densify_array` and returned by :func:`wkb.read_wkb`.
+        :type features: iterable
+
+        :rtype: Estimate
+        """
+        estimate = Estimate()
+        budget = self.budget
+        originals = 0
+        previous = None
+        for xy, offsets in features:
+            xy = as_doubles(xy)
+            if offsets is None:
+                offsets = (0, len(xy) // 2)
+            estimate.features += 1
+            if point_mode:
+                point = array('d', xy[2 * offsets[0]:2 * offsets[0] + 2])
+                if previous is not None:
+                    xy, offsets = previous + point, (0, 2)
+                else:
+                    xy, offsets = point, (0, 0)
+                previous = point
+            vertices = offsets[-1] - offsets[0]
+            segment_waypoints = self.segment_waypoints(xy, offsets)
+            estimate.segments += len(segment_waypoints)
+            waypoints = min(sum(segment_waypoints), max(budget.feature_vertices - vertices, 0))
+            originals += vertices
+            estimate.vertices += vertices + waypoints
+            if point_mode:
+                estimate.features += waypoints
+        # original vertices are kept even when the run total is used up
+        estimate.vertices = min(estimate.vertices, max(budget.total_vertices, originals))
+        estimate.bytes = (estimate.vertices * VERTEX_BYTES +
+                          estimate.features * (FEATURE_BYTES + field_count * ATTRIBUTE_BYTES))
+        estimate.seconds = estimate.segments * SEGMENT_SECONDS + estimate.vertices * VERTEX_SECONDS
+        return estimate
+
+    def segment_costs(self, xy, offsets=None):
+        """Predict the seconds taken by each segment of a feature.
+
+        Uses the cost model of :meth:`estimate`, with approximate lengths,
+        so it is cheap enough to run before scheduling the work.
+
+        :param xy: Interleaved lon, lat values in degrees, as for
+            :meth:`densify_array`.
+        :type xy: buffer
+
+        :param offsets: Part offsets, as for :meth:`densify_array`.
+        :type offsets: sequence of int
+
+        :returns: The cost of each segment, part after part.
+        :rtype: array('d')
+        """
+        return array('d', (SEGMENT_SECONDS + waypoints * VERTEX_SECONDS
+                           for waypoints in self.segment_waypoints(xy, offsets)))
+
+    def segment_waypoints(self, xy, offsets=None, margin=1.0):
+        """Predict the waypoints of each segment of a feature from
+        approximate lengths.
+
+        :param xy: Interleaved lon, lat values in degrees, as for
+            :meth:`densify_array`.
+        :type xy: buffer
+
+        :param offsets: Part offsets, as for :meth:`densify_array`.
+        :type offsets: sequence of int
+
+        :param margin: Factor applied to the lengths; LENGTH_MARGIN gives
+            at least the waypoints :meth:`stream` inserts.
+        :type margin: float
+
+        :returns: The waypoints of each segment, part after part.
+        :rtype: array('l')
+        """
+        xy = as_doubles(xy)
+        if offsets is None:
+            offsets = (0, len(xy) // 2)
+        waypoints = array('l')
+        for p in range(len(offsets) - 1):
+            for j in range(2 * offsets[p] + 2, 2 * offsets[p + 1], 2):
+                waypoints.append(self.waypoint_count(
+                    margin * self.approximate_length(xy[j - 2], xy[j - 1], xy[j], xy[j + 1])))
+        return waypoints
+
+    def vertex_bound(self, xy, offsets=None):
+        """Most vertices :meth:`densify_array` can produce for a feature,
+        within the caps, whatever the budget left.
+
+        :rtype: int
+        """
+        if offsets is None:
+            offsets = (0, len(as_doubles(xy)) // 2)
+        vertices = offsets[-1] - offsets[0]
+        waypoints = sum(self.segment_waypoints(xy, offsets, LENGTH_MARGIN))
+        # the original vertices are kept whatever the caps
+        return vertices + min(waypoints, max(self.budget.feature_vertices - vertices, 0))
+
+    def _fit(self, lengths, waypoints, allowed):
+        """ reduce the waypoint counts so their sum does not exceed allowed """
+        if allowed <= 0:
+            return array('l', [0] * len(waypoints))
+        if self.method == 'count':
+            per_segment = allowed // len(waypoints)
+            return array('l', [min(n, per_segment) for n in waypoints])
+        # with spacing = total / allowed every segment gets fewer than
+        # length / spacing waypoints, so the sum stays below allowed
+        spacing = sum(lengths) / allowed
+        return array('l', [min(n, max(int(math.ceil(s / spacing)) - 1, 0))
+                           for n, s in zip(waypoints, lengths)])
+
+    def densify(self, parts, fid=None):
+        """Densify the parts (lines or rings) of one feature.
+
+        :param parts: Sequences of (lon, lat) vertices in degrees.
+        :type parts: list
+
+        :param fid: Feature id used when reporting budget adaptations.
+
+        :returns: A list with one list of (lon, lat) tuples per input part.
+        :rtype: list
+        """
+        return unpack_parts(*self.densify_array(*pack_parts(parts), fid=fid))
+
+    def densify_array(self, xy, offsets=None, fid=None, plan=None):
+        """Densify the parts of one feature held in flat coordinate buffers.
+
+        Each vertex takes 16 bytes instead of a Python object, and callers
+        can pass an array('d'), a memoryview or any other buffer of doubles
+        without converting it.
+
+        :param xy: Interleaved lon, lat values in degrees.
+        :type xy: buffer
+
+        :param offsets: Index of the first vertex of each part, followed by
+            the number of vertices, e.g. [0, 4, 9] for parts of 4 and 5
+            vertices.  None when *xy* holds a single part.
+        :type offsets: sequence of int
+
+        :param fid: Feature id used when reporting budget adaptations.
+
+        :param plan: Plan of the segments, already charged to the budget,
+            as :func:`scheduler.cut_feature` gives the pieces of a feature
+            planned whole.  None to plan them here.
+        :type plan: Plan
+
+        :returns: Densified coordinates and part offsets in the same layout.
+            The coordinates are a memoryview over a temporary file when
+            they spilled out of :attr:`memory_budget`.
+        :rtype: (array('d'), array('q'))
+        """
+        counts = [0] * (len(offsets) - 1 if offsets is not None else 1)
+        dense = SpillBuffer('d', self.memory_budget)
+        for p, chunk in self.stream(xy, offsets, fid, self.chunk_size, plan):
+            dense.extend(chunk)
+            counts[p] += len(chunk) // 2
+        dense_offsets = array('q', [0])
+        for count in counts:
+            dense_offsets.append(dense_offsets[-1] + count)
+        return dense.result(), dense_offsets
+
+    def plan(self, xy, offsets=None):
+        """Solve the segments of a feature and fit its waypoints within
+        the caps.
+
+        The vertices and waypoints of the feature are charged to the
+        budget.  Recording the feature in :attr:`adapted` is left to the
+        caller, which knows whether this is the whole feature.
+
+        :param xy: Interleaved lon, lat values in degrees, as for
+            :meth:`densify_array`.
+        :type xy: buffer
+
+        :param offsets: Part offsets, as for :meth:`densify_array`.
+        :type offsets: sequence of int
+
+        :rtype: Plan
+        """
+        xy = as_doubles(xy)
+        if offsets is None:
+            offsets = (0, len(xy) // 2)
+        backend = self.backend
+        azimuths = SpillBuffer('d', self.memory_budget)
+        lengths = SpillBuffer('d', self.memory_budget)
+        block_azimuths = array('d')
+        block_lengths = array('d')
+        for p in range(len(offsets) - 1):
+            for j in range(2 * offsets[p] + 2, 2 * offsets[p + 1], 2):
+                s12, azi1 = backend.inverse(xy[j - 1], xy[j - 2], xy[j + 1], xy[j])
+                block_azimuths.append(azi1)
+                block_lengths.append(s12)
+                if len(block_lengths) >= SEGMENT_BLOCK:
+                    azimuths.extend(block_azimuths)
+                    lengths.extend(block_lengths)
+                    block_azimuths = array('d')
+                    block_lengths = array('d')
+        azimuths.extend(block_azimuths)
+        lengths.extend(block_lengths)
+        azimuths = azimuths.result()
+        lengths = lengths.result()
+
+        vertices_in = offsets[-1] - offsets[0]
+        waypoints = SpillBuffer('l', self.memory_budget)
+        for start in range(0, len(lengths), SEGMENT_BLOCK):
+            waypoints.extend(array('l', [self.waypoint_count(s) for s in lengths[start:start + SEGMENT_BLOCK]]))
+        waypoints = waypoints.result()
+        # the count grows with the length, so the longest segment tells
+        # whether segment_waypoints cut any of them short
+        adapted = len(lengths) > 0 and (self.waypoint_count(max(lengths), False) >
+                                        self.budget.segment_waypoints)
+        with self.budget.lock:
+            allowed = min(self.budget.feature_vertices, self.budget.remaining()) - vertices_in
+            if sum(waypoints) > allowed:
+                waypoints = self._fit(lengths, waypoints, allowed)
+                adapted = True
+            self.budget.used += vertices_in + sum(waypoints)
+        return Plan(azimuths, lengths, waypoints, adapted)
+
+    def stream(self, xy, offsets=None, fid=None, chunk_size=4096, plan=None):
+        """Densify one feature, yielding its vertices in bounded chunks.
+
+        Only the azimuth and length of each segment are held for the whole
+        feature, so peak memory does not grow with segment length and the
+        output can be written out as it is produced; with a
+        :attr:`memory_budget` even these spill to a file for huge features.
+        The vertices of the feature are charged to the budget before the
+        first chunk, by :meth:`plan`.
+
+        :param xy: Interleaved lon, lat values in degrees, as for
+            :meth:`densify_array`.
+        :type xy: buffer
+
+        :param offsets: Part offsets, as for :meth:`densify_array`.
+        :type offsets: sequence of int
+
+        :param fid: Feature id used when reporting budget adaptations.
+
+        :param chunk_size: Maximum number of vertices in a chunk.
+        :type chunk_size: int
+
+        :param plan: Plan of the segments, as for :meth:`densify_array`.
+        :type plan: Plan
+
+        :returns: A generator of (part, chunk) pairs, where part is the index
+            of the part and chunk an array('d') of interleaved lon, lat
+            values.  The chunks of a part follow each other in order and
+            empty parts yield nothing.
+        """
+        xy = as_doubles(xy)
+        if len(xy) % 2:
+            raise ValueError("xy must hold an even number of values")
+        if offsets is None:
+            offsets = (0, len(xy) // 2)
+        if plan is None:
+            plan = self.plan(xy, offsets)
+            if plan.adapted:
+                self.adapted.append(fid)
+        backend = self.backend
+        azimuths, lengths, waypoints = plan.azimuths, plan.lengths, plan.waypoints
+
+        limit = 2 * max(int(chunk_size), 1)
+        i = 0
+        for p in range(len(offsets) - 1):
+            start, end = 2 * offsets[p], 2 * offsets[p + 1]
+            if start >= end:
+                continue
+            x0, y0 = xy[start], xy[start + 1]
+            chunk = array('d', (x0, y0))
+            for j in range(start + 2, end, 2):
+                n = waypoints[i]
+                if n:
+                    line = backend.line(y0, x0, azimuths[i])
+                    seglen = lengths[i] / (n + 1)
+                    k = 1
+                    while k <= n:
+                        # as many waypoints as fit in the chunk, in one call
+                        m = min(n - k + 1, (limit - len(chunk)) // 2)
+                        chunk.extend(backend.positions(line, seglen, k, m))
+                        k += m
+                        if len(chunk) >= limit:
+                            yield p, chunk
+                            chunk = array('d')
+                x0, y0 = xy[j], xy[j + 1]
+                chunk.append(x0)
+                chunk.append(y0)
+                if len(chunk) >= limit:
+                    yield p, chunk
+                    chunk = array('d')
+                i += 1
+            if chunk:
+                yield p, chunk
+
+    def densify_all(self, features, workers=None, processes=False, batch_vertices=65536):
+        """Densify many features, on a pool of threads when workers > 1.
+
+        The geodesic backends only read their state once constructed, so
+        the threads share this densifier.  The work is balanced by
+        :class:`scheduler.Scheduler`, and results are returned in input
+        order.  With *processes*, a pool of processes runs it instead, see
+        :func:`processes.densify_processes`.
+
+        :param features: Iterable of (fid, xy, offsets) with the coordinates
+            of each feature, as for :meth:`densify_array`.
+        :type features: iterable
+
+        :param workers: Number of threads, None for :func:`default_workers`,
+            or of processes, None for one per CPU.
+        :type workers: int
+
+        :param processes: Whether to densify on worker processes.
+        :type processes: bool
+
+        :param batch_vertices: Input vertices sent to a process at a time.
+        :type batch_vertices: int
+
+        :returns: A generator of (fid, xy, offsets) with the densified
+            coordinates of each feature.
+        """
+        if processes:
+            # imported here since the process pool isn't needed otherwise
+            from .processes import densify_processes
+            return densify_processes(self, features, workers, batch_vertices)
+        # imported here since the scheduler builds on this module
+        from .scheduler import Scheduler
+        return Scheduler(self, workers).run(features)
+
+
+def default_workers():
+    """Number of threads densify_all uses by default.
+
+    All cores on a free-threaded Python.  With the GIL, the pure Python
+    geodesics of one thread would block the others, so one.
+    """
+    gil_enabled = getattr(sys, '_is_gil_enabled', lambda: True)
+    return 1 if gil_enabled() else (os.cpu_count() or 1)
+
+
+def pack_parts(parts):
+    """Pack sequences of (lon, lat) vertices into flat buffers.
+
+    :param parts: Sequences of (lon, lat) vertices, or of points that can
+        be indexed the same way.
+    :type parts: list
+
+    :returns: Interleaved coordinates and part offsets, as taken by
+        :meth:`Densifier.densify_array`.
+    :rtype: (array('d'), array('q'))
+    """
+    xy = array('d')
+    offsets = array('q', [0])
+    for part in parts:
+        for vertex in part:
+            xy.append(vertex[0])
+            xy.append(vertex[1])
+        offsets.append(len(xy) // 2)
+    return xy, offsets
+
+
+def unpack_parts(xy, offsets):
+    """Split flat buffers into one list of (lon, lat) tuples per part.
+
+    :param xy: Interleaved lon, lat values.
+    :type xy: array('d')
+
+    :param offsets: Part offsets, as returned by
+        :meth:`Densifier.densify_array`.
+    :type offsets: sequence of int
+
+    :rtype: list
+    """
+    return [list(zip(xy[2 * offsets[p]:2 * offsets[p + 1]:2], xy[2 * offsets[p] + 1:2 * offsets[p + 1]:2]))
+            for p in range(len(offsets) - 1)]
+
+
+def _grid(decimals, step):
+    """ the function snapping a value to decimals places, or else to multiples of step """
+    if decimals is not None:
+        def snap(value):
+            return round(value, decimals)
+    else:
+        def snap(value):
+            return round(value / step) * step
+    return snap
+
+
+def quantize(xy, offsets=None, decimals=None, step=None, rings=False):
+    """Snap coordinates to a grid and drop the vertices that become equal to
+    the one before.
+
+    A part keeps at least its first and last vertex, so lines stay lines
+    and rings stay closed.
+
+    :param xy: Interleaved x, y values.
+    :type xy: buffer
+
+    :param offsets: Part offsets, as for :meth:`Densifier.densify_array`.
+    :type offsets: sequence of int
+
+    :param decimals: Number of decimal places to round to.
+    :type decimals: int
+
+    :param step: Grid spacing, used when *decimals* is None.
+    :type step: float
+
+    :param rings: True when the parts are polygon rings.  A ring left with
+        fewer than four vertices is kept as it was, so the polygon stays
+        valid.
+    :type rings: bool
+
+    :returns: The snapped coordinates and their part offsets, and the
+        number of vertices dropped.
+    :rtype: (array('d'), array('q'), int)
+    """
+    xy = as_doubles(xy)
+    if offsets is None:
+        offsets = (0, len(xy) // 2)
+    snap = _grid(decimals, step)
+    out = array('d')
+    out_offsets = array('q', [0])
+    dropped = 0
+    for p in range(len(offsets) - 1):
+        start, end = 2 * offsets[p], 2 * offsets[p + 1]
+        first = len(out)
+        for j in range(start, end, 2):
+            x, y = snap(xy[j]), snap(xy[j + 1])
+            if len(out) > first and out[-2] == x and out[-1] == y:
+                dropped += 1
+                continue
+            out.append(x)
+            out.append(y)
+        if rings and len(out) - first < 8 <= end - start:
+            # the ring collapsed, keep it unsnapped
+            dropped -= (end - start - len(out) + first) // 2
+            del out[first:]
+            out.extend(xy[start:end])
+        elif len(out) - first == 2 and end - start > 2:
+            # the whole part snapped to one point, keep it as two vertices
+            out.extend(out[-2:])
+            dropped -= 1
+        out_offsets.append(len(out) // 2)
+    return out, out_offsets, dropped
+
+
+def quantize_points(xy, decimals=None, step=None, previous=None, following=None):
+    """Snap a run of output points to a grid and drop those that become
+    equal to the point before.
+
+    Unlike :func:`quantize` nothing is kept twice, and the points written
+    around the run take part in the comparison, so a stream of points
+    cut into runs has no duplicates where the runs meet.
+
+    :param xy: Interleaved x, y values.
+    :type xy: buffer
+
+    :param decimals: Number of decimal places to round to.
+    :type decimals: int
+
+    :param step: Grid spacing, used when *decimals* is None.
+    :type step: float
+
+    :param previous: The (x, y) point written before the run, snapped or
+        not, or None.
+    :type previous: tuple
+
+    :param following: The (x, y) point written after the run, snapped or
+        not, or None.
+    :type following: tuple
+
+    :returns: The snapped points and the number of points dropped.
+    :rtype: (array('d'), int)
+    """
+    xy = as_doubles(xy)
+    snap = _grid(decimals, step)
+    out = array('d')
+    last = (snap(previous[0]), snap(previous[1])) if previous is not None else None
+    end = (snap(following[0]), snap(following[1])) if following is not None else None
+    for j in range(0, len(xy), 2):
+        point = snap(xy[j]), snap(xy[j + 1])
+        if point == last or point == end:
+            continue
+        out.extend(point)
+        last = point
+    return out, (len(xy) - len(out)) // 2
+
+
+def as_doubles(buffer):
+    """Return a flat memoryview of doubles over any buffer-protocol object.
+
+    :param buffer: array('d'), memoryview, bytes or any C-contiguous buffer
+        holding native doubles.
+
+    :rtype: memoryview
+    """
+    view = memoryview(buffer)
+    if view.format != 'd' or view.ndim != 1:
+        view = view.cast('B').cast('d')
+    return view
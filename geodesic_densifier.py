@@ -16,9 +16,11 @@
  *                                                                         *
  ***************************************************************************/
 """
+# only imported to make geographiclib importable for the backends, which
+# load it themselves
 try:
     # use system version of geographiclib
-    from geographiclib.geodesic import Geodesic
+    import geographiclib
 except ImportError:
     # use version of geographiclib distributed with plugin
     import site
@@ -27,31 +29,58 @@ except ImportError:
     # this will get the path for this file and add it to the system PATH
     # so the geographiclib folder can be found
     site.addsitedir(os.path.abspath(os.path.dirname(__file__)))
-    from geographiclib.geodesic import Geodesic
-import math
+    import geographiclib
 from qgis.core import (QgsCoordinateReferenceSystem,
                        QgsCoordinateTransform,
+                       QgsCsException,
+                       QgsExpression,
+                       QgsExpressionContext,
+                       QgsExpressionContextUtils,
                        QgsWkbTypes,
                        QgsFeature,
+                       QgsFeatureRequest,
                        QgsPointXY,
                        QgsGeometry,
                        QgsField,
+                       QgsFields,
                        QgsProject,
+                       QgsUnitTypes,
                        QgsMapLayerProxyModel,
+                       QgsMessageLog,
+                       QgsVectorLayer,
+                       QgsVectorLayerFeatureSource,
+                       QgsVectorLayerJoinInfo,
                        Qgis)
 from PyQt5.QtCore import (QSettings,
+                          QTimer,
                           QTranslator,
                           qVersion,
                           QCoreApplication,
                           QVariant)
 from PyQt5.QtGui import QIcon
-from PyQt5.QtWidgets import QAction
+from PyQt5.QtWidgets import QAction, QProgressBar
 
 # Initialize Qt resources from file resources.py
 from .resources import *
 # Import the code for the dialog
 from .geodesic_densifier_dialog import GeodesicDensifierDialog
+from .backends import make_backend
+from .checkpoint import Checkpoint, fingerprint
+from .engine import Densifier, VertexBudget, default_workers, pack_parts, quantize, quantize_points
+from .output import InPlaceSink, OutputSink, file_output_path
+from .pipeline import Pipeline
+from .scheduler import Joiner, densify_piece, split_stream
+from .spill import MemoryBudget
+from .tuning import Tuning, autotune, machine_key, profile_key
+from .wkb import read_wkb, write_wkb, LINESTRING, MULTILINESTRING, POINT, POLYGON, MULTIPOINT, MULTIPOLYGON
 import os.path
+import tempfile
+import time
+
+# features read to estimate a run, scaled up to the features chosen
+ESTIMATE_FEATURES = 1000
+# milliseconds the dialog settings must stay unchanged before the estimate is read again
+ESTIMATE_DELAY_MS = 400
 
 
 class GeodesicDensifier:
@@ -191,17 +220,196 @@ class GeodesicDensifier:
         else:
             self.segmentMethod = 'count'
 
+        wgs84crs = QgsCoordinateReferenceSystem("EPSG:4326")
+
+        def make_densifier(warn=False):
+            """ create the densification engine from the current dialog values """
+            # vertex caps protect against runaway spacing values
+            settings = QSettings()
+            budget = VertexBudget(
+                settings.value("GeodesicDensifier/maxSegmentWaypoints", 100000, type=int),
+                settings.value("GeodesicDensifier/maxFeatureVertices", 1000000, type=int),
+                settings.value("GeodesicDensifier/maxTotalVertices", 10000000, type=int))
+            method = 'spacing' if self.dlg.spacingRadioButton.isChecked() else 'count'
+            # geodesic library, see backends.BACKENDS for the names
+            backend_name = settings.value("GeodesicDensifier/backend", "auto", type=str)
+            try:
+                backend = make_backend(backend_name, self.ellipsoid_a, 1 / self.ellipsoid_f)
+            except ValueError as e:
+                if warn:
+                    self.iface.messageBar().pushWarning("Geodesic backend", "{}, using the default".format(e))
+                backend = make_backend('auto', self.ellipsoid_a, 1 / self.ellipsoid_f)
+            return Densifier(backend, method, self.spacing, self.segmentCount, budget)
+
+        def feature_request(layer):
+            """ request for the features chosen in the dialog, so the provider can skip the others """
+            request = QgsFeatureRequest()
+            expression = self.dlg.filterExpressionWidget.expression().strip()
+            if self.dlg.selectedCheckBox.isChecked():
+                fids = layer.selectedFeatureIds()
+                if expression:
+                    # a request takes a single attribute filter, so the expression is
+                    # evaluated here on the selection, which is usually small
+                    filter_expression = QgsExpression(expression)
+                    context = QgsExpressionContext(QgsExpressionContextUtils.globalProjectLayerScopes(layer))
+                    filter_expression.prepare(context)
+                    selected = fids
+                    fids = []
+                    for feature in layer.getFeatures(QgsFeatureRequest().setFilterFids(selected)):
+                        context.setFeature(feature)
+                        if filter_expression.evaluate(context):
+                            fids.append(feature.id())
+                request.setFilterFids(fids)
+            elif expression:
+                request.setFilterExpression(expression)
+            if self.dlg.extentCheckBox.isChecked():
+                # the canvas extent in the layer CRS, for the provider's spatial index
+                canvas = self.iface.mapCanvas()
+                to_layer = QgsCoordinateTransform(canvas.mapSettings().destinationCrs(), layer.crs(),
+                                                  QgsProject.instance())
+                request.setFilterRect(to_layer.transformBoundingBox(canvas.extent()))
+            return request
+
+        def is_filtered(request):
+            """ True when a request doesn't read the whole layer """
+            return request.filterType() != QgsFeatureRequest.FilterNone or not request.filterRect().isNull()
+
+        def estimate_layer(layer, densifier, request, limit=ESTIMATE_FEATURES):
+            """ estimate the output of a run from approximate segment lengths of at most limit features """
+            transform = None
+            if layer.crs() != wgs84crs:
+                transform = QgsCoordinateTransform(layer.crs(), wgs84crs, QgsProject.instance())
+            request = QgsFeatureRequest(request).setNoAttributes()
+            if limit:
+                request.setLimit(limit)
+
+            def layer_arrays():
+                for feature in layer.getFeatures(request):
+                    geom = feature.geometry()
+                    try:
+                        if transform is not None:
+                            geom.transform(transform)
+                        geometry_type, xy, offsets, _ = read_wkb(bytes(geom.asWkb()))
+                    except:
+                        continue
+                    if geometry_type in (POINT, LINESTRING, MULTILINESTRING, POLYGON, MULTIPOLYGON):
+                        yield xy, offsets
+
+            point_mode = layer.geometryType() == QgsWkbTypes.PointGeometry
+            # the compact point output has a parent id, a sequence number and a type code
+            field_count = 3 if point_mode and self.dlg.compactCheckBox.isChecked() else layer.fields().count() + 1
+            estimate = densifier.estimate_arrays(layer_arrays(), field_count, point_mode)
+            if estimate.features and limit:
+                total = layer.featureCount()
+                if is_filtered(request):
+                    # count the chosen features without reading geometries or attributes
+                    count_request = QgsFeatureRequest(request).setLimit(-1).setFlags(QgsFeatureRequest.NoGeometry)
+                    total = sum(1 for _ in layer.getFeatures(count_request))
+                if total > estimate.features:
+                    estimate.scale(float(total) / estimate.features)
+            return estimate
+
+        def sample_layer(layer, request, limit):
+            """ yield (fid, xy, offsets) in WGS84 for at most limit features, as taken by the tuning """
+            transform = None
+            if layer.crs() != wgs84crs:
+                transform = QgsCoordinateTransform(layer.crs(), wgs84crs, QgsProject.instance())
+            point_mode = layer.geometryType() == QgsWkbTypes.PointGeometry
+            previous = None
+            for feature in layer.getFeatures(QgsFeatureRequest(request).setNoAttributes().setLimit(limit)):
+                geom = feature.geometry()
+                try:
+                    if transform is not None:
+                        geom.transform(transform)
+                    _, xy, offsets, _ = read_wkb(bytes(geom.asWkb()))
+                except (QgsCsException, ValueError):
+                    # skipped here as the run skips it
+                    continue
+                if point_mode:
+                    # consecutive points are joined, as in densify_point
+                    point = xy[:2]
+                    if previous is not None:
+                        yield feature.id(), previous + point, None
+                    previous = point
+                else:
+                    yield feature.id(), xy, offsets
+
+        def tune_densifier(layer, densifier, estimate, request):
+            """ choose the backend, chunk size and workers the settings leave to the plugin """
+            settings = QSettings()
+            backend_name = settings.value("GeodesicDensifier/backend", "auto", type=str)
+            workers = settings.value("GeodesicDensifier/workers", 0, type=int)
+            if not settings.value("GeodesicDensifier/autotune", True, type=bool):
+                # 0 uses all cores on a free-threaded Python and one densify thread otherwise
+                return Tuning(densifier.backend.name, densifier.chunk_size, workers or default_workers())
+            # calibrate once per machine and kind of run, with the settings that fix the choice
+            key = "GeodesicDensifier/tuning/{}/{}".format(machine_key(), profile_key(estimate))
+            if backend_name != "auto":
+                key += "-" + densifier.backend.name
+            if workers:
+                key += "-w{}".format(workers)
+            try:
+                tuning = Tuning.loads(settings.value(key, "", type=str))
+            except ValueError:
+                tuning = None
+            # processes, which earlier versions could choose, would fork QGIS
+            if tuning is None or tuning.processes:
+                self.iface.messageBar().pushInfo("Geodesic Densifier", "calibrating on a sample of the layer")
+                QCoreApplication.processEvents()
+                tuning = autotune(densifier, sample_layer(layer, request, 1000), estimate.seconds,
+                                  [densifier.backend.name] if backend_name != "auto" else None,
+                                  workers or None)
+                settings.setValue(key, tuning.dumps())
+            tuning.apply(densifier)
+            return tuning
+
+        # signals connected for this run of the dialog, disconnected when it closes
+        connections = []
+
+        def connect(signal, slot):
+            signal.connect(slot)
+            connections.append((signal, slot))
+
+        # each estimate reads features, so a spin box held down only triggers one once it stops
+        estimate_timer = QTimer()
+        estimate_timer.setSingleShot(True)
+        estimate_timer.setInterval(ESTIMATE_DELAY_MS)
+        estimate_message = [""]
+
+        def update_estimate():
+            """ show the last message in the dialog together with the estimated size of the output """
+            message = estimate_message[0]
+            layer = self.dlg.mMapLayerComboBox.currentLayer()
+            if layer and layer.crs().isValid():
+                estimate = estimate_layer(layer, make_densifier(), feature_request(layer))
+                message += " - estimated output " + estimate.summary()
+            self.dlg.messageBox.setText(message)
+
+        estimate_timer.timeout.connect(update_estimate)
+
+        def show_estimate(message):
+            """ show a message in the dialog now, and the estimated size of the output once the settings settle """
+            estimate_message[0] = message
+            self.dlg.messageBox.setText(message)
+            estimate_timer.start()
+
         def set_in_layer():
             """ function to set the input layer from the GUI """
             self.inLayer = self.dlg.mMapLayerComboBox.currentLayer()
+            self.dlg.filterExpressionWidget.setLayer(self.inLayer)
             if self.inLayer:
                 if self.inLayer.crs():
-                    self.dlg.messageBox.setText("Input Layer Set: " + str(self.inLayer.name()))
+                    show_estimate("Input Layer Set: " + str(self.inLayer.name()))
                 else:
                     self.dlg.messageBox.setText("Error: Input must have projection defined")
 
         # listener to set input layer when combo box changes
-        self.dlg.mMapLayerComboBox.layerChanged.connect(set_in_layer)
+        connect(self.dlg.mMapLayerComboBox.layerChanged, set_in_layer)
+        self.dlg.filterExpressionWidget.setLayer(self.inLayer)
+
+        # listeners to update the estimate when the features to densify change
+        connect(self.dlg.selectedCheckBox.toggled, lambda: show_estimate("Feature selection changed"))
+        connect(self.dlg.extentCheckBox.toggled, lambda: show_estimate("Feature selection changed"))
 
         # clear the ellipsoid combobox
         self.dlg.EllipsoidcomboBox.clear()
@@ -237,7 +445,7 @@ class GeodesicDensifier:
                     self.dlg.messageBox.setText("Ellipsoid set to " + str(k))
 
         # listener to set input ellipsoid when combo box changes
-        self.dlg.EllipsoidcomboBox.currentIndexChanged.connect(set_in_ellipsoid)
+        connect(self.dlg.EllipsoidcomboBox.currentIndexChanged, set_in_ellipsoid)
 
         # default is point spacing with 900m
         self.spacing = 900
@@ -247,10 +455,10 @@ class GeodesicDensifier:
         # choose segment length
         def set_in_spacing():
             self.spacing = int(self.dlg.spacingSpinBox.value())
-            self.dlg.messageBox.setText("Point spacing set to " + str(self.spacing) + "m")
+            show_estimate("Point spacing set to " + str(self.spacing) + "m")
 
         # listener to set input point spacing when spin box changes
-        self.dlg.spacingSpinBox.valueChanged.connect(set_in_spacing)
+        connect(self.dlg.spacingSpinBox.valueChanged, set_in_spacing)
 
         # default segment number is 10
         self.segmentCount = 10
@@ -260,13 +468,27 @@ class GeodesicDensifier:
         # choose number of segments
         def set_in_segments():
             self.segmentCount = int(self.dlg.segmentsSpinBox.value())
-            self.dlg.messageBox.setText("Segment count set to " + str(self.segmentCount))
+            show_estimate("Segment count set to " + str(self.segmentCount))
 
         # listener to set input point spacing when spin box changes
-        self.dlg.segmentsSpinBox.valueChanged.connect(set_in_segments)
+        connect(self.dlg.segmentsSpinBox.valueChanged, set_in_segments)
+
+        # choose segmenting method
+        def set_in_method():
+            if self.dlg.spacingRadioButton.isChecked():
+                show_estimate("Densify by point spacing")
+            else:
+                show_estimate("Densify by segment count")
+
+        # listener to update the estimate when the segmenting method changes
+        connect(self.dlg.spacingRadioButton.toggled, set_in_method)
 
         # Run the dialog event loop
         result = self.dlg.exec_()
+        # the next run connects its own listeners
+        estimate_timer.stop()
+        for signal, slot in connections:
+            signal.disconnect(slot)
         # See if OK was pressed
         if result:
 
@@ -282,9 +504,9 @@ class GeodesicDensifier:
 
             # get the field list
             fields = self.inLayer.fields()
+            out_fields = QgsFields(fields)
 
             # handle layers that aren't WGS84 (EPSG:4326)
-            wgs84crs = QgsCoordinateReferenceSystem("EPSG:4326")
             if self.inLayer.crs() != wgs84crs:
                 transtowgs84 = QgsCoordinateTransform(self.inLayer.crs(), wgs84crs, QgsProject.instance())
                 transfromwgs84 = QgsCoordinateTransform(wgs84crs, self.inLayer.crs(), QgsProject.instance())
@@ -302,120 +524,280 @@ class GeodesicDensifier:
 
             else:
                 self.iface.messageBar().pushWarning("Error", "geometry type not recognized")
+                return
 
-            # setup output layers
+            # setup output fields and name
             if self.inType == 'Point':
-                self.create_point = True
-                # create and add to map canvas a point memory layer
                 layer_name = "Densified Point " + str(self.ellipsoid_name) + " " + str(self.spacing) + "m"
-                out_point_layer = self.iface.addVectorLayer("Point?crs={}".format(self.inLayer.crs().authid()),
-                                                            layer_name,
-                                                            "memory")
-                # set data provider
-                provider = out_point_layer.dataProvider()
-                # add attribute fields
-                provider.addAttributes(fields)
+                out_type = QgsWkbTypes.Point
                 self.pointTypeField = ''
                 for fieldName in ["pointType", "pntType", "pntTyp"]:
                     if fieldName not in [field.name() for field in fields]:
                         self.pointTypeField = fieldName
-                provider.addAttributes([QgsField(self.pointTypeField, QVariant.String)])
-                out_point_layer.updateFields()
-            else:
-                self.create_point = False
-
-            if self.inType == 'LineString':
-                self.create_polyline = True
-                # create and add to map canvas a polyline memory layer
+                out_fields.append(QgsField(self.pointTypeField, QVariant.String))
+                if self.dlg.compactCheckBox.isChecked():
+                    # the source attributes stay in the input layer, see join_source
+                    out_fields = QgsFields()
+                    out_fields.append(QgsField("parentFid", QVariant.LongLong))
+                    out_fields.append(QgsField("sequence", QVariant.LongLong))
+                    out_fields.append(QgsField("pointType", QVariant.Int))
+            elif self.inType == 'LineString':
                 layer_name = "Densified Line " + str(self.ellipsoid_name) + " " + str(self.spacing) + "m"
-                out_line_layer = self.iface.addVectorLayer("LineString?crs={}".format(self.inLayer.crs().authid()),
-                                                           layer_name,
-                                                           "memory")
-                # set data provider
-                provider = out_line_layer.dataProvider()
-                # add attribute fields
-                provider.addAttributes(fields)
-                out_line_layer.updateFields()
+                out_type = QgsWkbTypes.flatType(self.inLayer.wkbType())
             else:
-                self.create_polyline = False
-
-            if self.inType == 'Polygon':
-                self.create_polygon = True
-                # create and add to map canvas a polyline memory layer
                 layer_name = "Densified Polygon " + str(self.ellipsoid_name) + " " + str(self.spacing) + "m"
-                out_poly_layer = self.iface.addVectorLayer("Polygon?crs={}".format(self.inLayer.crs().authid()),
-                                                           layer_name,
-                                                           "memory")
-                # set data provider
-                provider = out_poly_layer.dataProvider()
-                # add attribute fields
-                provider.addAttributes(fields)
-                out_poly_layer.updateFields()
+                out_type = QgsWkbTypes.flatType(self.inLayer.wkbType())
+
+            # the features to densify, as chosen in the dialog
+            expression = self.dlg.filterExpressionWidget.expression().strip()
+            if expression and QgsExpression(expression).hasParserError():
+                self.iface.messageBar().pushWarning(
+                    "Error", "invalid filter expression: " + QgsExpression(expression).parserErrorString())
+                return
+            request = feature_request(self.inLayer)
+            if self.dlg.selectedCheckBox.isChecked() and not request.filterFids():
+                self.iface.messageBar().pushWarning("Error", "no selected features to densify")
+                return
+            in_place = self.dlg.inPlaceCheckBox.isChecked()
+            if in_place and self.inType == 'Point':
+                self.iface.messageBar().pushWarning("Error", "points can't be densified in place")
+                return
+            compact = self.inType == 'Point' and self.dlg.compactCheckBox.isChecked()
+            if in_place or compact:
+                # only the geometries are replaced or written, so no attribute is read
+                request.setNoAttributes()
+
+            # Create the densification engine and its geodesic backend
+            densifier = make_densifier(True)
+
+            # estimate the output to choose between a memory layer and a GeoPackage, from a sample
+            # rather than a pass over the whole layer before the run reads it again
+            start_time = time.time()
+            estimate = estimate_layer(self.inLayer, densifier, request)
+            tuning = tune_densifier(self.inLayer, densifier, estimate, request)
+            QgsMessageLog.logMessage(tuning.report(), "Geodesic Densifier", Qgis.Info)
+            settings = QSettings()
+            memory_limit = settings.value("GeodesicDensifier/memoryLimitMB", 512, type=int) * 1048576
+            # intermediate buffers beyond the working memory spill to files, 0 keeps them in memory
+            working_memory = settings.value("GeodesicDensifier/workingMemoryMB", 256, type=int) * 1048576
+            if working_memory > 0:
+                densifier.memory_budget = MemoryBudget(
+                    working_memory, settings.value("GeodesicDensifier/outputDirectory", "", type=str))
+
+            # output grid in the layer CRS, either decimal places or metres
+            snap_decimals = settings.value("GeodesicDensifier/outputDecimals", -1, type=int)
+            snap_decimals = snap_decimals if snap_decimals >= 0 else None
+            snap_step = None
+            grid_metres = settings.value("GeodesicDensifier/outputGridMetres", 0.0, type=float)
+            if snap_decimals is None and grid_metres > 0:
+                snap_step = grid_metres * QgsUnitTypes.fromUnitToUnitFactor(QgsUnitTypes.DistanceMeters,
+                                                                            self.inLayer.crs().mapUnits())
+            snapping = snap_decimals is not None or snap_step is not None
+
+            def run_parameters():
+                """ what a checkpoint must have been written for to be resumed """
+                budget = densifier.budget
+                extent = request.filterRect()
+                return {
+                    'input': self.inLayer.source(), 'provider': self.inLayer.providerName(),
+                    'subset': self.inLayer.subsetString(), 'features': self.inLayer.featureCount(),
+                    'filter': expression, 'selection': fingerprint(sorted(request.filterFids())),
+                    'extent': None if extent.isNull() else extent.toString(12),
+                    'method': densifier.method, 'spacing': densifier.spacing, 'count': densifier.count,
+                    'ellipsoid': [densifier.backend.a, densifier.backend.f],
+                    'budget': [budget.segment_waypoints, budget.feature_vertices, budget.total_vertices],
+                    'compact': compact, 'decimals': snap_decimals, 'grid': snap_step}
+
+            def can_resume(checkpoint):
+                """ True when the output and the input are still as the checkpoint recorded them """
+                if not os.path.exists(checkpoint.output):
+                    return False
+                output = QgsVectorLayer(checkpoint.output, layer_name, "ogr")
+                if not output.isValid() or output.featureCount() != checkpoint.rows:
+                    # written past the checkpoint before the crash
+                    return False
+                if not checkpoint.position:
+                    return True
+                # the input must give the same feature at the same position
+                done = QgsFeatureRequest(request).setNoAttributes().setFlags(QgsFeatureRequest.NoGeometry)
+                done.setLimit(checkpoint.position)
+                last = None
+                count = 0
+                for count, feature in enumerate(self.inLayer.getFeatures(done), 1):
+                    last = feature.id()
+                return count == checkpoint.position and last == checkpoint.fid
+
+            out_path = None
+            checkpoint = None
+            resumed = False
+            if in_place:
+                try:
+                    # one undoable edit command, or bulk provider writes when undo is off
+                    provider = InPlaceSink(self.inLayer, settings.value("GeodesicDensifier/inPlaceUndo", True, type=bool))
+                except IOError as e:
+                    self.iface.messageBar().pushWarning("Error", str(e))
+                    return
             else:
-                self.create_polygon = False
-
-            # Create a geographiclib Geodesic object
-            self.geod = Geodesic(self.ellipsoid_a, 1 / self.ellipsoid_f)
+                if estimate.bytes > memory_limit:
+                    directory = settings.value("GeodesicDensifier/outputDirectory", "", type=str)
+                    # runs written to a file record their progress, 0 turns it off
+                    checkpoint_seconds = settings.value("GeodesicDensifier/checkpointSeconds", 60, type=int)
+                    if checkpoint_seconds > 0:
+                        parameters = run_parameters()
+                        sidecar = Checkpoint.sidecar_path(directory or tempfile.gettempdir(), layer_name, parameters)
+                        checkpoint = Checkpoint.load(sidecar, parameters, checkpoint_seconds)
+                        resumed = checkpoint is not None and can_resume(checkpoint)
+                    if resumed:
+                        out_path = checkpoint.output
+                        densifier.budget.used = checkpoint.vertices
+                        self.iface.messageBar().pushInfo(
+                            "Geodesic Densifier", "resuming after {:,} features, appending to {}".format(
+                                checkpoint.position, out_path))
+                    else:
+                        out_path = file_output_path(layer_name, directory)
+                        if checkpoint_seconds > 0:
+                            checkpoint = Checkpoint(sidecar, parameters, out_path, checkpoint_seconds)
+                try:
+                    provider = OutputSink(out_type, self.inLayer.crs(), layer_name, out_fields, out_path,
+                                          settings.value("GeodesicDensifier/spatialIndex", True, type=bool),
+                                          checkpoint is not None, resumed)
+                except IOError as e:
+                    self.iface.messageBar().pushWarning("Error", str(e))
+                    return
+            # input features finished by the run being resumed
+            skip = checkpoint.position if resumed else 0
+
+            def completed(position, fid):
+                """ record a finished input feature, committing the output and the checkpoint when due """
+                if checkpoint is not None and checkpoint.done(position, fid):
+                    provider.commit()
+                    checkpoint.save(provider.rows, densifier.budget.used)
+
+            def snap(xy, offsets, rings=False):
+                """ snap layer CRS coordinates to the output grid, taking dropped vertices off the count """
+                xy, offsets, dropped = quantize(xy, offsets, snap_decimals, snap_step, rings)
+                with densifier.budget.lock:
+                    densifier.budget.used -= dropped
+                return xy, offsets
+
+            # progress bar driven by the estimated vertex count
+            progress_message = self.iface.messageBar().createMessage("Densifying " + str(self.inLayer.name()))
+            progress = QProgressBar()
+            progress.setMaximum(max(estimate.vertices, 1))
+            progress_message.layout().addWidget(progress)
+            self.iface.messageBar().pushWidget(progress_message, Qgis.Info)
+
+            def show_progress():
+                """ update the progress bar from the vertices produced so far """
+                progress.setValue(min(densifier.budget.used, progress.maximum()))
+                QCoreApplication.processEvents()
+
+            def report_progress(feature_count):
+                """ update the progress bar every 100 features """
+                if feature_count % 100 == 0:
+                    show_progress()
+
+            def to_wgs84(points):
+                """ convert points from the layer CRS to WGS84 """
+                if self.inLayer.crs() != wgs84crs:
+                    return [transtowgs84.transform(QgsPointXY(pt[0], pt[1])) for pt in points]
+                return points
+
+            def from_wgs84(chunk):
+                """ convert interleaved lon, lat values from the engine to the layer CRS """
+                if self.inLayer.crs() != wgs84crs:
+                    # the whole chunk is transformed in one call, as a multipoint
+                    multipoint = QgsGeometry()
+                    multipoint.fromWkb(write_wkb(MULTIPOINT, chunk, range(len(chunk) // 2 + 1)))
+                    multipoint.transform(transfromwgs84)
+                    _, chunk, _, _ = read_wkb(bytes(multipoint.asWkb()))
+                return chunk
+
+            # point type codes of the compact output, and the number of points written
+            ORIGINAL, DENSIFIED = 0, 1
+            sequence = [checkpoint.rows if resumed else 0]
+
+            def point_attributes(feature, point_type, count=1):
+                """ attributes of count consecutive output points of a feature """
+                if compact:
+                    code = ORIGINAL if point_type == "Original" else DENSIFIED
+                    first = sequence[0]
+                    sequence[0] += count
+                    return [[feature.id(), first + k, code] for k in range(count)]
+                attr = feature.attributes()
+                attr.append(point_type)
+                return [attr] * count
+
+            def write_waypoints(pr, feature, chunk, previous, following):
+                """Write a chunk of densified (lon, lat) values as point features.
+
+                Snapped waypoints equal to the point written before them or to
+                the next original point, both (x, y) in the layer CRS, are
+                dropped.  Returns the last point written.
+                """
+                chunk = from_wgs84(chunk)
+                if snapping:
+                    chunk, dropped = quantize_points(chunk, snap_decimals, snap_step, previous, following)
+                    with densifier.budget.lock:
+                        densifier.budget.used -= dropped
+                if len(chunk) == 0:
+                    return previous
+                points = []
+                for attr, x, y in zip(point_attributes(feature, "Densified", len(chunk) // 2),
+                                      chunk[0::2], chunk[1::2]):
+                    point = QgsFeature()
+                    point.setAttributes(attr)
+                    point.setGeometry(QgsGeometry.fromPointXY(QgsPointXY(x, y)))
+                    points.append(point)
+                pr.addFeatures(points)
+                return chunk[-2], chunk[-1]
 
             def densify_point(in_layer, pr):
                 """ This function densifies the input point layer and writes it to the output provider"""
                 # iterator to read input layer
-                iterator = in_layer.getFeatures()
+                iterator = in_layer.getFeatures(request)
                 # counter to mark first point as "original"
                 counter = 0
                 # empty feature used to store temporary data
                 current_feature = QgsFeature()
                 # counter to report features that don't work
                 bad_geom = 0
-                for feature in iterator:
+                for position, feature in enumerate(iterator):
+                    if position < skip:
+                        # written by the run being resumed, only the last point is needed
+                        if not feature.geometry().isMultipart():
+                            current_feature.setGeometry(feature.geometry())
+                            counter += 1
+                        continue
                     if not feature.geometry().isMultipart():
                         try:
                             if counter == 0:
                                 # this is only for the first point
                                 pointxy = feature.geometry().asPoint()
                                 current_feature.setGeometry(QgsGeometry.fromPointXY(pointxy))
-                                attr = feature.attributes()
-                                attr.append("Original")
-                                current_feature.setAttributes(attr)
+                                current_feature.setAttributes(point_attributes(feature, "Original")[0])
                                 pr.addFeatures([current_feature])
                             else:
                                 start_pt = current_feature.geometry().asPoint()
                                 end_pt = feature.geometry().asPoint()
-                                if self.inLayer.crs() != wgs84crs:
-                                    start_pt = transtowgs84.transform(start_pt)
-                                    end_pt = transtowgs84.transform(end_pt)
-                                # create a geographiclib line object
-                                line_object = self.geod.InverseLine(start_pt.y(), start_pt.x(), end_pt.y(), end_pt.x())
-                                # determine how many densified segments there will be
-                                if self.segmentMethod == 'count':
-                                    n = self.segmentCount
-                                else:
-                                    n = int(math.ceil(line_object.s13 / self.spacing))
-                                # adjust the spacing distance
-                                seglen = line_object.s13 / n
-                                # create densified points along the line object
-                                for i in range(1, n):
-                                    if i > 0:
-                                        s = seglen * i
-                                        g = line_object.Position(s,
-                                                                 Geodesic.LATITUDE |
-                                                                 Geodesic.LONGITUDE |
-                                                                 Geodesic.LONG_UNROLL)
-                                        geom = QgsPointXY(g['lon2'], g['lat2'])
-                                        attr = feature.attributes()
-                                        attr.append("Densified")
-                                        current_feature.setAttributes(attr)
-                                        if self.inLayer.crs() != wgs84crs:  # Convert each point back to the output CRS
-                                            geom = transfromwgs84.transform(geom)
-                                        current_feature.setGeometry(QgsGeometry.fromPointXY(geom))
-                                        # write the point
-                                        pr.addFeatures([current_feature])
+                                xy, _ = pack_parts([to_wgs84([start_pt, end_pt])])
+                                # densify the geodesic between the two points and write the
+                                # waypoints chunk by chunk, skipping the original end points;
+                                # a chunk is held back until the next one shows it isn't the last
+                                previous = start_pt.x(), start_pt.y()
+                                following = end_pt.x(), end_pt.y()
+                                pending = None
+                                for _, chunk in densifier.stream(xy, None, feature.id(), 1000):
+                                    if pending is None:
+                                        chunk = chunk[2:]
+                                    else:
+                                        previous = write_waypoints(pr, feature, pending, previous, following)
+                                    pending = chunk
+                                write_waypoints(pr, feature, pending[:-2], previous, following)
                                 # write the last point
                                 geom = feature.geometry().asPoint()
                                 current_feature.setGeometry(QgsGeometry.fromPointXY(geom))
-                                attr = feature.attributes()
-                                attr.append("Original")
-                                current_feature.setAttributes(attr)
+                                current_feature.setAttributes(point_attributes(feature, "Original")[0])
                                 pr.addFeatures([current_feature])
                             counter += 1
                         except:
@@ -424,201 +806,160 @@ class GeodesicDensifier:
                     else:
                         bad_geom += 1
                         self.iface.messageBar().pushWarning("error", "multipoint geometries will not be densified")
+                    report_progress(counter)
+                    completed(position, feature.id())
                 if bad_geom > 0:
                     # report number of features that didn't work
                     self.iface.messageBar().pushWarning("Error", "{} features failed".format(bad_geom))
 
             def densify_poly(in_layer, pr):
-                bad_geom = 0
-                iterator = in_layer.getFeatures()
-                # create empty feature to write to
-                for feature in iterator:
+                """ densify lines and polygons with reading, densifying and writing on their own threads """
+                # failures counted by the reader and the writer thread
+                bad_geom = [0, 0]
+                # unlike the layer, a feature source can be iterated away from the main thread
+                source = QgsVectorLayerFeatureSource(in_layer)
+
+                def read_features():
+                    """ yield each feature with its coordinates in WGS84, the layout of its parts and its position """
+                    for position, feature in enumerate(source.getFeatures(request)):
+                        if position < skip:
+                            continue
+                        try:
+                            geom = feature.geometry()
+                            if self.inLayer.crs() != wgs84crs:
+                                # one call for the whole geometry instead of one per vertex
+                                geom.transform(transtowgs84)
+                            geometry_type, xy, offsets, polygons = read_wkb(bytes(geom.asWkb()))
+                            if geometry_type not in (LINESTRING, MULTILINESTRING, POLYGON, MULTIPOLYGON):
+                                bad_geom[0] += 1
+                                continue
+                        except:
+                            bad_geom[0] += 1
+                            continue
+                        # only the attributes are needed from here on
+                        feature.clearGeometry()
+                        yield feature, xy, offsets, (geometry_type, polygons, position)
+
+                def densify_feature(item):
+                    feature, xy, offsets, layout = item
+                    return (feature,) + densifier.densify_array(xy, offsets, feature.id()) + (layout,)
+
+                def read_pieces():
+                    """ the features, with the costly ones cut into pieces so one feature doesn't keep a single thread busy """
+                    return split_stream(densifier, (((feature, layout), xy, offsets)
+                                                    for feature, xy, offsets, layout in read_features()),
+                                        fid=lambda key: key[0].id())
+
+                def densify_item(item):
+                    xy, piece = item
+                    return (piece,) + densify_piece(densifier, xy, piece)
+
+                def write_feature(result):
+                    feature, xy, offsets, (geometry_type, polygons, position) = result
                     try:
-                        if feature.geometry().wkbType() == QgsWkbTypes.LineString:
-                            line_geom = feature.geometry().asPolyline()
-                            geom_type = "LineString"
-                        elif feature.geometry().wkbType() == QgsWkbTypes.MultiLineString:
-                            multiline_geom = feature.geometry().asMultiPolyline()
-                            geom_type = "MultiLineString"
-                        elif feature.geometry().wkbType() == QgsWkbTypes.Polygon:
-                            poly_geom = feature.geometry().asPolygon()
-                            geom_type = "Polygon"
-                        elif feature.geometry().wkbType() == QgsWkbTypes.MultiPolygon:
-                            multipoly_geom = feature.geometry().asMultiPolygon()
-                            geom_type = "MultiPolygon"
-                        else:
-                            bad_geom += 1
-                    except:
-                        bad_geom += 1
-
-                    if geom_type == "LineString":
-                        dense_points = []
-                        point_count = len(line_geom)
-                        start_pt = QgsPointXY(line_geom[0][0], line_geom[0][1])
-                        dense_points.append(start_pt)
+                        # the densified arrays go straight into the WKB, without a point object per vertex
+                        rings = geometry_type in (POLYGON, MULTIPOLYGON)
+                        if snapping and self.inLayer.crs() == wgs84crs:
+                            xy, offsets = snap(xy, offsets, rings)
+                        geom = QgsGeometry()
+                        geom.fromWkb(write_wkb(geometry_type, xy, offsets, polygons))
                         if self.inLayer.crs() != wgs84crs:
-                            start_pt = transtowgs84.transform(start_pt)
-                        for j in range(1, point_count):
-                            end_pt = QgsPointXY(line_geom[j][0], line_geom[j][1])
-                            if self.inLayer.crs() != wgs84crs:
-                                end_pt = transtowgs84.transform(end_pt)
-                            # create a geographiclib line object
-                            line_object = self.geod.InverseLine(start_pt.y(), start_pt.x(), end_pt.y(), end_pt.x())
-                            # determine how many densified segments there will be
-                            if self.segmentMethod == 'count':
-                                n = self.segmentCount
-                            else:
-                                n = int(math.ceil(line_object.s13 / self.spacing))
-                            if line_object.s13 > self.spacing:
-                                seglen = line_object.s13 / n
-                                for k in range(1, n):
-                                    s = seglen * k
-                                    g = line_object.Position(s,
-                                                             Geodesic.LATITUDE |
-                                                             Geodesic.LONGITUDE |
-                                                             Geodesic.LONG_UNROLL)
-                                    waypoint = QgsPointXY(g['lon2'], g['lat2'])
-                                    if self.inLayer.crs() != wgs84crs:
-                                        waypoint = transfromwgs84.transform(waypoint)
-                                    dense_points.append(waypoint)
-                                if self.inLayer.crs() != wgs84crs:
-                                    end_pt = transfromwgs84.transform(end_pt)
-                                dense_points.append(end_pt)
-                            start_pt = end_pt
-
-                    elif geom_type == "MultiLineString":
-                        dense_features = []
-                        for i in range(len(multiline_geom)):
-                            dense_points = []
-                            line = multiline_geom[i]
-                            point_count = len(line)
-                            start_pt = QgsPointXY(line[0][0], line[0][1])
-                            dense_points.append(start_pt)
-                            for j in range(1, point_count):
-                                end_pt = QgsPointXY(line[j][0], line[j][1])
-                                if self.inLayer.crs() != wgs84crs:
-                                    start_pt = transtowgs84.transform(start_pt)
-                                    end_pt = transtowgs84.transform(end_pt)
-                                # create a geographiclib line object
-                                line_object = self.geod.InverseLine(start_pt.y(), start_pt.x(), end_pt.y(), end_pt.x())
-                                # determine how many densified segments there will be
-                                if self.segmentMethod == 'count':
-                                    n = self.segmentCount
-                                else:
-                                    n = int(math.ceil(line_object.s13 / self.spacing))
-                                if line_object.s13 > self.spacing:
-                                    seglen = line_object.s13 / n
-                                    for k in range(1, n):
-                                        s = seglen * k
-                                        g = line_object.Position(s,
-                                                                 Geodesic.LATITUDE |
-                                                                 Geodesic.LONGITUDE |
-                                                                 Geodesic.LONG_UNROLL)
-                                        waypoint = QgsPointXY(g['lon2'], g['lat2'])
-                                        if self.inLayer.crs() != wgs84crs:
-                                            waypoint = transfromwgs84.transform(waypoint)
-                                        dense_points.append(waypoint)
-                                    if self.inLayer.crs() != wgs84crs:
-                                        end_pt = transfromwgs84.transform(end_pt)
-                                    dense_points.append(end_pt)
-                                start_pt = end_pt
-                            dense_features.append(dense_points)
-
-                    elif geom_type == "Polygon":
-                        for poly in poly_geom:
-                            dense_points = []
-                            point_count = len(poly)
-                            start_pt = QgsPointXY(poly[0][0], poly[0][1])
-                            dense_points.append(start_pt)
-                            for j in range(1, point_count):
-                                end_pt = QgsPointXY(poly[j][0], poly[j][1])
-                                if self.inLayer.crs() != wgs84crs:
-                                    end_pt = transtowgs84.transform(end_pt)
-                                    start_pt = transtowgs84.transform(start_pt)
-                                # create a geographiclib line object
-                                line_object = self.geod.InverseLine(start_pt.y(), start_pt.x(), end_pt.y(), end_pt.x())
-                                # determine how many densified segments there will be
-                                if self.segmentMethod == 'count':
-                                    n = self.segmentCount
-                                else:
-                                    n = int(math.ceil(line_object.s13 / self.spacing))
-                                if line_object.s13 > self.spacing:
-                                    seglen = line_object.s13 / n
-                                    for k in range(1, n):
-                                        s = seglen * k
-                                        g = line_object.Position(s,
-                                                                 Geodesic.LATITUDE |
-                                                                 Geodesic.LONGITUDE |
-                                                                 Geodesic.LONG_UNROLL)
-                                        waypoint = QgsPointXY(g['lon2'], g['lat2'])
-                                        if self.inLayer.crs() != wgs84crs:
-                                            waypoint = transfromwgs84.transform(waypoint)
-                                        dense_points.append(waypoint)
-                                    if self.inLayer.crs() != wgs84crs:
-                                        end_pt = transfromwgs84.transform(end_pt)
-                                    dense_points.append(end_pt)
-                                start_pt = end_pt
-
-                    if geom_type == "MultiPolygon":
-                        dense_features = []
-                        for i in range(len(multipoly_geom)):
-                            dense_points = []
-                            poly = multipoly_geom[i][0]
-                            point_count = len(poly)
-                            start_pt = QgsPointXY(poly[0][0], poly[0][1])
-                            dense_points.append(start_pt)
-                            for j in range(1, point_count):
-                                end_pt = QgsPointXY(poly[j][0], poly[j][1])
-                                if self.inLayer.crs() != wgs84crs:
-                                    start_pt = transtowgs84.transform(start_pt)
-                                    end_pt = transtowgs84.transform(end_pt)
-                                # create a geographiclib line object
-                                line_object = self.geod.InverseLine(start_pt.y(), start_pt.x(), end_pt.y(), end_pt.x())
-                                # determine how many densified segments there will be
-                                if self.segmentMethod == 'count':
-                                    n = self.segmentCount
-                                else:
-                                    n = int(math.ceil(line_object.s13 / self.spacing))
-                                if line_object.s13 > self.spacing:
-                                    seglen = line_object.s13 / n
-                                    for k in range(1, n):
-                                        s = seglen * k
-                                        g = line_object.Position(s,
-                                                                 Geodesic.LATITUDE |
-                                                                 Geodesic.LONGITUDE |
-                                                                 Geodesic.LONG_UNROLL)
-                                        waypoint = QgsPointXY(g['lon2'], g['lat2'])
-                                        if self.inLayer.crs() != wgs84crs:
-                                            waypoint = transfromwgs84.transform(waypoint)
-                                        dense_points.append(waypoint)
-                                    if self.inLayer.crs() != wgs84crs:
-                                        end_pt = transfromwgs84.transform(end_pt)
-                                    dense_points.append(end_pt)
-                                start_pt = end_pt
-                            dense_features.append(dense_points)
-
-                    new_poly = QgsFeature()
-                    if geom_type == "LineString":
-                        new_poly.setGeometry(QgsGeometry.fromPolylineXY(dense_points))
-                    elif geom_type == "MultiLineString":
-                        new_poly.setGeometry(QgsGeometry.fromMultiPolylineXY(dense_features))
-                    elif geom_type == "Polygon":
-                        new_poly.setGeometry(QgsGeometry.fromPolygonXY([dense_points]))
-                    elif geom_type == "MultiPolygon":
-                        new_poly.setGeometry(QgsGeometry.fromMultiPolygonXY([dense_features]))
-                    new_poly.setAttributes(feature.attributes())
-                    pr.addFeatures([new_poly])
-                if bad_geom > 0:
-                    self.iface.messageBar().pushWarning("", "{} features failed".format(bad_geom))
-
-            if self.create_point:
-                densify_point(self.inLayer, provider)
-                out_point_layer.reload()
-
-            if self.create_polyline:
-                densify_poly(self.inLayer, provider)
-                out_line_layer.reload()
-
-            if self.create_polygon:
-                densify_poly(self.inLayer, provider)
-                out_poly_layer.reload()
+                            geom.transform(transfromwgs84)
+                            if snapping:
+                                # the grid is in the layer CRS, so snap the transformed coordinates
+                                _, xy, offsets, _ = read_wkb(bytes(geom.asWkb()))
+                                xy, offsets = snap(xy, offsets, rings)
+                                geom.fromWkb(write_wkb(geometry_type, xy, offsets, polygons))
+
+                        if in_place:
+                            pr.changeGeometry(feature.id(), geom)
+                            return
+                        new_poly = QgsFeature()
+                        new_poly.setGeometry(geom)
+                        new_poly.setAttributes(feature.attributes())
+                        pr.addFeatures([new_poly])
+                    except:
+                        bad_geom[1] += 1
+                    completed(position, feature.id())
+
+                def write_piece(result):
+                    piece, xy, offsets = result
+                    joined = joiner.add(piece, xy, offsets)
+                    if joined is not None:
+                        feature, layout = piece.feature
+                        write_feature((feature,) + joined + (layout,))
+
+                def poll():
+                    """ apply the densified geometries on this thread and update the progress bar """
+                    if in_place:
+                        pr.flush()
+                    show_progress()
+
+                if tuning.workers > 1:
+                    joiner = Joiner(densifier)
+                    pipeline = Pipeline(read_pieces, densify_item, write_piece, tuning.workers)
+                else:
+                    pipeline = Pipeline(read_features, densify_feature, write_feature)
+                pipeline.run(poll)
+                QgsMessageLog.logMessage(pipeline.report(), "Geodesic Densifier", Qgis.Info)
+                if sum(bad_geom) > 0:
+                    self.iface.messageBar().pushWarning("", "{} features failed".format(sum(bad_geom)))
+
+            def join_source(out_layer):
+                """ show the source attributes on the compact points through a join on the parent id """
+                key = self.inLayer.primaryKeyAttributes()
+                if len(key) != 1 or not self.inLayer.fields().at(key[0]).isNumeric():
+                    # the feature ids are only a field for a single integer key, as in a GeoPackage;
+                    # otherwise, e.g. in a shapefile, parentFid matches $id of the input
+                    return
+                join = QgsVectorLayerJoinInfo()
+                join.setJoinLayer(self.inLayer)
+                join.setJoinFieldName(self.inLayer.fields().at(key[0]).name())
+                join.setTargetFieldName("parentFid")
+                join.setUsingMemoryCache(False)
+                out_layer.addJoin(join)
+
+            def report_budget():
+                """ report the features whose spacing was widened to fit the vertex budget """
+                if densifier.adapted:
+                    self.iface.messageBar().pushWarning(
+                        "Vertex budget",
+                        "spacing widened for {} features to stay within the vertex caps: {}".format(
+                            len(densifier.adapted), ", ".join(str(fid) for fid in densifier.adapted[:20])))
+
+            try:
+                if self.inType == 'Point':
+                    densify_point(self.inLayer, provider)
+                else:
+                    densify_poly(self.inLayer, provider)
+            except:
+                # with undo the input layer is left as it was, without it the batches written stay
+                if in_place:
+                    provider.abort()
+                self.iface.messageBar().popWidget(progress_message)
+                if in_place and not provider.undo and provider.changed:
+                    self.iface.messageBar().pushWarning(
+                        "Geodesic Densifier",
+                        "the run failed after densifying {:,} features of {} in place, "
+                        "which can't be undone".format(provider.changed, self.inLayer.name()))
+                raise
+            out_layer = provider.finish()
+            if checkpoint is not None:
+                checkpoint.remove()
+            if compact:
+                join_source(out_layer)
+
+            self.iface.messageBar().popWidget(progress_message)
+            report_budget()
+            if densifier.memory_budget is not None:
+                QgsMessageLog.logMessage(densifier.memory_budget.report(), "Geodesic Densifier", Qgis.Info)
+            self.iface.messageBar().pushInfo(
+                "Geodesic Densifier",
+                "wrote {:,} vertices in {:.1f} s{} with {} (estimated {}){}".format(
+                    densifier.budget.used, time.time() - start_time,
+                    ", spatial index {:.1f} s".format(provider.index_seconds) if not in_place else "",
+                    tuning.summary(), estimate.summary(),
+                    (" resumed after {:,} features".format(skip) if resumed else "") +
+                    " to " + out_path if out_path else
+                    " in place in {:,} features of {}".format(provider.changed, self.inLayer.name()) if in_place else
+                    ""))
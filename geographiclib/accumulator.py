@@ -14,9 +14,14 @@
 
 from geographiclib.geomath import Math
 
+# Math helpers bound once, see geodesic.py
+_sum = Math.sum
+
 class Accumulator(object):
   """Like math.fsum, but allows a running sum"""
 
+  __slots__ = ('_s', '_t')
+
   def Set(self, y):
     """Set value from argument"""
     if type(self) == type(y):
@@ -32,8 +37,8 @@ class Accumulator(object):
     """Add a value"""
     # Here's Shewchuk's solution...
     # hold exact sum as [s, t, u]
-    y, u = Math.sum(y, self._t)             # Accumulate starting at
-    self._s, self._t = Math.sum(y, self._s) # least significant end
+    y, u = _sum(y, self._t)             # Accumulate starting at
+    self._s, self._t = _sum(y, self._s) # least significant end
     # Start is _s, _t decreasing and non-adjacent.  Sum is now (s + t + u)
     # exactly with s, t, u non-adjacent and in decreasing order (except
     # for possible zeros).  The following code tries to normalize the
@@ -78,13 +78,37 @@ The public attributes for this class are
 ######################################################################
 
 import math
+import multiprocessing
+from array import array
+from collections import deque
+from itertools import islice
 from geographiclib.geomath import Math
 from geographiclib.constants import Constants
 from geographiclib.geodesiccapability import GeodesicCapability
 
+# Bind the Math helpers once; calling them through the class costs an
+# attribute lookup on every call.
+_AngDiff = Math.AngDiff
+_AngNormalize = Math.AngNormalize
+_AngRound = Math.AngRound
+_LatFix = Math.LatFix
+_atan2d = Math.atan2d
+_atanh = Math.atanh
+_cbrt = Math.cbrt
+_isfinite = Math.isfinite
+_norm = Math.norm
+_polyval = Math.polyval
+_sincosd = Math.sincosd
+_sq = Math.sq
+
 class Geodesic(object):
   """Solve geodesic problems"""
 
+  # Only __init__ writes the state, so an instance can be shared between
+  # threads; test_threads checks this.
+  __slots__ = ('a', 'f', '_f1', '_e2', '_ep2', '_n', '_b', '_c2', '_etol2',
+               '_A3x', '_C3x', '_C4x')
+
   GEOGRAPHICLIB_GEODESIC_ORDER = 6
   nA1_ = GEOGRAPHICLIB_GEODESIC_ORDER
   nC1_ = GEOGRAPHICLIB_GEODESIC_ORDER
@@ -148,14 +172,14 @@ class Geodesic(object):
     """Private: solve astroid equation."""
     # Solve k^4+2*k^3-(x^2+y^2-1)*k^2-2*y^2*k-y^2 = 0 for positive root k.
     # This solution is adapted from Geocentric::Reverse.
-    p = Math.sq(x)
-    q = Math.sq(y)
+    p = _sq(x)
+    q = _sq(y)
     r = (p + q - 1) / 6
     if not(q == 0 and r <= 0):
       # Avoid possible division by zero when r = 0 by multiplying equations
       # for s and t by r^3 and r, resp.
       S = p * q / 4            # S = r^3 * s
-      r2 = Math.sq(r)
+      r2 = _sq(r)
       r3 = r * r2
       # The discriminant of the quadratic equation for T3.  This is zero on
       # the evolute curve p^(1/3)+q^(1/3) = 1
@@ -168,7 +192,7 @@ class Geodesic(object):
         # of the way the T is used in definition of u.
         T3 += -math.sqrt(disc) if T3 < 0 else math.sqrt(disc) # T3 = (r * t)^3
         # N.B. cbrt always returns the real root.  cbrt(-8) = -2.
-        T = Math.cbrt(T3)       # T = r * t
+        T = _cbrt(T3)       # T = r * t
         # T can be zero; but then r2 / T -> 0.
         u += T + (r2 / T if T != 0 else 0)
       else:
@@ -177,13 +201,13 @@ class Geodesic(object):
         # There are three possible cube roots.  We choose the root which
         # avoids cancellation.  Note that disc < 0 implies that r < 0.
         u += 2 * r * math.cos(ang / 3)
-      v = math.sqrt(Math.sq(u) + q) # guaranteed positive
+      v = math.sqrt(_sq(u) + q) # guaranteed positive
       # Avoid loss of accuracy when u < 0.
       uv = q / (v - u) if u < 0 else u + v # u+v, guaranteed positive
       w = (uv - q) / (2 * v)               # positive?
       # Rearrange expression for k to avoid loss of accuracy due to
       # subtraction.  Division by 0 not possible because uv > 0, w >= 0.
-      k = uv / (math.sqrt(uv + Math.sq(w)) + w) # guaranteed positive
+      k = uv / (math.sqrt(uv + _sq(w)) + w) # guaranteed positive
     else:                                       # q == 0 && r <= 0
       # y = 0 with |x| <= 1.  Handle this case directly.
       # for y small, positive root is k = abs(y)/sqrt(1-x^2)
@@ -197,7 +221,7 @@ class Geodesic(object):
       1, 4, 64, 0, 256,
     ]
     m = Geodesic.nA1_//2
-    t = Math.polyval(m, coeff, 0, Math.sq(eps)) / coeff[m + 1]
+    t = _polyval(m, coeff, 0, _sq(eps)) / coeff[m + 1]
     return (t + eps) / (1 - eps)
   _A1m1f = staticmethod(_A1m1f)
 
@@ -211,12 +235,12 @@ class Geodesic(object):
       -7, 1280,
       -7, 2048,
     ]
-    eps2 = Math.sq(eps)
+    eps2 = _sq(eps)
     d = eps
     o = 0
     for l in range(1, Geodesic.nC1_ + 1): # l is index of C1p[l]
       m = (Geodesic.nC1_ - l) // 2        # order of polynomial in eps^2
-      c[l] = d * Math.polyval(m, coeff, o, eps2) / coeff[o + m + 1]
+      c[l] = d * _polyval(m, coeff, o, eps2) / coeff[o + m + 1]
       o += m + 2
       d *= eps
   _C1f = staticmethod(_C1f)
@@ -231,12 +255,12 @@ class Geodesic(object):
       3467, 7680,
       38081, 61440,
     ]
-    eps2 = Math.sq(eps)
+    eps2 = _sq(eps)
     d = eps
     o = 0
     for l in range(1, Geodesic.nC1p_ + 1): # l is index of C1p[l]
       m = (Geodesic.nC1p_ - l) // 2 # order of polynomial in eps^2
-      c[l] = d * Math.polyval(m, coeff, o, eps2) / coeff[o + m + 1]
+      c[l] = d * _polyval(m, coeff, o, eps2) / coeff[o + m + 1]
       o += m + 2
       d *= eps
   _C1pf = staticmethod(_C1pf)
@@ -247,7 +271,7 @@ class Geodesic(object):
       -11, -28, -192, 0, 256,
     ]
     m = Geodesic.nA2_//2
-    t = Math.polyval(m, coeff, 0, Math.sq(eps)) / coeff[m + 1]
+    t = _polyval(m, coeff, 0, _sq(eps)) / coeff[m + 1]
     return (t - eps) / (1 + eps)
   _A2m1f = staticmethod(_A2m1f)
 
@@ -261,12 +285,12 @@ class Geodesic(object):
       63, 1280,
       77, 2048,
     ]
-    eps2 = Math.sq(eps)
+    eps2 = _sq(eps)
     d = eps
     o = 0
     for l in range(1, Geodesic.nC2_ + 1): # l is index of C2[l]
       m = (Geodesic.nC2_ - l) // 2        # order of polynomial in eps^2
-      c[l] = d * Math.polyval(m, coeff, o, eps2) / coeff[o + m + 1]
+      c[l] = d * _polyval(m, coeff, o, eps2) / coeff[o + m + 1]
       o += m + 2
       d *= eps
   _C2f = staticmethod(_C2f)
@@ -288,13 +312,13 @@ class Geodesic(object):
     """The flattening (readonly)"""
     self._f1 = 1 - self.f
     self._e2 = self.f * (2 - self.f)
-    self._ep2 = self._e2 / Math.sq(self._f1) # e2 / (1 - e2)
+    self._ep2 = self._e2 / _sq(self._f1) # e2 / (1 - e2)
     self._n = self.f / ( 2 - self.f)
     self._b = self.a * self._f1
     # authalic radius squared
-    self._c2 = (Math.sq(self.a) + Math.sq(self._b) *
+    self._c2 = (_sq(self.a) + _sq(self._b) *
                 (1 if self._e2 == 0 else
-                 (Math.atanh(math.sqrt(self._e2)) if self._e2 > 0 else
+                 (_atanh(math.sqrt(self._e2)) if self._e2 > 0 else
                   math.atan(math.sqrt(-self._e2))) /
                  math.sqrt(abs(self._e2))))/2
     # The sig12 threshold for "really short".  Using the auxiliary sphere
@@ -308,13 +332,13 @@ class Geodesic(object):
     # abs(f)) stops etol2 getting too large in the nearly spherical case.
     self._etol2 = 0.1 * Geodesic.tol2_ / math.sqrt( max(0.001, abs(self.f)) *
                                                     min(1.0, 1-self.f/2) / 2 )
-    if not(Math.isfinite(self.a) and self.a > 0):
+    if not(_isfinite(self.a) and self.a > 0):
       raise ValueError("Equatorial radius is not positive")
-    if not(Math.isfinite(self._b) and self._b > 0):
+    if not(_isfinite(self._b) and self._b > 0):
       raise ValueError("Polar semi-axis is not positive")
-    self._A3x = list(range(Geodesic.nA3x_))
-    self._C3x = list(range(Geodesic.nC3x_))
-    self._C4x = list(range(Geodesic.nC4x_))
+    self._A3x = array('d', [0.0]) * Geodesic.nA3x_
+    self._C3x = array('d', [0.0]) * Geodesic.nC3x_
+    self._C4x = array('d', [0.0]) * Geodesic.nC4x_
     self._A3coeff()
     self._C3coeff()
     self._C4coeff()
@@ -332,7 +356,7 @@ class Geodesic(object):
     o = 0; k = 0
     for j in range(Geodesic.nA3_ - 1, -1, -1): # coeff of eps^j
       m = min(Geodesic.nA3_ - j - 1, j) # order of polynomial in n
-      self._A3x[k] = Math.polyval(m, coeff, o, self._n) / coeff[o + m + 1]
+      self._A3x[k] = _polyval(m, coeff, o, self._n) / coeff[o + m + 1]
       k += 1
       o += m + 2
 
@@ -359,7 +383,7 @@ class Geodesic(object):
     for l in range(1, Geodesic.nC3_): # l is index of C3[l]
       for j in range(Geodesic.nC3_ - 1, l - 1, -1): # coeff of eps^j
         m = min(Geodesic.nC3_ - j - 1, j) # order of polynomial in n
-        self._C3x[k] = Math.polyval(m, coeff, o, self._n) / coeff[o + m + 1]
+        self._C3x[k] = _polyval(m, coeff, o, self._n) / coeff[o + m + 1]
         k += 1
         o += m + 2
 
@@ -392,14 +416,14 @@ class Geodesic(object):
     for l in range(Geodesic.nC4_): # l is index of C4[l]
       for j in range(Geodesic.nC4_ - 1, l - 1, -1): # coeff of eps^j
         m = Geodesic.nC4_ - j - 1 # order of polynomial in n
-        self._C4x[k] = Math.polyval(m, coeff, o, self._n) / coeff[o + m + 1]
+        self._C4x[k] = _polyval(m, coeff, o, self._n) / coeff[o + m + 1]
         k += 1
         o += m + 2
 
   def _A3f(self, eps):
     """Private: return A3"""
     # Evaluate A3
-    return Math.polyval(Geodesic.nA3_ - 1, self._A3x, 0, eps)
+    return _polyval(Geodesic.nA3_ - 1, self._A3x, 0, eps)
 
   def _C3f(self, eps, c):
     """Private: return C3"""
@@ -410,7 +434,7 @@ class Geodesic(object):
     for l in range(1, Geodesic.nC3_): # l is index of C3[l]
       m = Geodesic.nC3_ - l - 1       # order of polynomial in eps
       mult *= eps
-      c[l] = mult * Math.polyval(m, self._C3x, o, eps)
+      c[l] = mult * _polyval(m, self._C3x, o, eps)
       o += m + 1
 
   def _C4f(self, eps, c):
@@ -421,7 +445,7 @@ class Geodesic(object):
     o = 0
     for l in range(Geodesic.nC4_): # l is index of C4[l]
       m = Geodesic.nC4_ - l - 1    # order of polynomial in eps
-      c[l] = mult * Math.polyval(m, self._C4x, o, eps)
+      c[l] = mult * _polyval(m, self._C4x, o, eps)
       o += m + 1
       mult *= eps
 
@@ -442,29 +466,29 @@ class Geodesic(object):
     s12b = m12b = m0 = M12 = M21 = Math.nan
     if outmask & (Geodesic.DISTANCE | Geodesic.REDUCEDLENGTH |
                   Geodesic.GEODESICSCALE):
-      A1 = Geodesic._A1m1f(eps)
-      Geodesic._C1f(eps, C1a)
+      A1 = _A1m1f(eps)
+      _C1f(eps, C1a)
       if outmask & (Geodesic.REDUCEDLENGTH | Geodesic.GEODESICSCALE):
-        A2 = Geodesic._A2m1f(eps)
-        Geodesic._C2f(eps, C2a)
+        A2 = _A2m1f(eps)
+        _C2f(eps, C2a)
         m0x = A1 - A2
         A2 = 1 + A2
       A1 = 1 + A1
     if outmask & Geodesic.DISTANCE:
-      B1 = (Geodesic._SinCosSeries(True, ssig2, csig2, C1a) -
-            Geodesic._SinCosSeries(True, ssig1, csig1, C1a))
+      B1 = (_SinCosSeries(True, ssig2, csig2, C1a) -
+            _SinCosSeries(True, ssig1, csig1, C1a))
       # Missing a factor of _b
       s12b = A1 * (sig12 + B1)
       if outmask & (Geodesic.REDUCEDLENGTH | Geodesic.GEODESICSCALE):
-        B2 = (Geodesic._SinCosSeries(True, ssig2, csig2, C2a) -
-              Geodesic._SinCosSeries(True, ssig1, csig1, C2a))
+        B2 = (_SinCosSeries(True, ssig2, csig2, C2a) -
+              _SinCosSeries(True, ssig1, csig1, C2a))
         J12 = m0x * sig12 + (A1 * B1 - A2 * B2)
     elif outmask & (Geodesic.REDUCEDLENGTH | Geodesic.GEODESICSCALE):
       # Assume here that nC1_ >= nC2_
       for l in range(1, Geodesic.nC2_):
         C2a[l] = A1 * C1a[l] - A2 * C2a[l]
-      J12 = m0x * sig12 + (Geodesic._SinCosSeries(True, ssig2, csig2, C2a) -
-                           Geodesic._SinCosSeries(True, ssig1, csig1, C2a))
+      J12 = m0x * sig12 + (_SinCosSeries(True, ssig2, csig2, C2a) -
+                           _SinCosSeries(True, ssig1, csig1, C2a))
     if outmask & Geodesic.REDUCEDLENGTH:
       m0 = m0x
       # Missing a factor of _b.
@@ -502,10 +526,10 @@ class Geodesic(object):
 
     shortline = cbet12 >= 0 and sbet12 < 0.5 and cbet2 * lam12 < 0.5
     if shortline:
-      sbetm2 = Math.sq(sbet1 + sbet2)
+      sbetm2 = _sq(sbet1 + sbet2)
       # sin((bet1+bet2)/2)^2
       # =  (sbet1 + sbet2)^2 / ((sbet1 + sbet2)^2 + (cbet1 + cbet2)^2)
-      sbetm2 /= sbetm2 + Math.sq(cbet1 + cbet2)
+      sbetm2 /= sbetm2 + _sq(cbet1 + cbet2)
       dnm = math.sqrt(1 + self._ep2 * sbetm2)
       omg12 = lam12 / (self._f1 * dnm)
       somg12 = math.sin(omg12); comg12 = math.cos(omg12)
@@ -514,8 +538,8 @@ class Geodesic(object):
 
     salp1 = cbet2 * somg12
     calp1 = (
-      sbet12 + cbet2 * sbet1 * Math.sq(somg12) / (1 + comg12) if comg12 >= 0
-      else sbet12a - cbet2 * sbet1 * Math.sq(somg12) / (1 - comg12))
+      sbet12 + cbet2 * sbet1 * _sq(somg12) / (1 + comg12) if comg12 >= 0
+      else sbet12a - cbet2 * sbet1 * _sq(somg12) / (1 - comg12))
 
     ssig12 = math.hypot(salp1, calp1)
     csig12 = sbet1 * sbet2 + cbet1 * cbet2 * comg12
@@ -523,14 +547,14 @@ class Geodesic(object):
     if shortline and ssig12 < self._etol2:
       # really short lines
       salp2 = cbet1 * somg12
-      calp2 = sbet12 - cbet1 * sbet2 * (Math.sq(somg12) / (1 + comg12)
+      calp2 = sbet12 - cbet1 * sbet2 * (_sq(somg12) / (1 + comg12)
                                         if comg12 >= 0 else 1 - comg12)
-      salp2, calp2 = Math.norm(salp2, calp2)
+      salp2, calp2 = _norm(salp2, calp2)
       # Set return value
       sig12 = math.atan2(ssig12, csig12)
     elif (abs(self._n) >= 0.1 or # Skip astroid calc if too eccentric
           csig12 >= 0 or
-          ssig12 >= 6 * abs(self._n) * math.pi * Math.sq(cbet1)):
+          ssig12 >= 6 * abs(self._n) * math.pi * _sq(cbet1)):
       # Nothing to do, zeroth order spherical approximation is OK
       pass
     else:
@@ -544,7 +568,7 @@ class Geodesic(object):
       lam12x = math.atan2(-slam12, -clam12)
       if self.f >= 0:            # In fact f == 0 does not get here
         # x = dlong, y = dlat
-        k2 = Math.sq(sbet1) * self._ep2
+        k2 = _sq(sbet1) * self._ep2
         eps = k2 / (2 * (1 + math.sqrt(1 + k2)) + k2)
         lamscale = self.f * cbet1 * self._A3f(eps) * math.pi
         betscale = lamscale * cbet1
@@ -562,17 +586,17 @@ class Geodesic(object):
           cbet1, cbet2, Geodesic.REDUCEDLENGTH, C1a, C2a)
         x = -1 + m12b / (cbet1 * cbet2 * m0 * math.pi)
         betscale = (sbet12a / x if x < -0.01
-                    else -self.f * Math.sq(cbet1) * math.pi)
+                    else -self.f * _sq(cbet1) * math.pi)
         lamscale = betscale / cbet1
         y = lam12x / lamscale
 
       if y > -Geodesic.tol1_ and x > -1 - Geodesic.xthresh_:
         # strip near cut
         if self.f >= 0:
-          salp1 = min(1.0, -x); calp1 = - math.sqrt(1 - Math.sq(salp1))
+          salp1 = min(1.0, -x); calp1 = - math.sqrt(1 - _sq(salp1))
         else:
           calp1 = max((0.0 if x > -Geodesic.tol1_ else -1.0), x)
-          salp1 = math.sqrt(1 - Math.sq(calp1))
+          salp1 = math.sqrt(1 - _sq(calp1))
       else:
         # Estimate alp1, by solving the astroid problem.
         #
@@ -608,16 +632,16 @@ class Geodesic(object):
         #    6    56      0
         #
         # Because omg12 is near pi, estimate work with omg12a = pi - omg12
-        k = Geodesic._Astroid(x, y)
+        k = _Astroid(x, y)
         omg12a = lamscale * ( -x * k/(1 + k) if self.f >= 0
                               else -y * (1 + k)/k )
         somg12 = math.sin(omg12a); comg12 = -math.cos(omg12a)
         # Update spherical estimate of alp1 using omg12 instead of lam12
         salp1 = cbet2 * somg12
-        calp1 = sbet12a - cbet2 * sbet1 * Math.sq(somg12) / (1 - comg12)
+        calp1 = sbet12a - cbet2 * sbet1 * _sq(somg12) / (1 - comg12)
     # Sanity check on starting guess.  Backwards check allows NaN through.
     if not (salp1 <= 0):
-      salp1, calp1 = Math.norm(salp1, calp1)
+      salp1, calp1 = _norm(salp1, calp1)
     else:
       salp1 = 1; calp1 = 0
     return sig12, salp1, calp1, salp2, calp2, dnm
@@ -643,7 +667,7 @@ class Geodesic(object):
     # tan(omg1) = sin(alp0) * tan(sig1) = tan(omg1)=tan(alp1)*sin(bet1)
     ssig1 = sbet1; somg1 = salp0 * sbet1
     csig1 = comg1 = calp1 * cbet1
-    ssig1, csig1 = Math.norm(ssig1, csig1)
+    ssig1, csig1 = _norm(ssig1, csig1)
     # Math.norm(somg1, comg1); -- don't need to normalize!
 
     # Enforce symmetries in the case abs(bet2) = -bet1.  Need to be careful
@@ -655,7 +679,7 @@ class Geodesic(object):
     #       = sqrt(sq(calp0) - sq(sbet2)) / cbet2
     # and subst for calp0 and rearrange to give (choose positive sqrt
     # to give alp2 in [0, pi/2]).
-    calp2 = (math.sqrt(Math.sq(calp1 * cbet1) +
+    calp2 = (math.sqrt(_sq(calp1 * cbet1) +
                        ((cbet2 - cbet1) * (cbet1 + cbet2) if cbet1 < -sbet1
                         else (sbet1 - sbet2) * (sbet1 + sbet2))) / cbet2
              if cbet2 != cbet1 or abs(sbet2) != -sbet1 else abs(calp1))
@@ -663,7 +687,7 @@ class Geodesic(object):
     # tan(omg2) = sin(alp0) * tan(sig2).
     ssig2 = sbet2; somg2 = salp0 * sbet2
     csig2 = comg2 = calp2 * cbet2
-    ssig2, csig2 = Math.norm(ssig2, csig2)
+    ssig2, csig2 = _norm(ssig2, csig2)
     # Math.norm(somg2, comg2); -- don't need to normalize!
 
     # sig12 = sig2 - sig1, limit to [0, pi]
@@ -678,11 +702,11 @@ class Geodesic(object):
                      comg12 * clam120 + somg12 * slam120)
 
     # real B312
-    k2 = Math.sq(calp0) * self._ep2
+    k2 = _sq(calp0) * self._ep2
     eps = k2 / (2 * (1 + math.sqrt(1 + k2)) + k2)
     self._C3f(eps, C3a)
-    B312 = (Geodesic._SinCosSeries(True, ssig2, csig2, C3a) -
-            Geodesic._SinCosSeries(True, ssig1, csig1, C3a))
+    B312 = (_SinCosSeries(True, ssig2, csig2, C3a) -
+            _SinCosSeries(True, ssig1, csig1, C3a))
     domg12 =  -self.f * self._A3f(eps) * salp0 * (sig12 + B312)
     lam12 = eta + domg12
 
@@ -709,21 +733,21 @@ class Geodesic(object):
     # Compute longitude difference (AngDiff does this carefully).  Result is
     # in [-180, 180] but -180 is only for west-going geodesics.  180 is for
     # east-going and meridional geodesics.
-    lon12, lon12s = Math.AngDiff(lon1, lon2)
+    lon12, lon12s = _AngDiff(lon1, lon2)
     # Make longitude difference positive.
     lonsign = 1 if lon12 >= 0 else -1
     # If very close to being on the same half-meridian, then make it so.
-    lon12 = lonsign * Math.AngRound(lon12)
-    lon12s = Math.AngRound((180 - lon12) - lonsign * lon12s)
+    lon12 = lonsign * _AngRound(lon12)
+    lon12s = _AngRound((180 - lon12) - lonsign * lon12s)
     lam12 = math.radians(lon12)
     if lon12 > 90:
-      slam12, clam12 = Math.sincosd(lon12s); clam12 = -clam12
+      slam12, clam12 = _sincosd(lon12s); clam12 = -clam12
     else:
-      slam12, clam12 = Math.sincosd(lon12)
+      slam12, clam12 = _sincosd(lon12)
 
     # If really close to the equator, treat as on equator.
-    lat1 = Math.AngRound(Math.LatFix(lat1))
-    lat2 = Math.AngRound(Math.LatFix(lat2))
+    lat1 = _AngRound(_LatFix(lat1))
+    lat2 = _AngRound(_LatFix(lat2))
     # Swap points so that point with higher (abs) latitude is point 1
     # If one latitude is a nan, then it becomes lat1.
     swapp = -1 if abs(lat1) < abs(lat2) else 1
@@ -748,13 +772,13 @@ class Geodesic(object):
 
     # real phi, sbet1, cbet1, sbet2, cbet2, s12x, m12x
 
-    sbet1, cbet1 = Math.sincosd(lat1); sbet1 *= self._f1
+    sbet1, cbet1 = _sincosd(lat1); sbet1 *= self._f1
     # Ensure cbet1 = +epsilon at poles
-    sbet1, cbet1 = Math.norm(sbet1, cbet1); cbet1 = max(Geodesic.tiny_, cbet1)
+    sbet1, cbet1 = _norm(sbet1, cbet1); cbet1 = max(Geodesic.tiny_, cbet1)
 
-    sbet2, cbet2 = Math.sincosd(lat2); sbet2 *= self._f1
+    sbet2, cbet2 = _sincosd(lat2); sbet2 *= self._f1
     # Ensure cbet2 = +epsilon at poles
-    sbet2, cbet2 = Math.norm(sbet2, cbet2); cbet2 = max(Geodesic.tiny_, cbet2)
+    sbet2, cbet2 = _norm(sbet2, cbet2); cbet2 = max(Geodesic.tiny_, cbet2)
 
     # If cbet1 < -sbet1, then cbet2 - cbet1 is a sensitive measure of the
     # |bet1| - |bet2|.  Alternatively (cbet1 >= -sbet1), abs(sbet2) + sbet1 is
@@ -771,8 +795,8 @@ class Geodesic(object):
       if abs(sbet2) == -sbet1:
         cbet2 = cbet1
 
-    dn1 = math.sqrt(1 + self._ep2 * Math.sq(sbet1))
-    dn2 = math.sqrt(1 + self._ep2 * Math.sq(sbet2))
+    dn1 = math.sqrt(1 + self._ep2 * _sq(sbet1))
+    dn2 = math.sqrt(1 + self._ep2 * _sq(sbet2))
 
     # real a12, sig12, calp1, salp1, calp2, salp2
     # index zero elements of these arrays are unused
@@ -848,7 +872,7 @@ class Geodesic(object):
       if sig12 >= 0:
         # Short lines (InverseStart sets salp2, calp2, dnm)
         s12x = sig12 * self._b * dnm
-        m12x = (Math.sq(dnm) * self._b * math.sin(sig12 / dnm))
+        m12x = (_sq(dnm) * self._b * math.sin(sig12 / dnm))
         if outmask & Geodesic.GEODESICSCALE:
           M12 = M21 = math.cos(sig12 / dnm)
         a12 = math.degrees(sig12)
@@ -901,7 +925,7 @@ class Geodesic(object):
             if nsalp1 > 0 and abs(dalp1) < math.pi:
               calp1 = calp1 * cdalp1 - salp1 * sdalp1
               salp1 = nsalp1
-              salp1, calp1 = Math.norm(salp1, calp1)
+              salp1, calp1 = _norm(salp1, calp1)
               # In some regimes we don't get quadratic convergence because
               # slope -> 0.  So use convergence conditions based on epsilon
               # instead of sqrt(epsilon).
@@ -917,7 +941,7 @@ class Geodesic(object):
           # WGS84 and random input: mean = 4.74, sd = 0.99
           salp1 = (salp1a + salp1b)/2
           calp1 = (calp1a + calp1b)/2
-          salp1, calp1 = Math.norm(salp1, calp1)
+          salp1, calp1 = _norm(salp1, calp1)
           tripn = False
           tripb = (abs(salp1a - salp1) + (calp1a - calp1) < Geodesic.tolb_ or
                    abs(salp1 - salp1b) + (calp1 - calp1b) < Geodesic.tolb_)
@@ -957,16 +981,16 @@ class Geodesic(object):
         # From Lambda12: tan(bet) = tan(sig) * cos(alp)
         ssig1 = sbet1; csig1 = calp1 * cbet1
         ssig2 = sbet2; csig2 = calp2 * cbet2
-        k2 = Math.sq(calp0) * self._ep2
+        k2 = _sq(calp0) * self._ep2
         eps = k2 / (2 * (1 + math.sqrt(1 + k2)) + k2)
         # Multiplier = a^2 * e^2 * cos(alpha0) * sin(alpha0).
-        A4 = Math.sq(self.a) * calp0 * salp0 * self._e2
-        ssig1, csig1 = Math.norm(ssig1, csig1)
-        ssig2, csig2 = Math.norm(ssig2, csig2)
+        A4 = _sq(self.a) * calp0 * salp0 * self._e2
+        ssig1, csig1 = _norm(ssig1, csig1)
+        ssig2, csig2 = _norm(ssig2, csig2)
         C4a = list(range(Geodesic.nC4_))
         self._C4f(eps, C4a)
-        B41 = Geodesic._SinCosSeries(False, ssig1, csig1, C4a)
-        B42 = Geodesic._SinCosSeries(False, ssig2, csig2, C4a)
+        B41 = _SinCosSeries(False, ssig1, csig1, C4a)
+        B42 = _SinCosSeries(False, ssig2, csig2, C4a)
         S12 = A4 * (B42 - B41)
       else:
         # Avoid problems with indeterminate sig1, sig2 on equator
@@ -1036,30 +1060,57 @@ class Geodesic(object):
       lat1, lon1, lat2, lon2, outmask)
     outmask &= Geodesic.OUT_MASK
     if outmask & Geodesic.LONG_UNROLL:
-      lon12, e = Math.AngDiff(lon1, lon2)
+      lon12, e = _AngDiff(lon1, lon2)
       lon2 = (lon1 + lon12) + e
     else:
-      lon2 = Math.AngNormalize(lon2)
-    result = {'lat1': Math.LatFix(lat1),
+      lon2 = _AngNormalize(lon2)
+    result = {'lat1': _LatFix(lat1),
               'lon1': lon1 if outmask & Geodesic.LONG_UNROLL else
-              Math.AngNormalize(lon1),
-              'lat2': Math.LatFix(lat2),
+              _AngNormalize(lon1),
+              'lat2': _LatFix(lat2),
               'lon2': lon2}
     result['a12'] = a12
     if outmask & Geodesic.DISTANCE: result['s12'] = s12
     if outmask & Geodesic.AZIMUTH:
-      result['azi1'] = Math.atan2d(salp1, calp1)
-      result['azi2'] = Math.atan2d(salp2, calp2)
+      result['azi1'] = _atan2d(salp1, calp1)
+      result['azi2'] = _atan2d(salp2, calp2)
     if outmask & Geodesic.REDUCEDLENGTH: result['m12'] = m12
     if outmask & Geodesic.GEODESICSCALE:
       result['M12'] = M12; result['M21'] = M21
     if outmask & Geodesic.AREA: result['S12'] = S12
     return result
 
+  def InverseTuple(self, lat1, lon1, lat2, lon2,
+                   outmask = GeodesicCapability.STANDARD):
+    """Solve the inverse geodesic problem returning a tuple
+
+    :param lat1: latitude of the first point in degrees
+    :param lon1: longitude of the first point in degrees
+    :param lat2: latitude of the second point in degrees
+    :param lon2: longitude of the second point in degrees
+    :param outmask: the :ref:`output mask <outmask>`
+    :return: a tuple of *a12* followed by those of *s12*, *azi1*, *azi2*,
+      *m12*, *M12*, *M21*, *S12* selected by *outmask*
+
+    This is the same as :meth:`Inverse` without building a dict, e.g.,
+    with *outmask* = AZIMUTH | DISTANCE the result is (*a12*, *s12*,
+    *azi1*, *azi2*).
+
+    """
+
+    a12, s12, salp1,calp1, salp2,calp2, m12, M12, M21, S12 = self._GenInverse(
+      lat1, lon1, lat2, lon2, outmask)
+    if outmask & Geodesic.OUT_MASK & Geodesic.AZIMUTH:
+      azi1 = _atan2d(salp1, calp1); azi2 = _atan2d(salp2, calp2)
+    else:
+      azi1 = azi2 = Math.nan
+    return GeodesicCapability._Selector(
+      GeodesicCapability.INVERSE_FIELDS, outmask)(
+        (a12, s12, azi1, azi2, m12, M12, M21, S12))
+
   # return a12, lat2, lon2, azi2, s12, m12, M12, M21, S12
   def _GenDirect(self, lat1, lon1, azi1, arcmode, s12_a12, outmask):
     """Private: General version of direct problem"""
-    from geographiclib.geodesicline import GeodesicLine
     # Automatically supply DISTANCE_IN if necessary
     if not arcmode: outmask |= Geodesic.DISTANCE_IN
     line = GeodesicLine(self, lat1, lon1, azi1, outmask)
@@ -1087,10 +1138,10 @@ class Geodesic(object):
     a12, lat2, lon2, azi2, s12, m12, M12, M21, S12 = self._GenDirect(
       lat1, lon1, azi1, False, s12, outmask)
     outmask &= Geodesic.OUT_MASK
-    result = {'lat1': Math.LatFix(lat1),
+    result = {'lat1': _LatFix(lat1),
               'lon1': lon1 if outmask & Geodesic.LONG_UNROLL else
-              Math.AngNormalize(lon1),
-              'azi1': Math.AngNormalize(azi1),
+              _AngNormalize(lon1),
+              'azi1': _AngNormalize(azi1),
               's12': s12}
     result['a12'] = a12
     if outmask & Geodesic.LATITUDE: result['lat2'] = lat2
@@ -1102,6 +1153,29 @@ class Geodesic(object):
     if outmask & Geodesic.AREA: result['S12'] = S12
     return result
 
+  def DirectTuple(self, lat1, lon1, azi1, s12,
+                  outmask = GeodesicCapability.STANDARD):
+    """Solve the direct geodesic problem returning a tuple
+
+    :param lat1: latitude of the first point in degrees
+    :param lon1: longitude of the first point in degrees
+    :param azi1: azimuth at the first point in degrees
+    :param s12: the distance from the first point to the second in
+      meters
+    :param outmask: the :ref:`output mask <outmask>`
+    :return: a tuple of *a12* followed by those of *lat2*, *lon2*, *azi2*,
+      *s12*, *m12*, *M12*, *M21*, *S12* selected by *outmask*
+
+    This is the same as :meth:`Direct` without building a dict, e.g.,
+    with *outmask* = LATITUDE | LONGITUDE the result is (*a12*, *lat2*,
+    *lon2*).
+
+    """
+
+    return GeodesicCapability._Selector(
+      GeodesicCapability.POSITION_FIELDS, outmask)(
+        self._GenDirect(lat1, lon1, azi1, False, s12, outmask))
+
   def ArcDirect(self, lat1, lon1, azi1, a12,
                 outmask = GeodesicCapability.STANDARD):
     """Solve the direct geodesic problem in terms of spherical arc length
@@ -1124,10 +1198,10 @@ class Geodesic(object):
     a12, lat2, lon2, azi2, s12, m12, M12, M21, S12 = self._GenDirect(
       lat1, lon1, azi1, True, a12, outmask)
     outmask &= Geodesic.OUT_MASK
-    result = {'lat1': Math.LatFix(lat1),
+    result = {'lat1': _LatFix(lat1),
               'lon1': lon1 if outmask & Geodesic.LONG_UNROLL else
-              Math.AngNormalize(lon1),
-              'azi1': Math.AngNormalize(azi1),
+              _AngNormalize(lon1),
+              'azi1': _AngNormalize(azi1),
               'a12': a12}
     if outmask & Geodesic.DISTANCE: result['s12'] = s12
     if outmask & Geodesic.LATITUDE: result['lat2'] = lat2
@@ -1157,14 +1231,12 @@ class Geodesic(object):
 
     """
 
-    from geographiclib.geodesicline import GeodesicLine
     return GeodesicLine(self, lat1, lon1, azi1, caps)
 
   def _GenDirectLine(self, lat1, lon1, azi1, arcmode, s12_a12,
                      caps = GeodesicCapability.STANDARD |
                      GeodesicCapability.DISTANCE_IN):
     """Private: general form of DirectLine"""
-    from geographiclib.geodesicline import GeodesicLine
     # Automatically supply DISTANCE_IN if necessary
     if not arcmode: caps |= Geodesic.DISTANCE_IN
     line = GeodesicLine(self, lat1, lon1, azi1, caps)
@@ -1239,10 +1311,9 @@ class Geodesic(object):
 
     """
 
-    from geographiclib.geodesicline import GeodesicLine
     a12, _, salp1, calp1, _, _, _, _, _, _ = self._GenInverse(
       lat1, lon1, lat2, lon2, 0)
-    azi1 = Math.atan2d(salp1, calp1)
+    azi1 = _atan2d(salp1, calp1)
     if caps & (Geodesic.OUT_MASK & Geodesic.DISTANCE_IN):
       caps |= Geodesic.DISTANCE
     line = GeodesicLine(self, lat1, lon1, azi1, caps, salp1, calp1)
@@ -1258,9 +1329,78 @@ class Geodesic(object):
 
     """
 
-    from geographiclib.polygonarea import PolygonArea
     return PolygonArea(self, polyline)
 
+  def InverseMany(self, problems, outmask = GeodesicCapability.STANDARD,
+                  workers = None, chunksize = 1000):
+    """Solve many inverse geodesic problems on a pool of processes
+
+    :param problems: an iterable of (*lat1*, *lon1*, *lat2*, *lon2*)
+      tuples in degrees
+    :param outmask: the :ref:`output mask <outmask>`
+    :param workers: the number of processes, None for one per CPU; with 1
+      the problems are solved in this process
+    :param chunksize: the number of problems sent to a process at once
+    :return: an iterator over the tuples returned by :meth:`InverseTuple`,
+      in the order of *problems*
+
+    Each process builds its own copy of this ellipsoid once.  *problems*
+    is read lazily and at most 2 * *workers* chunks are in flight, so it
+    can be a generator over more problems than fit in memory.  Where
+    processes are spawned rather than forked (Windows, macOS) the caller's
+    main module must be importable, i.e., guarded by if __name__ ==
+    '__main__'.
+
+    """
+
+    return self._Many(_InverseChunk, problems, outmask, workers, chunksize)
+
+  def DirectMany(self, problems, outmask = GeodesicCapability.STANDARD,
+                 workers = None, chunksize = 1000):
+    """Solve many direct geodesic problems on a pool of processes
+
+    :param problems: an iterable of (*lat1*, *lon1*, *azi1*, *s12*)
+      tuples, angles in degrees and distances in meters
+    :param outmask: the :ref:`output mask <outmask>`
+    :param workers: the number of processes, None for one per CPU; with 1
+      the problems are solved in this process
+    :param chunksize: the number of problems sent to a process at once
+    :return: an iterator over the tuples returned by :meth:`DirectTuple`,
+      in the order of *problems*
+
+    See :meth:`InverseMany` for how the work is shared.
+
+    """
+
+    return self._Many(_DirectChunk, problems, outmask, workers, chunksize)
+
+  def _Many(self, solve, problems, outmask, workers, chunksize):
+    """Private: solve chunks of problems on a pool of processes"""
+    if workers is None:
+      workers = multiprocessing.cpu_count()
+    problems = iter(problems)
+    chunks = iter(lambda: list(islice(problems, chunksize)), [])
+    if workers <= 1:
+      for chunk in chunks:
+        for result in solve(outmask, chunk, self):
+          yield result
+      return
+    pool = multiprocessing.Pool(workers, _InitWorker, (self.a, self.f))
+    try:
+      pending = deque()
+      for chunk in chunks:
+        pending.append(pool.apply_async(solve, (outmask, chunk)))
+        if len(pending) >= 2 * workers:
+          for result in pending.popleft().get():
+            yield result
+      while pending:
+        for result in pending.popleft().get():
+          yield result
+    finally:
+      # also stops the workers when the caller abandons the iterator
+      pool.terminate()
+      pool.join()
+
   EMPTY         = GeodesicCapability.EMPTY
   """No capabilities, no output."""
   LATITUDE      = GeodesicCapability.LATITUDE
@@ -1292,3 +1432,38 @@ class Geodesic(object):
 
 Geodesic.WGS84 = Geodesic(Constants.WGS84_a, Constants.WGS84_f)
 """Instantiation for the WGS84 ellipsoid"""
+
+# Module level names for the series helpers, saving the class attribute
+# lookup on each call.
+_A1m1f = Geodesic._A1m1f
+_A2m1f = Geodesic._A2m1f
+_Astroid = Geodesic._Astroid
+_C1f = Geodesic._C1f
+_C2f = Geodesic._C2f
+_SinCosSeries = Geodesic._SinCosSeries
+
+# The ellipsoid of a worker process of InverseMany and DirectMany, built once
+# by _InitWorker.
+_worker_geodesic = None
+
+def _InitWorker(a, f):
+  """Private: build the ellipsoid of a worker process"""
+  global _worker_geodesic
+  _worker_geodesic = Geodesic(a, f)
+
+def _InverseChunk(outmask, chunk, geod = None):
+  """Private: solve a chunk of inverse problems"""
+  inverse = (geod or _worker_geodesic).InverseTuple
+  return [inverse(lat1, lon1, lat2, lon2, outmask)
+          for lat1, lon1, lat2, lon2 in chunk]
+
+def _DirectChunk(outmask, chunk, geod = None):
+  """Private: solve a chunk of direct problems"""
+  direct = (geod or _worker_geodesic).DirectTuple
+  return [direct(lat1, lon1, azi1, s12, outmask)
+          for lat1, lon1, azi1, s12 in chunk]
+
+# Imported here, once Geodesic is defined, because these modules import
+# Geodesic in turn.
+from geographiclib.geodesicline import GeodesicLine
+from geographiclib.polygonarea import PolygonArea
@@ -12,6 +12,8 @@
 # https://geographiclib.sourceforge.io/
 ######################################################################
 
+from operator import itemgetter
+
 class GeodesicCapability(object):
   """
   Capability constants shared between Geodesic and GeodesicLine.
@@ -39,3 +41,29 @@ class GeodesicCapability(object):
   AREA          = 1 << 14 | CAP_C4
   LONG_UNROLL   = 1 << 15
   ALL           = OUT_ALL | CAP_ALL # Does not include LONG_UNROLL
+
+  # The fields of the tuples returned by Geodesic.InverseTuple and by
+  # Geodesic.DirectTuple/GeodesicLine.PositionTuple given as the output bit
+  # which selects each one; a12 (0) is always returned.
+  INVERSE_FIELDS = (0, DISTANCE, AZIMUTH, AZIMUTH, REDUCEDLENGTH,
+                    GEODESICSCALE, GEODESICSCALE, AREA)
+  POSITION_FIELDS = (0, LATITUDE, LONGITUDE, AZIMUTH, DISTANCE, REDUCEDLENGTH,
+                     GEODESICSCALE, GEODESICSCALE, AREA)
+
+  # Threads racing on a new key at worst build the same selector twice.
+  _selectors = {}
+
+  def _Selector(fields, outmask):
+    """Private: return a function picking the fields requested by outmask"""
+    key = (fields, outmask & GeodesicCapability.OUT_MASK)
+    selector = GeodesicCapability._selectors.get(key)
+    if selector is None:
+      index = [i for i, m in enumerate(fields)
+               if m & GeodesicCapability.OUT_MASK & outmask or m == 0]
+      if len(index) == 1:
+        selector = lambda t: (t[0],)
+      else:
+        selector = itemgetter(*index)
+      GeodesicCapability._selectors[key] = selector
+    return selector
+  _Selector = staticmethod(_Selector)
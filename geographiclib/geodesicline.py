@@ -57,12 +57,35 @@ The public attributes for this class are
 ######################################################################
 
 import math
+from array import array
 from geographiclib.geomath import Math
 from geographiclib.geodesiccapability import GeodesicCapability
 
+# Math helpers bound once, see geodesic.py
+_AngNormalize = Math.AngNormalize
+_AngRound = Math.AngRound
+_LatFix = Math.LatFix
+_atan2d = Math.atan2d
+_copysign = Math.copysign
+_isnan = Math.isnan
+_norm = Math.norm
+_sincosd = Math.sincosd
+_sq = Math.sq
+
 class GeodesicLine(object):
   """Points on a geodesic path"""
 
+  # Lines are often cached in large numbers, so do without a per-instance
+  # dict and keep the series coefficients in arrays of doubles.  Apart
+  # from SetDistance and SetArc only __init__ writes the state, so a line
+  # can be shared between threads.
+  __slots__ = ('a', 'f', '_b', '_c2', '_f1', 'caps',
+               'lat1', 'lon1', 'azi1', 'salp1', 'calp1',
+               '_dn1', '_salp0', '_calp0', '_ssig1', '_somg1', '_csig1',
+               '_comg1', '_k2', '_A1m1', '_C1a', '_B11', '_stau1', '_ctau1',
+               '_C1pa', '_A2m1', '_C2a', '_B21', '_C3a', '_A3c', '_B31',
+               '_C4a', '_A4', '_B41', 's13', 'a13')
+
   def __init__(self, geod, lat1, lon1, azi1,
                caps = GeodesicCapability.STANDARD |
                GeodesicCapability.DISTANCE_IN,
@@ -83,7 +106,6 @@ class GeodesicLine(object):
 
     """
 
-    from geographiclib.geodesic import Geodesic
     self.a = geod.a
     """The equatorial radius in meters (readonly)"""
     self.f = geod.f
@@ -96,13 +118,13 @@ class GeodesicLine(object):
     """the capabilities (readonly)"""
 
     # Guard against underflow in salp0
-    self.lat1 = Math.LatFix(lat1)
+    self.lat1 = _LatFix(lat1)
     """the latitude of the first point in degrees (readonly)"""
     self.lon1 = lon1
     """the longitude of the first point in degrees (readonly)"""
-    if Math.isnan(salp1) or Math.isnan(calp1):
-      self.azi1 = Math.AngNormalize(azi1)
-      self.salp1, self.calp1 = Math.sincosd(Math.AngRound(azi1))
+    if _isnan(salp1) or _isnan(calp1):
+      self.azi1 = _AngNormalize(azi1)
+      self.salp1, self.calp1 = _sincosd(_AngRound(azi1))
     else:
       self.azi1 = azi1
       """the azimuth at the first point in degrees (readonly)"""
@@ -112,10 +134,10 @@ class GeodesicLine(object):
       """the cosine of the azimuth at the first point (readonly)"""
 
     # real cbet1, sbet1
-    sbet1, cbet1 = Math.sincosd(Math.AngRound(lat1)); sbet1 *= self._f1
+    sbet1, cbet1 = _sincosd(_AngRound(lat1)); sbet1 *= self._f1
     # Ensure cbet1 = +epsilon at poles
-    sbet1, cbet1 = Math.norm(sbet1, cbet1); cbet1 = max(Geodesic.tiny_, cbet1)
-    self._dn1 = math.sqrt(1 + geod._ep2 * Math.sq(sbet1))
+    sbet1, cbet1 = _norm(sbet1, cbet1); cbet1 = max(Geodesic.tiny_, cbet1)
+    self._dn1 = math.sqrt(1 + geod._ep2 * _sq(sbet1))
 
     # Evaluate alp0 from sin(alp1) * cos(bet1) = sin(alp0),
     self._salp0 = self.salp1 * cbet1 # alp0 in [0, pi/2 - |bet1|]
@@ -135,18 +157,18 @@ class GeodesicLine(object):
     self._csig1 = self._comg1 = (cbet1 * self.calp1
                                  if sbet1 != 0 or self.calp1 != 0 else 1)
     # sig1 in (-pi, pi]
-    self._ssig1, self._csig1 = Math.norm(self._ssig1, self._csig1)
+    self._ssig1, self._csig1 = _norm(self._ssig1, self._csig1)
     # No need to normalize
     # self._somg1, self._comg1 = Math.norm(self._somg1, self._comg1)
 
-    self._k2 = Math.sq(self._calp0) * geod._ep2
+    self._k2 = _sq(self._calp0) * geod._ep2
     eps = self._k2 / (2 * (1 + math.sqrt(1 + self._k2)) + self._k2)
 
     if self.caps & Geodesic.CAP_C1:
-      self._A1m1 = Geodesic._A1m1f(eps)
-      self._C1a = list(range(Geodesic.nC1_ + 1))
-      Geodesic._C1f(eps, self._C1a)
-      self._B11 = Geodesic._SinCosSeries(
+      self._A1m1 = _A1m1f(eps)
+      self._C1a = array('d', [0.0]) * (Geodesic.nC1_ + 1)
+      _C1f(eps, self._C1a)
+      self._B11 = _SinCosSeries(
         True, self._ssig1, self._csig1, self._C1a)
       s = math.sin(self._B11); c = math.cos(self._B11)
       # tau1 = sig1 + B11
@@ -156,29 +178,29 @@ class GeodesicLine(object):
       #    _B11 = -_SinCosSeries(true, _stau1, _ctau1, _C1pa)
 
     if self.caps & Geodesic.CAP_C1p:
-      self._C1pa = list(range(Geodesic.nC1p_ + 1))
-      Geodesic._C1pf(eps, self._C1pa)
+      self._C1pa = array('d', [0.0]) * (Geodesic.nC1p_ + 1)
+      _C1pf(eps, self._C1pa)
 
     if self.caps & Geodesic.CAP_C2:
-      self._A2m1 = Geodesic._A2m1f(eps)
-      self._C2a = list(range(Geodesic.nC2_ + 1))
-      Geodesic._C2f(eps, self._C2a)
-      self._B21 = Geodesic._SinCosSeries(
+      self._A2m1 = _A2m1f(eps)
+      self._C2a = array('d', [0.0]) * (Geodesic.nC2_ + 1)
+      _C2f(eps, self._C2a)
+      self._B21 = _SinCosSeries(
         True, self._ssig1, self._csig1, self._C2a)
 
     if self.caps & Geodesic.CAP_C3:
-      self._C3a = list(range(Geodesic.nC3_))
+      self._C3a = array('d', [0.0]) * (Geodesic.nC3_)
       geod._C3f(eps, self._C3a)
       self._A3c = -self.f * self._salp0 * geod._A3f(eps)
-      self._B31 = Geodesic._SinCosSeries(
+      self._B31 = _SinCosSeries(
         True, self._ssig1, self._csig1, self._C3a)
 
     if self.caps & Geodesic.CAP_C4:
-      self._C4a = list(range(Geodesic.nC4_))
+      self._C4a = array('d', [0.0]) * (Geodesic.nC4_)
       geod._C4f(eps, self._C4a)
       # Multiplier = a^2 * e^2 * cos(alpha0) * sin(alpha0)
-      self._A4 = Math.sq(self.a) * self._calp0 * self._salp0 * geod._e2
-      self._B41 = Geodesic._SinCosSeries(
+      self._A4 = _sq(self.a) * self._calp0 * self._salp0 * geod._e2
+      self._B41 = _SinCosSeries(
         False, self._ssig1, self._csig1, self._C4a)
     self.s13 = Math.nan
     """the distance between point 1 and point 3 in meters (readonly)"""
@@ -188,7 +210,6 @@ class GeodesicLine(object):
   # return a12, lat2, lon2, azi2, s12, m12, M12, M21, S12
   def _GenPosition(self, arcmode, s12_a12, outmask):
     """Private: General solution of position along geodesic"""
-    from geographiclib.geodesic import Geodesic
     a12 = lat2 = lon2 = azi2 = s12 = m12 = M12 = M21 = S12 = Math.nan
     outmask &= self.caps & Geodesic.OUT_MASK
     if not (arcmode or
@@ -201,13 +222,13 @@ class GeodesicLine(object):
     if arcmode:
       # Interpret s12_a12 as spherical arc length
       sig12 = math.radians(s12_a12)
-      ssig12, csig12 = Math.sincosd(s12_a12)
+      ssig12, csig12 = _sincosd(s12_a12)
     else:
       # Interpret s12_a12 as distance
       tau12 = s12_a12 / (self._b * (1 + self._A1m1))
       s = math.sin(tau12); c = math.cos(tau12)
       # tau2 = tau1 + tau12
-      B12 = - Geodesic._SinCosSeries(True,
+      B12 = - _SinCosSeries(True,
                                     self._stau1 * c + self._ctau1 * s,
                                     self._ctau1 * c - self._stau1 * s,
                                     self._C1pa)
@@ -237,10 +258,10 @@ class GeodesicLine(object):
         #      1/5   157e6 3.8e9 280e6
         ssig2 = self._ssig1 * csig12 + self._csig1 * ssig12
         csig2 = self._csig1 * csig12 - self._ssig1 * ssig12
-        B12 = Geodesic._SinCosSeries(True, ssig2, csig2, self._C1a)
+        B12 = _SinCosSeries(True, ssig2, csig2, self._C1a)
         serr = ((1 + self._A1m1) * (sig12 + (B12 - self._B11)) -
                 s12_a12 / self._b)
-        sig12 = sig12 - serr / math.sqrt(1 + self._k2 * Math.sq(ssig2))
+        sig12 = sig12 - serr / math.sqrt(1 + self._k2 * _sq(ssig2))
         ssig12 = math.sin(sig12); csig12 = math.cos(sig12)
         # Update B12 below
 
@@ -249,11 +270,11 @@ class GeodesicLine(object):
     # sig2 = sig1 + sig12
     ssig2 = self._ssig1 * csig12 + self._csig1 * ssig12
     csig2 = self._csig1 * csig12 - self._ssig1 * ssig12
-    dn2 = math.sqrt(1 + self._k2 * Math.sq(ssig2))
+    dn2 = math.sqrt(1 + self._k2 * _sq(ssig2))
     if outmask & (
       Geodesic.DISTANCE | Geodesic.REDUCEDLENGTH | Geodesic.GEODESICSCALE):
       if arcmode or abs(self.f) > 0.01:
-        B12 = Geodesic._SinCosSeries(True, ssig2, csig2, self._C1a)
+        B12 = _SinCosSeries(True, ssig2, csig2, self._C1a)
       AB1 = (1 + self._A1m1) * (B12 - self._B11)
     # sin(bet2) = cos(alp0) * sin(sig2)
     sbet2 = self._calp0 * ssig2
@@ -271,7 +292,7 @@ class GeodesicLine(object):
     if outmask & Geodesic.LONGITUDE:
       # tan(omg2) = sin(alp0) * tan(sig2)
       somg2 = self._salp0 * ssig2; comg2 = csig2 # No need to normalize
-      E = Math.copysign(1, self._salp0)          # East or west going?
+      E = _copysign(1, self._salp0)          # East or west going?
       # omg12 = omg2 - omg1
       omg12 = (E * (sig12
                     - (math.atan2(          ssig2,       csig2) -
@@ -282,21 +303,21 @@ class GeodesicLine(object):
                else math.atan2(somg2 * self._comg1 - comg2 * self._somg1,
                                comg2 * self._comg1 + somg2 * self._somg1))
       lam12 = omg12 + self._A3c * (
-        sig12 + (Geodesic._SinCosSeries(True, ssig2, csig2, self._C3a)
+        sig12 + (_SinCosSeries(True, ssig2, csig2, self._C3a)
                  - self._B31))
       lon12 = math.degrees(lam12)
       lon2 = (self.lon1 + lon12 if outmask & Geodesic.LONG_UNROLL else
-              Math.AngNormalize(Math.AngNormalize(self.lon1) +
-                                Math.AngNormalize(lon12)))
+              _AngNormalize(_AngNormalize(self.lon1) +
+                                _AngNormalize(lon12)))
 
     if outmask & Geodesic.LATITUDE:
-      lat2 = Math.atan2d(sbet2, self._f1 * cbet2)
+      lat2 = _atan2d(sbet2, self._f1 * cbet2)
 
     if outmask & Geodesic.AZIMUTH:
-      azi2 = Math.atan2d(salp2, calp2)
+      azi2 = _atan2d(salp2, calp2)
 
     if outmask & (Geodesic.REDUCEDLENGTH | Geodesic.GEODESICSCALE):
-      B22 = Geodesic._SinCosSeries(True, ssig2, csig2, self._C2a)
+      B22 = _SinCosSeries(True, ssig2, csig2, self._C2a)
       AB2 = (1 + self._A2m1) * (B22 - self._B21)
       J12 = (self._A1m1 - self._A2m1) * sig12 + (AB1 - AB2)
       if outmask & Geodesic.REDUCEDLENGTH:
@@ -312,7 +333,7 @@ class GeodesicLine(object):
         M21 = csig12 - (t * self._ssig1 - self._csig1 * J12) * ssig2 / dn2
 
     if outmask & Geodesic.AREA:
-      B42 = Geodesic._SinCosSeries(False, ssig2, csig2, self._C4a)
+      B42 = _SinCosSeries(False, ssig2, csig2, self._C4a)
       # real salp12, calp12
       if self._calp0 == 0 or self._salp0 == 0:
         # alp12 = alp2 - alp1, used in atan2 so no need to normalize
@@ -330,8 +351,8 @@ class GeodesicLine(object):
         salp12 = self._calp0 * self._salp0 * (
           self._csig1 * (1 - csig12) + ssig12 * self._ssig1 if csig12 <= 0
           else ssig12 * (self._csig1 * ssig12 / (1 + csig12) + self._ssig1))
-        calp12 = (Math.sq(self._salp0) +
-                  Math.sq(self._calp0) * self._csig1 * csig2)
+        calp12 = (_sq(self._salp0) +
+                  _sq(self._calp0) * self._csig1 * csig2)
       S12 = (self._c2 * math.atan2(salp12, calp12) +
              self._A4 * (B42 - self._B41))
 
@@ -353,10 +374,9 @@ class GeodesicLine(object):
 
     """
 
-    from geographiclib.geodesic import Geodesic
     result = {'lat1': self.lat1,
               'lon1': self.lon1 if outmask & Geodesic.LONG_UNROLL else
-              Math.AngNormalize(self.lon1),
+              _AngNormalize(self.lon1),
               'azi1': self.azi1, 's12': s12}
     a12, lat2, lon2, azi2, s12, m12, M12, M21, S12 = self._GenPosition(
       False, s12, outmask)
@@ -371,6 +391,25 @@ class GeodesicLine(object):
     if outmask & Geodesic.AREA: result['S12'] = S12
     return result
 
+  def PositionTuple(self, s12, outmask = GeodesicCapability.STANDARD):
+    """Find the position on the line given *s12* returning a tuple
+
+    :param s12: the distance from the first point to the second in
+      meters
+    :param outmask: the :ref:`output mask <outmask>`
+    :return: a tuple of *a12* followed by those of *lat2*, *lon2*, *azi2*,
+      *s12*, *m12*, *M12*, *M21*, *S12* selected by *outmask*
+
+    This is the same as :meth:`Position` without building a dict, e.g.,
+    with *outmask* = LATITUDE | LONGITUDE the result is (*a12*, *lat2*,
+    *lon2*).
+
+    """
+
+    return GeodesicCapability._Selector(
+      GeodesicCapability.POSITION_FIELDS, outmask)(
+        self._GenPosition(False, s12, outmask))
+
   def ArcPosition(self, a12, outmask = GeodesicCapability.STANDARD):
     """Find the position on the line given *a12*
 
@@ -385,10 +424,9 @@ class GeodesicLine(object):
 
     """
 
-    from geographiclib.geodesic import Geodesic
     result = {'lat1': self.lat1,
               'lon1': self.lon1 if outmask & Geodesic.LONG_UNROLL else
-              Math.AngNormalize(self.lon1),
+              _AngNormalize(self.lon1),
               'azi1': self.azi1, 'a12': a12}
     a12, lat2, lon2, azi2, s12, m12, M12, M21, S12 = self._GenPosition(
       True, a12, outmask)
@@ -420,7 +458,16 @@ class GeodesicLine(object):
 
     """
 
-    from geographiclib.geodesic import Geodesic
     self.a13 = a13
     _, _, _, _, self.s13, _, _, _, _ = self._GenPosition(True, self.a13,
                                                          Geodesic.DISTANCE)
+
+# Imported here rather than at the top, and rather than in each method, since
+# geodesic.py imports this module in turn.
+from geographiclib.geodesic import Geodesic
+_A1m1f = Geodesic._A1m1f
+_A2m1f = Geodesic._A2m1f
+_C1f = Geodesic._C1f
+_C1pf = Geodesic._C1pf
+_C2f = Geodesic._C2f
+_SinCosSeries = Geodesic._SinCosSeries
@@ -14,6 +14,10 @@
 import sys
 import math
 
+# The routines missing from python 2.5.2 are chosen once, here, rather than
+# checking sys.version_info on every call.
+_modern = sys.version_info > (2, 6)
+
 class Math(object):
   """
   Additional math routines for GeographicLib.
@@ -31,8 +35,8 @@ class Math(object):
   epsilon = math.pow(2.0, 1-digits)
   minval = math.pow(2.0, -1022)
   maxval = math.pow(2.0, 1023) * (2 - epsilon)
-  inf = float("inf") if sys.version_info > (2, 6) else 2 * maxval
-  nan = float("nan") if sys.version_info > (2, 6) else inf - inf
+  inf = float("inf") if _modern else 2 * maxval
+  nan = float("nan") if _modern else inf - inf
 
   def sq(x):
     """Square a number"""
@@ -50,9 +54,6 @@ class Math(object):
   def log1p(x):
     """log(1 + x) accurate for small x (missing from python 2.5.2)"""
 
-    if sys.version_info > (2, 6):
-      return math.log1p(x)
-
     y = 1 + x
     z = y - 1
     # Here's the explanation for this magic: y = 1 + z, exactly, and z
@@ -60,27 +61,21 @@ class Math(object):
     # a good approximation to the true log(1 + x)/x.  The multiplication x *
     # (log(y)/z) introduces little additional error.
     return x if z == 0 else x * math.log(y) / z
-  log1p = staticmethod(log1p)
+  log1p = staticmethod(math.log1p if _modern else log1p)
 
   def atanh(x):
     """atanh(x) (missing from python 2.5.2)"""
 
-    if sys.version_info > (2, 6):
-      return math.atanh(x)
-
     y = abs(x)                  # Enforce odd parity
     y = Math.log1p(2 * y/(1 - y))/2
     return -y if x < 0 else y
-  atanh = staticmethod(atanh)
+  atanh = staticmethod(math.atanh if _modern else atanh)
 
   def copysign(x, y):
     """return x with the sign of y (missing from python 2.5.2)"""
 
-    if sys.version_info > (2, 6):
-      return math.copysign(x, y)
-
     return math.fabs(x) * (-1 if y < 0 or (y == 0 and 1/y < 0) else 1)
-  copysign = staticmethod(copysign)
+  copysign = staticmethod(math.copysign if _modern else copysign)
 
   def norm(x, y):
     """Private: Normalize a two-vector."""
@@ -147,16 +142,17 @@ class Math(object):
   def AngDiff(x, y):
     """compute y - x and reduce to [-180,180] accurately"""
 
-    d, t = Math.sum(Math.AngNormalize(-x), Math.AngNormalize(y))
-    d = Math.AngNormalize(d)
-    return Math.sum(-180 if d == 180 and t > 0 else d, t)
+    d, t = _sum(_AngNormalize(-x), _AngNormalize(y))
+    d = _AngNormalize(d)
+    return _sum(-180 if d == 180 and t > 0 else d, t)
   AngDiff = staticmethod(AngDiff)
 
   def sincosd(x):
     """Compute sine and cosine of x in degrees."""
 
     r = math.fmod(x, 360)
-    q = Math.nan if Math.isnan(r) else int(math.floor(r / 90 + 0.5))
+    # r != r is the nan test, without a call
+    q = Math.nan if r != r else int(math.floor(r / 90 + 0.5))
     r -= 90 * q; r = math.radians(r)
     s = math.sin(r); c = math.cos(r)
     q = q % 4
@@ -202,5 +198,10 @@ class Math(object):
   def isnan(x):
     """Test if nan"""
 
-    return math.isnan(x) if sys.version_info > (2, 6) else x != x
-  isnan = staticmethod(isnan)
+    return x != x
+  isnan = staticmethod(math.isnan if _modern else isnan)
+
+# Module level names for the helpers called within this module, saving the
+# class attribute lookup on each call.
+_sum = Math.sum
+_AngNormalize = Math.AngNormalize
@@ -48,17 +48,28 @@ import math
 from geographiclib.geomath import Math
 from geographiclib.accumulator import Accumulator
 
+# Math helpers bound once, see geodesic.py
+_AngDiff = Math.AngDiff
+_AngNormalize = Math.AngNormalize
+
 class PolygonArea(object):
   """Area of a geodesic polygon"""
 
+  # AddPoint, AddEdge and Clear change the state and must not run while
+  # other threads use the polygon; Compute, TestPoint and TestEdge only
+  # read it and can run on several threads at once.
+  __slots__ = ('earth', 'polyline', 'area0', '_mask', '_areasum',
+               '_perimetersum', 'num', 'lat1', 'lon1', '_crossings',
+               '_lat0', '_lon0')
+
   def _transit(lon1, lon2):
     """Count crossings of prime meridian for AddPoint."""
     # Return 1 or -1 if crossing prime meridian in east or west direction.
     # Otherwise return zero.
     # Compute lon12 the same way as Geodesic::Inverse.
-    lon1 = Math.AngNormalize(lon1)
-    lon2 = Math.AngNormalize(lon2)
-    lon12, _ = Math.AngDiff(lon1, lon2)
+    lon1 = _AngNormalize(lon1)
+    lon2 = _AngNormalize(lon2)
+    lon12, _ = _AngDiff(lon1, lon2)
     cross = (1 if lon1 <= 0 and lon2 > 0 and lon12 > 0
              else (-1 if lon2 <= 0 and lon1 > 0 and lon12 < 0 else 0))
     return cross
@@ -84,7 +95,6 @@ class PolygonArea(object):
     Initially the polygon has no vertices.
     """
 
-    from geographiclib.geodesic import Geodesic
     self.earth = earth
     """The geodesic object (readonly)"""
     self.polyline = polyline
@@ -322,3 +332,7 @@ class PolygonArea(object):
 
     area = 0.0 + tempsum
     return num, perimeter, area
+
+# Imported here rather than in __init__ since geodesic.py imports this module
+# in turn.
+from geographiclib.geodesic import Geodesic
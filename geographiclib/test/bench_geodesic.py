@@ -0,0 +1,132 @@
+"""
+
+bench_geodesic: microbenchmarks for the geodesic routines
+
+Run these benchmarks with
+
+    python3 -m geographiclib.test.bench_geodesic
+
+executed in this directory's parent directory.  Each line reports the
+time per call in microseconds.  The backend throughput section needs
+backends.py from the plugin directory, i.e., this directory's parent.
+
+"""
+from concurrent.futures import ThreadPoolExecutor
+import os
+import sys
+import time
+import timeit
+import tracemalloc
+
+import backends
+from geographiclib.geodesic import Geodesic
+from geographiclib.geomath import Math
+from geographiclib.test import test_geodesic
+
+def bench(name, stmt, number = 20000):
+  """Print the best time per call of stmt in microseconds"""
+  t = min(timeit.repeat(stmt, number = number, repeat = 3)) / number
+  print("{:<40s} {:8.2f} us".format(name, t * 1e6))
+  return t
+
+def memory(name, make, number = 10000):
+  """Print the bytes allocated per object created by make"""
+  tracemalloc.start()
+  start = tracemalloc.get_traced_memory()[0]
+  objects = [make(i) for i in range(number)]
+  size = (tracemalloc.get_traced_memory()[0] - start) / float(number)
+  tracemalloc.stop()
+  del objects
+  print("{:<40s} {:8.0f} bytes".format(name, size))
+  return size
+
+def main():
+  geod = Geodesic.WGS84
+  lat1, lon1, lat2, lon2 = -33.9, 151.2, 33.9, -118.4
+  dist = Geodesic.AZIMUTH | Geodesic.DISTANCE
+  mask = Geodesic.LATITUDE | Geodesic.LONGITUDE | Geodesic.LONG_UNROLL
+  line = geod.InverseLine(lat1, lon1, lat2, lon2)
+  s = line.s13 / 3
+
+  print("Per-call overhead of the helpers and constructors")
+  bench("Math.sincosd", lambda: Math.sincosd(30.0), 200000)
+  bench("Math.isnan", lambda: Math.isnan(30.0), 200000)
+  bench("Math.AngDiff", lambda: Math.AngDiff(30.0, -150.0), 200000)
+  bench("Line()", lambda: geod.Line(lat1, lon1, 45))
+  bench("InverseLine()", lambda: geod.InverseLine(lat1, lon1, lat2, lon2))
+
+  print("Inverse / Direct / Position: dict vs tuple results")
+  bench("Inverse", lambda: geod.Inverse(lat1, lon1, lat2, lon2, dist))
+  bench("InverseTuple", lambda: geod.InverseTuple(lat1, lon1, lat2, lon2, dist))
+  bench("Direct", lambda: geod.Direct(lat1, lon1, 45, s, mask))
+  bench("DirectTuple", lambda: geod.DirectTuple(lat1, lon1, 45, s, mask))
+  bench("Position", lambda: line.Position(s, mask), 100000)
+  bench("PositionTuple", lambda: line.PositionTuple(s, mask), 100000)
+
+  print("Memory per cached GeodesicLine")
+  memory("Line(LATITUDE | LONGITUDE | DISTANCE_IN)",
+         lambda i: geod.Line(lat1, lon1, i * 1e-3,
+                             Geodesic.LATITUDE | Geodesic.LONGITUDE |
+                             Geodesic.DISTANCE_IN))
+  memory("InverseLine(STANDARD | DISTANCE_IN)",
+         lambda i: geod.InverseLine(lat1, lon1, lat2, lon2 + i * 1e-3))
+  memory("Line(ALL)",
+         lambda i: geod.Line(lat1, lon1, i * 1e-3, Geodesic.ALL))
+
+  print("Backend throughput over the test_geodesic cases")
+  throughput()
+
+  print("Inverse speedup on a shared Geodesic")
+  scaling()
+
+  print("Bulk inverse problems")
+  many()
+
+def throughput():
+  """Print inverse solutions and waypoints per second for each backend"""
+  cases = test_geodesic.GeodesicTest.testcases
+  for name in backends.available_backends():
+    backend = backends.make_backend(name, Geodesic.WGS84.a, Geodesic.WGS84.f)
+    def inverse():
+      for l in cases:
+        backend.inverse(l[0], l[1], l[3], l[4])
+    def positions():
+      for l in cases:
+        backend.positions(backend.line(l[0], l[1], l[2]), l[6] / 1000, 1, 1000)
+    t = min(timeit.repeat(inverse, number = 20, repeat = 3)) / (20 * len(cases))
+    print("{:<40s} {:10.0f} /s".format(name + " inverse", 1 / t))
+    t = min(timeit.repeat(positions, number = 2, repeat = 3)) / (2 * 1000 * len(cases))
+    print("{:<40s} {:10.0f} /s".format(name + " waypoints", 1 / t))
+
+def scaling():
+  """Print the speedup of Inverse on a shared Geodesic with more threads"""
+  geod = Geodesic.WGS84
+  cases = test_geodesic.GeodesicTest.testcases
+  def work(_):
+    for l in cases * 50:
+      geod.Inverse(l[0], l[1], l[3], l[4])
+  def run(threads):
+    with ThreadPoolExecutor(threads) as pool:
+      start = time.perf_counter()
+      list(pool.map(work, range(threads)))
+      return (time.perf_counter() - start) / threads
+  single = run(1)
+  threads = os.cpu_count() or 1
+  gil = getattr(sys, '_is_gil_enabled', lambda: True)()
+  print("{:<40s} {:8.2f} x".format(
+    "{} threads ({})".format(threads, "GIL" if gil else "free-threaded"),
+    single / run(threads)))
+
+def many():
+  """Print the time per problem of InverseMany by number of processes"""
+  problems = [(l[0], l[1], l[3], l[4])
+              for l in test_geodesic.GeodesicTest.testcases] * 2000
+  for workers in sorted(set([1, os.cpu_count() or 1])):
+    start = time.perf_counter()
+    for _ in Geodesic.WGS84.InverseMany(problems, workers = workers): pass
+    t = (time.perf_counter() - start) / len(problems)
+    print("{:<40s} {:8.2f} us".format(
+      "InverseMany ({} processes)".format(workers), t * 1e6))
+
+if __name__ == '__main__':
+  main()
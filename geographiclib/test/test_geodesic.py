@@ -133,6 +133,74 @@ class GeodesicTest(unittest.TestCase):
       self.assertAlmostEqual(M21, dir["M21"], delta = 1e-15)
       self.assertAlmostEqual(S12, dir["S12"], delta = 0.1)
 
+  def test_inversetuple(self):
+    for l in GeodesicTest.testcases:
+      (lat1, lon1, azi1, lat2, lon2, azi2,
+       s12, a12, m12, M12, M21, S12) = l
+      inv = Geodesic.WGS84.Inverse(lat1, lon1, lat2, lon2, Geodesic.ALL)
+      self.assertEqual((inv["a12"], inv["s12"], inv["azi1"], inv["azi2"],
+                        inv["m12"], inv["M12"], inv["M21"], inv["S12"]),
+                       Geodesic.WGS84.InverseTuple(lat1, lon1, lat2, lon2,
+                                                   Geodesic.ALL))
+      self.assertEqual((inv["a12"], inv["s12"]),
+                       Geodesic.WGS84.InverseTuple(lat1, lon1, lat2, lon2,
+                                                   Geodesic.DISTANCE))
+    self.assertEqual(len(Geodesic.WGS84.InverseTuple(0, 0, 1, 1,
+                                                     Geodesic.EMPTY)), 1)
+
+  def test_directtuple(self):
+    for l in GeodesicTest.testcases:
+      (lat1, lon1, azi1, lat2, lon2, azi2,
+       s12, a12, m12, M12, M21, S12) = l
+      mask = Geodesic.LATITUDE | Geodesic.LONGITUDE | Geodesic.LONG_UNROLL
+      dir = Geodesic.WGS84.Direct(lat1, lon1, azi1, s12, mask)
+      self.assertEqual((dir["a12"], dir["lat2"], dir["lon2"]),
+                       Geodesic.WGS84.DirectTuple(lat1, lon1, azi1, s12, mask))
+
+  def test_positiontuple(self):
+    for l in GeodesicTest.testcases:
+      (lat1, lon1, azi1, lat2, lon2, azi2,
+       s12, a12, m12, M12, M21, S12) = l
+      line = Geodesic.WGS84.Line(lat1, lon1, azi1,
+                                 Geodesic.ALL | Geodesic.DISTANCE_IN)
+      pos = line.Position(s12, Geodesic.ALL | Geodesic.LONG_UNROLL)
+      self.assertEqual((pos["a12"], pos["lat2"], pos["lon2"], pos["azi2"],
+                        s12, pos["m12"], pos["M12"], pos["M21"], pos["S12"]),
+                       line.PositionTuple(s12,
+                                          Geodesic.ALL | Geodesic.LONG_UNROLL))
+
+  def test_inversemany(self):
+    problems = [(l[0], l[1], l[3], l[4]) for l in GeodesicTest.testcases]
+    mask = Geodesic.ALL | Geodesic.LONG_UNROLL
+    expected = [Geodesic.WGS84.InverseTuple(*(p + (mask,))) for p in problems]
+    for workers in (1, 2):
+      results = Geodesic.WGS84.InverseMany(iter(problems), mask,
+                                           workers = workers, chunksize = 3)
+      self.assertEqual(list(results), expected)
+    self.assertEqual(list(Geodesic.WGS84.InverseMany([], workers = 2)), [])
+
+  def test_directmany(self):
+    problems = [(l[0], l[1], l[2], l[6]) for l in GeodesicTest.testcases]
+    mask = Geodesic.ALL | Geodesic.LONG_UNROLL
+    expected = [Geodesic.WGS84.DirectTuple(*(p + (mask,))) for p in problems]
+    for workers in (1, 2):
+      results = Geodesic.WGS84.DirectMany(problems, mask,
+                                          workers = workers, chunksize = 3)
+      self.assertEqual(list(results), expected)
+    # a flattening other than WGS84 reaches the workers
+    geod = Geodesic(6.4e6, -1/150.0)
+    self.assertEqual(list(geod.DirectMany(problems, workers = 2)),
+                     list(geod.DirectMany(problems, workers = 1)))
+
+  def test_slots(self):
+    line = Geodesic.WGS84.Line(10, 20, 30, Geodesic.ALL)
+    self.assertFalse(hasattr(line, "__dict__"))
+    self.assertFalse(hasattr(Geodesic.WGS84, "__dict__"))
+    self.assertFalse(hasattr(Geodesic.WGS84.Polygon(), "__dict__"))
+    self.assertEqual((line.a, line.f, line.lat1, line.lon1, line.azi1),
+                     (Geodesic.WGS84.a, Geodesic.WGS84.f, 10, 20, 30))
+    self.assertRaises(AttributeError, setattr, line, "extra", 1)
+
 class GeodSolveTest(unittest.TestCase):
 
   def test_GeodSolve0(self):
@@ -0,0 +1,107 @@
+"""
+test_threads: sharing geodesic objects between threads
+
+Run these tests with
+
+    python3 -m unittest geographiclib.test.test_threads
+
+executed in this directory's parent directory.
+
+Geodesic, GeodesicLine and PolygonArea only write their state in
+__init__ (GeodesicLine also in SetDistance and SetArc, PolygonArea in
+AddPoint, AddEdge and Clear).  These tests share one instance of each
+between threads, with a short switch interval to interleave them, and
+check that every thread gets the single threaded results.
+
+"""
+import sys
+import threading
+import unittest
+
+from geographiclib.geodesic import Geodesic
+from geographiclib.polygonarea import PolygonArea
+from geographiclib.test import test_geodesic
+
+THREADS = 8
+ROUNDS = 20
+
+class ThreadTest(unittest.TestCase):
+
+  def setUp(self):
+    self.interval = sys.getswitchinterval()
+    sys.setswitchinterval(1e-6)
+
+  def tearDown(self):
+    sys.setswitchinterval(self.interval)
+
+  def run_threads(self, work):
+    """Run work(i) on THREADS threads and return the results by thread"""
+    results = [None] * THREADS
+    errors = []
+    start = threading.Barrier(THREADS)
+    def target(i):
+      try:
+        start.wait()
+        results[i] = [work(i) for _ in range(ROUNDS)]
+      except Exception as e:
+        errors.append(e)
+    threads = [threading.Thread(target = target, args = (i,))
+               for i in range(THREADS)]
+    for t in threads: t.start()
+    for t in threads: t.join()
+    self.assertEqual(errors, [])
+    return results
+
+  def test_geodesic(self):
+    geod = Geodesic(6378137, 1/298.257223563)
+    cases = test_geodesic.GeodesicTest.testcases
+    def work(i):
+      return ([geod.Inverse(l[0], l[1], l[3], l[4], Geodesic.ALL)
+               for l in cases] +
+              [geod.Direct(l[0], l[1], l[2], l[6], Geodesic.ALL)
+               for l in cases] +
+              [geod.InverseTuple(l[0], l[1], l[3], l[4], Geodesic.STANDARD)
+               for l in cases])
+    expected = work(0)
+    for result in self.run_threads(work):
+      for r in result:
+        self.assertEqual(r, expected)
+
+  def test_geodesicline(self):
+    line = Geodesic.WGS84.InverseLine(-33.9, 151.2, 33.9, -118.4)
+    distances = [line.s13 * k / 100 for k in range(101)]
+    def work(i):
+      return ([line.Position(s) for s in distances] +
+              [line.PositionTuple(s, Geodesic.STANDARD) for s in distances] +
+              [line.ArcPosition(a) for a in range(0, 180, 10)])
+    expected = work(0)
+    for result in self.run_threads(work):
+      for r in result:
+        self.assertEqual(r, expected)
+
+  def test_polygonarea(self):
+    points = [[0, 0], [0, 90], [90, 0]]
+    polygon = PolygonArea(Geodesic.WGS84)
+    for p in points:
+      polygon.AddPoint(p[0], p[1])
+    def work(i):
+      return (polygon.Compute(), polygon.Compute(True, False),
+              polygon.TestPoint(45, -45), polygon.TestEdge(45, 1e6))
+    expected = work(0)
+    for result in self.run_threads(work):
+      for r in result:
+        self.assertEqual(r, expected)
+
+  def test_polygonarea_per_thread(self):
+    # building a polygon changes it, so each thread builds its own while
+    # sharing the Geodesic
+    points = [[89, 0], [89, 90], [89, 180], [89, 270]]
+    def work(i):
+      polygon = Geodesic.WGS84.Polygon()
+      for p in points:
+        polygon.AddPoint(p[0], p[1])
+      return polygon.Compute()
+    expected = work(0)
+    for result in self.run_threads(work):
+      for r in result:
+        self.assertEqual(r, expected)
@@ -0,0 +1,210 @@
+# -*- coding: utf-8 -*-
+"""
+/***************************************************************************
+ GeodesicDensifier
+                                 A QGIS plugin
+ Adds vertices to geometry along geodesic lines
+                              -------------------
+        copyright            : (C) 2018 by Jonah Sullivan
+        email                : jonah.sullivan@ga.gov.au
+ ***************************************************************************/
+
+/***************************************************************************
+ *                                                                         *
+ *   This program is free software; you can redistribute it and/or modify  *
+ *   it under the terms of the Apache 2.0 License.                         *
+ *                                                                         *
+ ***************************************************************************/
+
+ Densification as an SQLite user function, for SQL jobs over GeoPackage
+ files run without QGIS:
+
+     import sqlite3
+     from GeodesicDensifier.gpkg import register
+
+     connection = sqlite3.connect("roads.gpkg")
+     register(connection)
+     with connection:
+         connection.execute("UPDATE roads SET geom = GeodesicDensify(geom, 900)")
+"""
+import struct
+import sys
+
+from .backends import make_backend
+from .engine import Densifier, VertexBudget
+from .wkb import read_wkb, write_wkb
+
+# WGS84, the default ellipsoid of GeodesicDensify
+WGS84_A = 6378137.0
+WGS84_F = 1 / 298.257223563
+
+# bytes of the envelope for each envelope code of the header flags
+_ENVELOPE_BYTES = (0, 32, 48, 48, 64)
+
+
+def read_gpkg(blob):
+    """Split a GeoPackage geometry blob into its header values and WKB.
+
+    :param blob: The standard GeoPackage binary, a "GP" header followed
+        by WKB.
+    :type blob: bytes
+
+    :returns: The SRS id, the envelope as (minx, maxx, miny, maxy) or None
+        when the header has none, True for an empty geometry, and the WKB.
+    :rtype: (int, tuple, bool, memoryview)
+
+    :raises ValueError: If the blob is not a GeoPackage geometry.
+    """
+    data = memoryview(blob).cast('B')
+    if len(data) < 8 or data[0:2] != b'GP':
+        raise ValueError("not a GeoPackage geometry")
+    flags = data[3]
+    order = '<' if flags & 1 else '>'
+    code = (flags >> 1) & 7
+    if code >= len(_ENVELOPE_BYTES):
+        raise ValueError("invalid GeoPackage envelope code {}".format(code))
+    srs_id, = struct.unpack_from(order + 'i', data, 4)
+    envelope = None
+    if code:
+        envelope = struct.unpack_from(order + '4d', data, 8)
+    return srs_id, envelope, bool(flags & 0x10), data[8 + _ENVELOPE_BYTES[code]:]
+
+
+def write_gpkg(srs_id, wkb, xy):
+    """Build a little endian GeoPackage geometry blob.
+
+    :param srs_id: SRS id of the geometry.
+    :type srs_id: int
+
+    :param wkb: The geometry.
+    :type wkb: bytes
+
+    :param xy: Interleaved x, y values of the geometry, for the envelope.
+    :type xy: array('d')
+
+    :rtype: bytes
+    """
+    if not len(xy):
+        # no envelope, and the empty flag
+        return b'GP\x00\x11' + struct.pack('<i', srs_id) + wkb
+    envelope = (min(xy[0::2]), max(xy[0::2]), min(xy[1::2]), max(xy[1::2]))
+    return b'GP\x00\x03' + struct.pack('<i4d', srs_id, *envelope) + wkb
+
+
+class GeodesicDensify:
+    """The GeodesicDensify(geom, spacing[, a, f]) SQL function.
+
+    Takes a GeoPackage geometry blob, or plain WKB, in longitude, latitude
+    degrees and returns the densified geometry in the same format.  Points
+    are returned unchanged and NULL gives NULL.  *f* is the flattening, or
+    the inverse flattening when greater than 1.  Z and M values are
+    dropped.  Densifiers are kept per ellipsoid and spacing, so a
+    statement over many rows builds them once.
+
+    :param backend: Name of the geodesic backend, see
+        :func:`backends.make_backend`.
+    :type backend: str
+
+    :param budget: Caps on each geometry; the total is not capped.
+    :type budget: engine.VertexBudget
+    """
+
+    def __init__(self, backend='auto', budget=None):
+        self.backend = backend
+        budget = budget if budget is not None else VertexBudget()
+        self.segment_waypoints = budget.segment_waypoints
+        self.feature_vertices = budget.feature_vertices
+        self._densifiers = {}
+
+    def densifier(self, spacing, a, f):
+        """ the densifier for a spacing and an ellipsoid """
+        key = (spacing, a, f)
+        densifier = self._densifiers.get(key)
+        if densifier is None:
+            budget = VertexBudget(self.segment_waypoints, self.feature_vertices, sys.maxsize)
+            densifier = Densifier(make_backend(self.backend, a, f), 'spacing', spacing, budget=budget)
+            self._densifiers[key] = densifier
+        return densifier
+
+    def __call__(self, blob, spacing, a=WGS84_A, f=WGS84_F):
+        if blob is None:
+            return None
+        if spacing is None or spacing <= 0:
+            raise ValueError("spacing must be positive")
+        if f > 1:
+            f = 1 / f
+        data = memoryview(blob).cast('B')
+        if data[0:2] == b'GP':
+            srs_id, _, empty, wkb = read_gpkg(data)
+            if empty:
+                return blob
+        else:
+            srs_id, wkb = None, data
+        geometry_type, xy, offsets, polygons = read_wkb(wkb)
+        densifier = self.densifier(float(spacing), float(a), float(f))
+        dense, dense_offsets = densifier.densify_array(xy, offsets)
+        # a row has no fid to report, and the cached densifier lives as long as the connection
+        del densifier.adapted[:]
+        wkb = write_wkb(geometry_type, dense, dense_offsets, polygons)
+        if srs_id is None:
+            return wkb
+        return write_gpkg(srs_id, wkb, dense)
+
+
+def _envelope(blob):
+    """ envelope of a GeoPackage blob, from its header or its coordinates """
+    if blob is None:
+        return None
+    srs_id, envelope, empty, wkb = read_gpkg(blob)
+    if empty:
+        return None
+    if envelope is None:
+        _, xy, _, _ = read_wkb(wkb)
+        if not len(xy):
+            return None
+        envelope = (min(xy[0::2]), max(xy[0::2]), min(xy[1::2]), max(xy[1::2]))
+    return envelope
+
+
+def _coordinate(index):
+    def function(blob):
+        envelope = _envelope(blob)
+        return envelope[index] if envelope is not None else None
+    return function
+
+
+def _is_empty(blob):
+    if blob is None:
+        return None
+    return int(_envelope(blob) is None)
+
+
+def register(connection, backend='auto', budget=None, rtree_functions=True):
+    """Register GeodesicDensify on an sqlite3 connection.
+
+    :param connection: The database connection.
+    :type connection: sqlite3.Connection
+
+    :param backend: Name of the geodesic backend.
+    :type backend: str
+
+    :param budget: Caps on each geometry, see :class:`GeodesicDensify`.
+    :type budget: engine.VertexBudget
+
+    :param rtree_functions: Also register the ST_MinX, ST_MaxX, ST_MinY,
+        ST_MaxY and ST_IsEmpty functions called by the triggers that keep
+        a GeoPackage R-tree up to date, which plain SQLite doesn't have.
+        Leave it False on a SpatiaLite connection.
+    :type rtree_functions: bool
+
+    :returns: The function object, holding the densifiers it built.
+    :rtype: GeodesicDensify
+    """
+    function = GeodesicDensify(backend, budget)
+    deterministic = {'deterministic': True} if sys.version_info >= (3, 8) else {}
+    connection.create_function("GeodesicDensify", -1, function, **deterministic)
+    if rtree_functions:
+        for name, index in (("ST_MinX", 0), ("ST_MaxX", 1), ("ST_MinY", 2), ("ST_MaxY", 3)):
+            connection.create_function(name, 1, _coordinate(index), **deterministic)
+        connection.create_function("ST_IsEmpty", 1, _is_empty, **deterministic)
+    return function
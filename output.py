@@ -0,0 +1,252 @@
+# -*- coding: utf-8 -*-
+"""
+/***************************************************************************
+ GeodesicDensifier
+                                 A QGIS plugin
+ Adds vertices to geometry along geodesic lines
+                              -------------------
+        copyright            : (C) 2018 by Jonah Sullivan
+        email                : jonah.sullivan@ga.gov.au
+ ***************************************************************************/
+
+/***************************************************************************
+ *                                                                         *
+ *   This program is free software; you can redistribute it and/or modify  *
+ *   it under the terms of the Apache 2.0 License.                         *
+ *                                                                         *
+ ***************************************************************************/
+
+ Output sinks for densified features.
+"""
+import os
+import re
+import tempfile
+import threading
+import time
+
+from qgis.core import (QgsProject,
+                       QgsVectorDataProvider,
+                       QgsVectorFileWriter,
+                       QgsVectorLayer,
+                       QgsWkbTypes)
+
+
+def _gpkg_writer(path, fields, wkb_type, crs):
+    """ a file writer creating a GeoPackage """
+    # without the R-tree the GeoPackage driver would update it with a trigger on every insert
+    writer = QgsVectorFileWriter(path, "UTF-8", fields, wkb_type, crs, "GPKG", [], ["SPATIAL_INDEX=NO"])
+    if writer.hasError() != QgsVectorFileWriter.NoError:
+        raise IOError(writer.errorMessage())
+    return writer
+
+
+class OutputSink:
+    """Feature sink for the densified output.
+
+    Features are written to a memory layer, or to a GeoPackage when *path*
+    is given.  The layer is added to the project by :meth:`finish`, after
+    building its spatial index in one pass over the written features,
+    which is much faster than updating it on every insert.
+
+    :param wkb_type: Geometry type of the output.
+    :type wkb_type: QgsWkbTypes.Type
+
+    :param crs: Coordinate reference system of the output.
+    :type crs: QgsCoordinateReferenceSystem
+
+    :param layer_name: Name of the output layer.
+    :type layer_name: str
+
+    :param fields: Attribute fields of the output.
+    :type fields: QgsFields
+
+    :param path: GeoPackage to write to, None for a memory layer.
+    :type path: str
+
+    :param spatial_index: True to give the output a spatial index.
+    :type spatial_index: bool
+
+    :param buffered: True to hold the features back until :meth:`commit`,
+        so a checkpoint knows exactly what the file holds.  A GeoPackage is
+        then written through an OGR layer, where each commit is a
+        transaction of its own; a file writer keeps a single transaction
+        open until it is closed.
+    :type buffered: bool
+
+    :param append: True to add to the existing GeoPackage at *path*, left
+        by a run being resumed.
+    :type append: bool
+    """
+
+    def __init__(self, wkb_type, crs, layer_name, fields, path=None, spatial_index=True, buffered=False,
+                 append=False):
+        self.layer_name = layer_name
+        self.path = path
+        self.spatial_index = spatial_index
+        self.buffered = buffered
+        # seconds taken to build the spatial index, for the run report
+        self.index_seconds = 0.0
+        # features committed to the output, and those held back until the next commit
+        self.rows = 0
+        self._held = []
+        if path is None:
+            self.layer = QgsVectorLayer("{}?crs={}".format(QgsWkbTypes.displayString(wkb_type), crs.authid()),
+                                        layer_name,
+                                        "memory")
+            self.layer.dataProvider().addAttributes(fields)
+            self.layer.updateFields()
+            self.sink = self.layer.dataProvider()
+        elif not (append or buffered):
+            self.layer = None
+            self.sink = _gpkg_writer(path, fields, wkb_type, crs)
+        else:
+            if not append:
+                # only create the empty GeoPackage; the writer isn't kept, so it closes the file at once
+                _gpkg_writer(path, fields, wkb_type, crs)
+            self.layer = QgsVectorLayer(path, layer_name, "ogr")
+            if not self.layer.isValid():
+                raise IOError("can't open {}".format(path))
+            self.sink = self.layer.dataProvider()
+            self.rows = self.layer.featureCount()
+
+    def addFeatures(self, features):
+        """ write features to the output, or hold them until the next commit when buffered """
+        if self.buffered:
+            self._held.extend(features)
+            return True
+        self.rows += len(features)
+        return self.sink.addFeatures(features)
+
+    def commit(self):
+        """ write the held features through to the file, before a checkpoint is saved """
+        features, self._held = self._held, []
+        if features:
+            result = self.sink.addFeatures(features)
+            # a provider returns the added features too, a file writer only the status
+            if not (result[0] if isinstance(result, tuple) else result):
+                raise IOError("writing to {} failed".format(self.path))
+        if not self.sink.flushBuffer():
+            raise IOError("writing to {} failed".format(self.path))
+        self.rows += len(features)
+
+    def finish(self):
+        """Close the output and add it to the project.
+
+        :returns: The output layer.
+        :rtype: QgsVectorLayer
+        """
+        if self.buffered:
+            self.commit()
+        if self.path is not None:
+            # deleting the writer or the layer flushes and closes the GeoPackage
+            self.sink = None
+            self.layer = QgsVectorLayer(self.path, self.layer_name, "ogr")
+        else:
+            self.layer.updateExtents()
+        if self.spatial_index:
+            started = time.time()
+            # the memory provider indexes its features, OGR creates the GeoPackage R-tree
+            self.layer.dataProvider().createSpatialIndex()
+            self.index_seconds = time.time() - started
+        QgsProject.instance().addMapLayer(self.layer)
+        return self.layer
+
+
+class InPlaceSink:
+    """Writes densified geometries back to the layer they were read from.
+
+    With *undo*, the geometries go through the layer's edit buffer in a
+    single edit command, so the whole run is undone in one step and is
+    saved with the layer's other edits.  Without it, they are written to
+    the data provider in batches of changeGeometryValues, which are final:
+    a run that fails part way leaves the batches written so far in the
+    layer, and :meth:`abort` can't revert them.  Attributes are not
+    touched.
+
+    Geometries can be queued from any thread with :meth:`changeGeometry`;
+    they are applied by :meth:`flush`, which must be called on the main
+    thread.  Layers with Z or M values are refused, since the densified
+    geometries are 2D and replacing them would lose those values.
+
+    :param layer: The input layer.
+    :type layer: QgsVectorLayer
+
+    :param undo: True to edit through the undo stack.
+    :type undo: bool
+
+    :param batch_size: Geometries per changeGeometryValues call without
+        *undo*.
+    :type batch_size: int
+
+    :raises IOError: If the layer has Z or M values or can't be edited.
+    """
+
+    def __init__(self, layer, undo=True, batch_size=1000):
+        self.layer = layer
+        self.undo = undo
+        self.batch_size = batch_size
+        self.changed = 0
+        self._pending = []
+        self._lock = threading.Lock()
+        self._started_editing = False
+        if QgsWkbTypes.hasZ(layer.wkbType()) or QgsWkbTypes.hasM(layer.wkbType()):
+            raise IOError("layer {} has Z or M values, which densifying in place would lose; "
+                          "write to a new layer instead".format(layer.name()))
+        if undo:
+            if not layer.isEditable():
+                if not layer.startEditing():
+                    raise IOError("layer {} can't be edited".format(layer.name()))
+                self._started_editing = True
+            layer.beginEditCommand("Geodesic densify")
+        elif not layer.dataProvider().capabilities() & QgsVectorDataProvider.ChangeGeometries:
+            raise IOError("layer {} can't change geometries".format(layer.name()))
+
+    def changeGeometry(self, fid, geometry):
+        """ queue the new geometry of a feature """
+        with self._lock:
+            self._pending.append((fid, geometry))
+
+    def flush(self):
+        """ apply the queued geometries, on the main thread """
+        with self._lock:
+            pending, self._pending = self._pending, []
+        if self.undo:
+            for fid, geometry in pending:
+                self.layer.changeGeometry(fid, geometry)
+        else:
+            provider = self.layer.dataProvider()
+            for start in range(0, len(pending), self.batch_size):
+                if not provider.changeGeometryValues(dict(pending[start:start + self.batch_size])):
+                    raise IOError("; ".join(provider.errors()) or "changing geometries failed")
+        self.changed += len(pending)
+
+    def finish(self):
+        """Apply the last geometries and close the edit command.
+
+        :returns: The input layer.
+        :rtype: QgsVectorLayer
+        """
+        self.flush()
+        if self.undo:
+            self.layer.endEditCommand()
+        else:
+            self.layer.reload()
+        self.layer.triggerRepaint()
+        return self.layer
+
+    def abort(self):
+        """ drop the queued geometries when the run fails, and with undo revert those applied """
+        with self._lock:
+            self._pending = []
+        if self.undo:
+            self.layer.destroyEditCommand()
+            if self._started_editing:
+                self.layer.rollBack()
+
+
+def file_output_path(layer_name, directory=None):
+    """ return a new GeoPackage path for a file-backed output """
+    if not directory:
+        directory = tempfile.gettempdir()
+    name = re.sub(r'[^A-Za-z0-9_.-]+', '_', layer_name)
+    return os.path.join(directory, "{}_{}.gpkg".format(name, time.strftime("%Y%m%d%H%M%S")))
@@ -0,0 +1,279 @@
+# -*- coding: utf-8 -*-
+"""
+/***************************************************************************
+ GeodesicDensifier
+                                 A QGIS plugin
+ Adds vertices to geometry along geodesic lines
+                              -------------------
+        copyright            : (C) 2018 by Jonah Sullivan
+        email                : jonah.sullivan@ga.gov.au
+ ***************************************************************************/
+
+/***************************************************************************
+ *                                                                         *
+ *   This program is free software; you can redistribute it and/or modify  *
+ *   it under the terms of the Apache 2.0 License.                         *
+ *                                                                         *
+ ***************************************************************************/
+
+ Read, densify and write stages running on their own threads, connected by
+ bounded queues.
+"""
+import queue
+import threading
+import time
+
+# marks the end of the items in a queue
+_DONE = object()
+
+
+class StageMetrics:
+    """Throughput of one pipeline stage."""
+
+    def __init__(self, name):
+        self.name = name
+        self.items = 0
+        # seconds spent in the stage's own work, summed over its threads
+        self.busy = 0.0
+        self.start = None
+        self.end = None
+
+    def elapsed(self):
+        """ seconds from the stage's first item to its end, or to now """
+        if self.start is None:
+            return 0.0
+        return (self.end or time.time()) - self.start
+
+    def rate(self):
+        """ items per second over the elapsed time """
+        elapsed = self.elapsed()
+        return self.items / elapsed if elapsed > 0 else 0.0
+
+
+class QueueMetrics:
+    """Depth of a queue between two stages, sampled on every put."""
+
+    def __init__(self, name, size):
+        self.name = name
+        self.size = size
+        self.samples = 0
+        self.total = 0
+        self.maximum = 0
+
+    def sample(self, depth):
+        self.samples += 1
+        self.total += depth
+        self.maximum = max(self.maximum, depth)
+
+    def mean(self):
+        return self.total / self.samples if self.samples else 0.0
+
+
+class Pipeline:
+    """Run read, densify and write concurrently with backpressure.
+
+    A reader thread iterates *read*, *workers* threads apply *densify* to
+    each item and a writer thread passes the results to *write* in the
+    order they were read.  The queues between the stages hold at most
+    *queue_size* items and at most 2 * *queue_size* + *workers* items are
+    between reading and writing, counting results held back for the
+    order, so a slow stage holds the others back instead of letting items
+    pile up in memory.  Provider reads and writes release the GIL, so they
+    overlap with the geodesic computations.
+
+    :param read: Returns the iterable of input items.  Called on the
+        reader thread.
+    :type read: callable
+
+    :param densify: Turns an item into a result, or None to drop it.
+    :type densify: callable
+
+    :param write: Consumes a result.  Called on the writer thread.
+    :type write: callable
+
+    :param workers: Number of densify threads.
+    :type workers: int
+
+    :param queue_size: Capacity of each queue.
+    :type queue_size: int
+    """
+
+    def __init__(self, read, densify, write, workers=1, queue_size=64):
+        self.read = read
+        self.densify = densify
+        self.write = write
+        self.workers = max(int(workers), 1)
+        self.queue_size = int(queue_size)
+        self.stages = [StageMetrics('read'), StageMetrics('densify'), StageMetrics('write')]
+        self.queues = [QueueMetrics('read > densify', self.queue_size),
+                       QueueMetrics('densify > write', self.queue_size)]
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+        # items read but not yet written
+        self._in_flight = threading.Semaphore(2 * self.queue_size + self.workers)
+        self._errors = []
+
+    def run(self, poll=None, interval=0.1):
+        """Run the pipeline to the end.
+
+        :param poll: Called on the calling thread every *interval* seconds
+            while the stages run, e.g. to update a progress bar.
+        :type poll: callable
+
+        :param interval: Seconds between calls to *poll*.
+        :type interval: float
+
+        :raises: The first exception raised by a stage or by *poll*, after
+            all the threads have stopped.
+        """
+        inbox = queue.Queue(self.queue_size)
+        outbox = queue.Queue(self.queue_size)
+        threads = [threading.Thread(target=self._reader, args=(inbox,), name='read')]
+        threads += [threading.Thread(target=self._worker, args=(inbox, outbox), name='densify')
+                    for _ in range(self.workers)]
+        threads.append(threading.Thread(target=self._writer, args=(outbox,), name='write'))
+        for thread in threads:
+            thread.daemon = True
+            thread.start()
+        try:
+            for thread in threads:
+                while thread.is_alive():
+                    thread.join(interval)
+                    if poll is not None:
+                        poll()
+        except BaseException:
+            # stop the stages before the caller cleans up after the failure
+            self.stop()
+            for thread in threads:
+                thread.join()
+            raise
+        if self._errors:
+            raise self._errors[0]
+
+    def report(self):
+        """ per-stage throughput and queue depths as text """
+        lines = ["{}: {:,} items, {:,.0f}/s, busy {:.1f} s".format(
+            stage.name, stage.items, stage.rate(), stage.busy) for stage in self.stages]
+        lines += ["{}: mean depth {:.1f}, max {} of {}".format(
+            q.name, q.mean(), q.maximum, q.size) for q in self.queues]
+        return "\n".join(lines)
+
+    def stop(self):
+        """ make the stages give up, e.g. when the run is cancelled """
+        self._stop.set()
+
+    def _fail(self, error):
+        with self._lock:
+            self._errors.append(error)
+        self._stop.set()
+
+    def _put(self, box, item, metrics):
+        """ put an item, giving up when another stage failed """
+        while not self._stop.is_set():
+            try:
+                box.put(item, timeout=0.1)
+            except queue.Full:
+                continue
+            metrics.sample(box.qsize())
+            return True
+        return False
+
+    def _acquire(self):
+        """ wait for room for another item, False when another stage failed """
+        while not self._stop.is_set():
+            if self._in_flight.acquire(timeout=0.1):
+                return True
+        return False
+
+    def _get(self, box):
+        """ take an item, None when another stage failed """
+        while not self._stop.is_set():
+            try:
+                return box.get(timeout=0.1)
+            except queue.Empty:
+                continue
+        return None
+
+    def _reader(self, inbox):
+        stage = self.stages[0]
+        stage.start = time.time()
+        try:
+            items = iter(self.read())
+            sequence = 0
+            while True:
+                started = time.time()
+                try:
+                    item = next(items)
+                except StopIteration:
+                    break
+                stage.busy += time.time() - started
+                stage.items += 1
+                if not self._acquire() or not self._put(inbox, (sequence, item), self.queues[0]):
+                    return
+                sequence += 1
+        except Exception as e:
+            self._fail(e)
+            return
+        finally:
+            stage.end = time.time()
+        for _ in range(self.workers):
+            self._put(inbox, _DONE, self.queues[0])
+
+    def _worker(self, inbox, outbox):
+        stage = self.stages[1]
+        with self._lock:
+            if stage.start is None:
+                stage.start = time.time()
+        try:
+            while True:
+                entry = self._get(inbox)
+                if entry is None:
+                    return
+                if entry is _DONE:
+                    break
+                sequence, item = entry
+                started = time.time()
+                result = self.densify(item)
+                with self._lock:
+                    stage.busy += time.time() - started
+                    stage.items += 1
+                if not self._put(outbox, (sequence, result), self.queues[1]):
+                    return
+        except Exception as e:
+            self._fail(e)
+            return
+        finally:
+            stage.end = time.time()
+        self._put(outbox, _DONE, self.queues[1])
+
+    def _writer(self, outbox):
+        stage = self.stages[2]
+        stage.start = time.time()
+        # results that arrived ahead of an earlier one, by sequence number
+        waiting = {}
+        following = 0
+        running = self.workers
+        try:
+            while running:
+                entry = self._get(outbox)
+                if entry is None:
+                    return
+                if entry is _DONE:
+                    running -= 1
+                    continue
+                sequence, result = entry
+                waiting[sequence] = result
+                while following in waiting:
+                    result = waiting.pop(following)
+                    following += 1
+                    self._in_flight.release()
+                    if result is None:
+                        continue
+                    started = time.time()
+                    self.write(result)
+                    stage.busy += time.time() - started
+                    stage.items += 1
+        except Exception as e:
+            self._fail(e)
+        finally:
+            stage.end = time.time()
@@ -0,0 +1,324 @@
+# -*- coding: utf-8 -*-
+"""
+/***************************************************************************
+ GeodesicDensifier
+                                 A QGIS plugin
+ Adds vertices to geometry along geodesic lines
+                              -------------------
+        copyright            : (C) 2018 by Jonah Sullivan
+        email                : jonah.sullivan@ga.gov.au
+ ***************************************************************************/
+
+/***************************************************************************
+ *                                                                         *
+ *   This program is free software; you can redistribute it and/or modify  *
+ *   it under the terms of the Apache 2.0 License.                         *
+ *                                                                         *
+ ***************************************************************************/
+
+ Densification on a pool of processes.  Coordinates go to the workers and
+ back in multiprocessing.shared_memory segments; only segment names and
+ counts are pickled.
+"""
+from array import array
+from collections import deque
+from multiprocessing import resource_tracker, shared_memory
+import multiprocessing
+
+from .backends import available_backends, make_backend
+from .engine import Densifier, VertexBudget, as_doubles
+from .scheduler import Joiner, Piece, plan_piece, split_stream
+
+# bytes per coordinate and per offset in the segments
+DOUBLE_BYTES = 8
+INDEX_BYTES = 8
+
+# predicted seconds of work in a batch, at most
+BATCH_SECONDS = 0.25
+
+
+class SharedBatch:
+    """Features packed into two shared memory segments.
+
+    The coordinate segment holds the interleaved lon, lat values of all the
+    features.  The index segment holds the part offsets of all the parts
+    (vertex indices, one more than the number of parts) followed by the
+    index of the first part of each feature (one more than the number of
+    features).
+
+    :param vertices: Number of vertices.
+    :type vertices: int
+
+    :param parts: Number of parts.
+    :type parts: int
+
+    :param features: Number of features.
+    :type features: int
+
+    :param names: Names of existing coordinate and index segments to
+        attach to, None to create new ones.
+    :type names: (str, str)
+    """
+
+    def __init__(self, vertices, parts, features, names=None):
+        self.vertices = vertices
+        self.parts = parts
+        self.features = features
+        # a segment can't be empty
+        sizes = (max(2 * vertices * DOUBLE_BYTES, 1), (parts + features + 2) * INDEX_BYTES)
+        if names is None:
+            self.segments = [shared_memory.SharedMemory(create=True, size=size) for size in sizes]
+        else:
+            self.segments = [shared_memory.SharedMemory(name=name) for name in names]
+        self.xy = self.segments[0].buf[:2 * vertices * DOUBLE_BYTES].cast('d')
+        index = self.segments[1].buf[:(parts + features + 2) * INDEX_BYTES].cast('q')
+        self.part_offsets = index[:parts + 1]
+        self.feature_parts = index[parts + 1:]
+
+    def names(self):
+        return tuple(segment.name for segment in self.segments)
+
+    def feature(self, i):
+        """ coordinates and part offsets of the i-th feature, as views on the segments """
+        return self.xy, self.part_offsets[self.feature_parts[i]:self.feature_parts[i + 1] + 1]
+
+    def copy_feature(self, i):
+        """ coordinates and part offsets of the i-th feature, copied out of the segments """
+        first, last = self.feature_parts[i], self.feature_parts[i + 1]
+        start, end = self.part_offsets[first], self.part_offsets[last]
+        xy = array('d')
+        xy.frombytes(self.xy[2 * start:2 * end].cast('B'))
+        offsets = array('q', (self.part_offsets[p] - start for p in range(first, last + 1)))
+        return xy, offsets
+
+    def close(self, unlink=False):
+        """ release the views and the segments, and remove them when unlink is True """
+        for view in (self.xy, self.part_offsets, self.feature_parts):
+            view.release()
+        for segment in self.segments:
+            segment.close()
+            if unlink:
+                segment.unlink()
+
+    @classmethod
+    def pack(cls, features):
+        """Copy (xy, offsets) pairs into a new batch.
+
+        :param features: List of (xy, offsets) with the coordinates of each
+            feature, as taken by :meth:`Densifier.densify_array`.
+        :type features: list
+        """
+        vertices = parts = 0
+        for xy, offsets in features:
+            vertices += offsets[-1] - offsets[0]
+            parts += len(offsets) - 1
+        batch = cls(vertices, parts, len(features))
+        vertex = part = 0
+        batch.part_offsets[0] = 0
+        for i, (xy, offsets) in enumerate(features):
+            batch.feature_parts[i] = part
+            start, end = offsets[0], offsets[-1]
+            batch.xy[2 * vertex:2 * (vertex + end - start)] = as_doubles(xy)[2 * start:2 * end]
+            for p in range(1, len(offsets)):
+                part += 1
+                batch.part_offsets[part] = vertex + offsets[p] - start
+            vertex += end - start
+        batch.feature_parts[len(features)] = part
+        return batch
+
+
+# the densifier of a worker process, built once by _init_worker
+_worker_densifier = None
+
+
+def _init_worker(backend_name, a, f, method, spacing, count, segment_waypoints, feature_vertices, chunk_size):
+    global _worker_densifier
+    budget = VertexBudget(segment_waypoints, feature_vertices)
+    _worker_densifier = Densifier(make_backend(backend_name, a, f), method, spacing, count, budget)
+    _worker_densifier.chunk_size = chunk_size
+
+
+def _densify_batch(names, vertices, parts, features, result_names, capacity, pieces, allowed):
+    """Densify a batch in a worker, writing the result straight into the
+    output batch the caller created for it.
+
+    :param result_names: Segments of the output batch, with room for
+        *capacity* vertices and the same number of parts and features.
+    :type result_names: (str, str)
+
+    :param pieces: The fid, split flag and plan of each piece, see
+        :class:`scheduler.Piece`.
+    :type pieces: list
+
+    :returns: The ids of the whole features whose spacing was widened,
+        whether the caps cut each piece short and the vertices charged to
+        the budget.
+    """
+    densifier = _worker_densifier
+    # the total budget left when the batch was sent
+    densifier.budget.total_vertices = allowed
+    densifier.budget.used = 0
+    densifier.adapted = []
+    batch = SharedBatch(vertices, parts, features, names)
+    result = SharedBatch(capacity, parts, features, result_names)
+    adapted = []
+    try:
+        vertex = part = 0
+        result.part_offsets[0] = 0
+        for i in range(features):
+            result.feature_parts[i] = part
+            xy, offsets = batch.feature(i)
+            piece = Piece(None, offsets, None, 0.0, pieces[i][0])
+            piece.split, piece.plan = pieces[i][1:]
+            fid, plan = plan_piece(densifier, xy, piece)
+            adapted.append(piece.adapted)
+            counts = [0] * (len(offsets) - 1)
+            for p, chunk in densifier.stream(xy, offsets, fid, densifier.chunk_size, plan):
+                if 2 * vertex + len(chunk) > len(result.xy):
+                    raise ValueError("batch densified past its vertex bound")
+                result.xy[2 * vertex:2 * vertex + len(chunk)] = chunk
+                vertex += len(chunk) // 2
+                counts[p] += len(chunk) // 2
+            for count in counts:
+                part += 1
+                result.part_offsets[part] = result.part_offsets[part - 1] + count
+            # views on the batch must go before it is closed
+            piece = xy = offsets = None
+        result.feature_parts[features] = part
+    finally:
+        batch.close()
+        result.close()
+    return densifier.adapted, adapted, densifier.budget.used
+
+
+def densify_processes(densifier, features, workers=None, batch_vertices=65536, batch_seconds=BATCH_SECONDS):
+    """Densify many features on a pool of processes.
+
+    Features are packed into batches of about *batch_vertices* input
+    vertices or *batch_seconds* of predicted work in shared memory.
+    Features predicted to take more than two batches are split into pieces
+    of about a batch, which go to different workers and are joined again
+    when they come back.  Each worker rebuilds the densifier's backend and
+    settings once, and densifies a batch straight into an output batch
+    created with it, sized from :meth:`Densifier.vertex_bound` of its
+    features.  Both are created and removed here, so no segment outlives
+    the run even when a worker is stopped half way.  At most 2 *
+    *workers* batches are in flight.  Each batch takes from the total
+    vertex budget the most it can produce when it is sent and gives back
+    what it didn't use when it returns, so the batches in flight can't
+    overdraw the budget together.  :meth:`Densifier.densify_all` runs
+    this with *processes*.
+
+    :param densifier: Backend, method, spacing and caps of the run, and the
+        budget and adapted list to update.
+    :type densifier: engine.Densifier
+
+    :param features: Iterable of (fid, xy, offsets) with the coordinates
+        of each feature, as for :meth:`Densifier.densify_array`.
+    :type features: iterable
+
+    :param workers: Number of processes, None for one per CPU.
+    :type workers: int
+
+    :param batch_vertices: Input vertices per batch.
+    :type batch_vertices: int
+
+    :param batch_seconds: Predicted seconds per batch.
+    :type batch_seconds: float
+
+    :returns: A generator of (fid, xy, offsets) in input order, with xy
+        an array('d') and offsets an array('q').  They are copied out of
+        shared memory, so they stay valid once the batch is released.
+    """
+    if workers is None:
+        workers = multiprocessing.cpu_count()
+    backend = densifier.backend
+    budget = densifier.budget
+    backend_name = backend.name if backend.name in available_backends() else 'auto'
+    # the workers must share the tracker of this process, otherwise each
+    # one reports the segments it attached to as leaked when it exits
+    resource_tracker.ensure_running()
+    pool = multiprocessing.Pool(workers, _init_worker, (
+        backend_name, backend.a, backend.f, densifier.method, densifier.spacing, densifier.count,
+        budget.segment_waypoints, budget.feature_vertices, densifier.chunk_size))
+    pending = deque()
+    joiner = Joiner(densifier)
+
+    def submit(batch, pieces, bound, capacity):
+        names, vertices, parts, count = batch.names(), batch.vertices, batch.parts, batch.features
+        batch.close()
+        result = SharedBatch(capacity, parts, count)
+        with budget.lock:
+            allowed = min(bound, budget.remaining())
+            budget.used += allowed
+        jobs = [(piece.fid, piece.split, piece.plan) for piece in pieces]
+        for piece in pieces:
+            piece.plan = None
+        pending.append((batch, result, pieces, allowed, pool.apply_async(
+            _densify_batch, (names, vertices, parts, count, result.names(), capacity, jobs, allowed))))
+
+    def collect():
+        batch, result, pieces, allowed, future = pending.popleft()
+        try:
+            adapted, pieces_adapted, used = future.get()
+        except:
+            result.close(unlink=True)
+            raise
+        finally:
+            batch.segments[0].unlink()
+            batch.segments[1].unlink()
+        with budget.lock:
+            # give back what the batch took and didn't use
+            budget.used += used - allowed
+        densifier.adapted.extend(adapted)
+        for piece, piece_adapted in zip(pieces, pieces_adapted):
+            piece.adapted = piece_adapted
+        try:
+            for i in range(len(pieces)):
+                xy, offsets = result.copy_feature(i)
+                joined = joiner.add(pieces[i], xy, offsets)
+                if joined is not None:
+                    yield (pieces[i].feature,) + joined
+        finally:
+            result.close(unlink=True)
+
+    try:
+        pieces = []
+        items = []
+        vertices = bound = capacity = 0
+        cost = 0.0
+        for xy, piece in split_stream(densifier, features, batch_seconds):
+            pieces.append(piece)
+            items.append((xy, piece.offsets))
+            piece_vertices = piece.offsets[-1] - piece.offsets[0]
+            vertices += piece_vertices
+            cost += piece.cost
+            if piece.planned:
+                # a piece of a feature planned whole was charged already
+                capacity += piece_vertices + sum(piece.plan.waypoints)
+            else:
+                piece_bound = densifier.vertex_bound(xy, piece.offsets)
+                bound += piece_bound
+                capacity += piece_bound
+            if vertices >= batch_vertices or cost >= batch_seconds:
+                submit(SharedBatch.pack(items), pieces, bound, capacity)
+                pieces, items, vertices, bound, capacity, cost = [], [], 0, 0, 0, 0.0
+                if len(pending) >= 2 * workers:
+                    for result in collect():
+                        yield result
+        if items:
+            submit(SharedBatch.pack(items), pieces, bound, capacity)
+        while pending:
+            for result in collect():
+                yield result
+    finally:
+        # also stops the workers when the caller abandons the generator
+        pool.terminate()
+        pool.join()
+        while pending:
+            batch, result, _, allowed, _ = pending.popleft()
+            with budget.lock:
+                budget.used -= allowed
+            batch.segments[0].unlink()
+            batch.segments[1].unlink()
+            result.close(unlink=True)
@@ -0,0 +1,329 @@
+# -*- coding: utf-8 -*-
+"""
+/***************************************************************************
+ GeodesicDensifier
+                                 A QGIS plugin
+ Adds vertices to geometry along geodesic lines
+                              -------------------
+        copyright            : (C) 2018 by Jonah Sullivan
+        email                : jonah.sullivan@ga.gov.au
+ ***************************************************************************/
+
+/***************************************************************************
+ *                                                                         *
+ *   This program is free software; you can redistribute it and/or modify  *
+ *   it under the terms of the Apache 2.0 License.                         *
+ *                                                                         *
+ ***************************************************************************/
+
+ Densified geometries in a columnar ragged layout, for pipelines that
+ analyse the coordinates rather than draw them:
+
+     with RaggedWriter("out.ragged") as writer:
+         writer.extend(densifier.densify_all(features), LINESTRING)
+     lines = RaggedArrays("out.ragged").to_shapely()
+
+ A dataset is a directory of flat binary files, in the byte order of the
+ machine, that are memory-mapped when read so the coordinates are never
+ copied:
+
+     xy.f64               interleaved x, y of every vertex
+     ring_offsets.i64     first vertex of each ring, line or point run
+     part_offsets.i64     first ring of each part (polygon, line or point)
+     feature_offsets.i64  first part of each feature
+     fid.i64              feature id of each feature
+     type.u8              WKB geometry type of each feature
+     meta.json            counts, written last when the dataset is complete
+
+ Each offset file has one more entry than items, ending with the total.
+ This is the nesting of GeoArrow multipolygons; lines and points have one
+ ring per part.  NumPy, Shapely 2 and pyarrow are only needed for the
+ exports.
+"""
+from array import array
+import json
+import mmap
+import os
+import sys
+
+from .engine import as_doubles
+from .wkb import (LINESTRING, MULTILINESTRING, MULTIPOINT, MULTIPOLYGON, POINT, POLYGON, write_wkb)
+
+FORMAT = 'geodesic-ragged'
+VERSION = 1
+
+# file name and array type code of each column
+_COLUMNS = (
+    ('xy', 'xy.f64', 'd'),
+    ('ring_offsets', 'ring_offsets.i64', 'q'),
+    ('part_offsets', 'part_offsets.i64', 'q'),
+    ('feature_offsets', 'feature_offsets.i64', 'q'),
+    ('fids', 'fid.i64', 'q'),
+    ('types', 'type.u8', 'B'),
+)
+_META = 'meta.json'
+
+_NAMES = {POINT: 'POINT', LINESTRING: 'LINESTRING', POLYGON: 'POLYGON',
+          MULTIPOINT: 'MULTIPOINT', MULTILINESTRING: 'MULTILINESTRING', MULTIPOLYGON: 'MULTIPOLYGON'}
+
+
+class RaggedWriter:
+    """Append densified features to a ragged dataset.
+
+    Coordinates are written in one slice per feature and offsets in one
+    write per feature, so no Python object is created per vertex.  The
+    dataset can only be read once :meth:`close` has written its counts.
+
+    :param path: Directory of the dataset, created if needed.  Existing
+        columns are overwritten.
+    :type path: str
+    """
+
+    def __init__(self, path):
+        self.path = path
+        os.makedirs(path, exist_ok=True)
+        meta = os.path.join(path, _META)
+        if os.path.exists(meta):
+            os.remove(meta)
+        self._files = {name: open(os.path.join(path, file_name), 'wb') for name, file_name, _ in _COLUMNS}
+        self.vertices = 0
+        self.rings = 0
+        self.parts = 0
+        self.features = 0
+        for name in ('ring_offsets', 'part_offsets', 'feature_offsets'):
+            self._files[name].write(array('q', [0]).tobytes())
+
+    def add(self, fid, xy, offsets, geometry_type=LINESTRING, polygons=None):
+        """Append a feature.
+
+        :param fid: Feature id.
+        :type fid: int
+
+        :param xy: Interleaved x, y values, e.g. from
+            :meth:`Densifier.densify_array`.
+        :type xy: buffer
+
+        :param offsets: Part offsets into *xy*: the rings of polygon types,
+            as returned by :func:`wkb.read_wkb`.
+        :type offsets: sequence of int
+
+        :param geometry_type: Flat WKB geometry type, changed to the multi
+            type for a point or line of several parts.
+        :type geometry_type: int
+
+        :param polygons: For polygon types, the ring ranges of each polygon
+            as returned by :func:`wkb.read_wkb`; None makes each ring a
+            polygon.
+        :type polygons: sequence of int
+        """
+        start, end = offsets[0], offsets[-1]
+        self._files['xy'].write(as_doubles(xy)[2 * start:2 * end])
+        rings = len(offsets) - 1
+        if geometry_type in (POINT, LINESTRING) and rings > 1:
+            geometry_type += 3
+        elif geometry_type == POLYGON and polygons is not None and len(polygons) > 2:
+            geometry_type = MULTIPOLYGON
+        self._files['ring_offsets'].write(
+            array('q', (self.vertices + offsets[k] - start for k in range(1, rings + 1))).tobytes())
+        if polygons is not None:
+            parts = array('q', (self.rings + polygons[k] - polygons[0] for k in range(1, len(polygons))))
+        else:
+            parts = array('q', range(self.rings + 1, self.rings + rings + 1))
+        self._files['part_offsets'].write(parts.tobytes())
+        self.vertices += end - start
+        self.rings += rings
+        self.parts += len(parts)
+        self.features += 1
+        self._files['feature_offsets'].write(array('q', [self.parts]).tobytes())
+        self._files['fids'].write(array('q', [fid]).tobytes())
+        self._files['types'].write(bytes((geometry_type,)))
+
+    def extend(self, results, geometry_type=LINESTRING):
+        """Append densified features of one geometry type.
+
+        :param results: Iterable of (fid, xy, offsets), e.g. from
+            :meth:`Densifier.densify_all`, or for polygon types of (fid,
+            xy, offsets, polygons) with the ring ranges of each polygon as
+            returned by :func:`wkb.read_wkb`.
+        :type results: iterable
+
+        :param geometry_type: Flat WKB geometry type, as for :meth:`add`.
+        :type geometry_type: int
+
+        :raises ValueError: If a polygon result has no ring ranges, which
+            would make each of its holes a polygon.
+        """
+        for result in results:
+            polygons = result[3] if len(result) > 3 else None
+            if polygons is None and geometry_type in (POLYGON, MULTIPOLYGON):
+                raise ValueError("polygon results need the ring ranges of their polygons")
+            self.add(result[0], result[1], result[2], geometry_type, polygons)
+
+    def close(self):
+        """ close the columns and write the counts """
+        if self._files is None:
+            return
+        for f in self._files.values():
+            f.close()
+        self._files = None
+        with open(os.path.join(self.path, _META), 'w') as f:
+            json.dump({'format': FORMAT, 'version': VERSION, 'byteorder': sys.byteorder,
+                       'vertices': self.vertices, 'rings': self.rings, 'parts': self.parts,
+                       'features': self.features}, f)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+
+class RaggedArrays:
+    """A ragged dataset, memory-mapped read only.
+
+    The columns are memoryviews over the maps: *xy* of doubles, the offset
+    columns and *fids* of 64 bit integers and *types* of bytes.  NumPy
+    arrays made with ``numpy.frombuffer`` share the maps, so
+    :meth:`close` fails with BufferError while any of them is alive.
+
+    :param path: Directory of the dataset.
+    :type path: str
+
+    :raises ValueError: If the directory is not a complete dataset or was
+        written on a machine of the other byte order.
+    """
+
+    def __init__(self, path):
+        self.path = path
+        try:
+            with open(os.path.join(path, _META)) as f:
+                meta = json.load(f)
+        except (OSError, ValueError):
+            raise ValueError("not a complete ragged dataset: {}".format(path))
+        if meta.get('format') != FORMAT or meta.get('version') != VERSION:
+            raise ValueError("not a ragged dataset of version {}: {}".format(VERSION, path))
+        if meta['byteorder'] != sys.byteorder:
+            raise ValueError("ragged dataset written in {} endian order".format(meta['byteorder']))
+        self.vertices = meta['vertices']
+        self.rings = meta['rings']
+        self.parts = meta['parts']
+        self.features = meta['features']
+        self._maps = []
+        for name, file_name, code in _COLUMNS:
+            setattr(self, name, self._map(os.path.join(path, file_name), code))
+
+    def _map(self, file_name, code):
+        with open(file_name, 'rb') as f:
+            if not os.fstat(f.fileno()).st_size:
+                # an empty file can't be mapped
+                return memoryview(array(code))
+            data = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        self._maps.append(data)
+        return memoryview(data).cast(code)
+
+    def close(self):
+        """ release the columns and unmap the files """
+        for name, _, _ in _COLUMNS:
+            getattr(self, name).release()
+        for data in self._maps:
+            data.close()
+        self._maps = []
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def __len__(self):
+        return self.features
+
+    def feature(self, i):
+        """Coordinates of the i-th feature, without copying them.
+
+        :returns: The feature id, the geometry type, the whole *xy* column,
+            the ring offsets of the feature as global vertex indices and
+            for polygon types the ring ranges of its polygons, as taken by
+            :meth:`Densifier.densify_array` and :func:`wkb.write_wkb`.
+        :rtype: (int, int, memoryview, memoryview, list)
+        """
+        first, last = self.feature_offsets[i], self.feature_offsets[i + 1]
+        start, end = self.part_offsets[first], self.part_offsets[last]
+        geometry_type = self.types[i]
+        polygons = None
+        if geometry_type in (POLYGON, MULTIPOLYGON):
+            polygons = [self.part_offsets[p] - start for p in range(first, last + 1)]
+        return self.fids[i], geometry_type, self.xy, self.ring_offsets[start:end + 1], polygons
+
+    def wkb(self, i):
+        """ the i-th feature as WKB """
+        _, geometry_type, xy, offsets, polygons = self.feature(i)
+        return write_wkb(geometry_type, xy, offsets, polygons)
+
+    def ragged_array(self):
+        """The dataset as the coordinates and offsets of one geometry type.
+
+        This is the layout of ``shapely.to_ragged_array`` and of GeoArrow.
+        Features are promoted to the multi type when any of them is a
+        multi type or has more than one part.  Needs NumPy; the arrays
+        share the maps where the layouts agree.
+
+        :returns: The WKB geometry type, the (n, 2) coordinates and the
+            tuple of offset arrays, innermost first.
+        :rtype: (int, numpy.ndarray, tuple)
+
+        :raises ValueError: If the dataset is empty or mixes points, lines
+            and polygons.
+        """
+        import numpy
+        types = numpy.frombuffer(self.types, numpy.uint8)
+        families = set(((numpy.unique(types) - 1) % 3 + 1).tolist())
+        if len(families) != 1:
+            raise ValueError("ragged dataset of {} geometry families".format(len(families) or "no"))
+        family = families.pop()
+        multi = bool((types > 3).any()) or self.parts != self.features
+        coords = numpy.frombuffer(self.xy, numpy.float64).reshape(-1, 2)
+        rings = numpy.frombuffer(self.ring_offsets, numpy.int64)
+        parts = numpy.frombuffer(self.part_offsets, numpy.int64)
+        features = numpy.frombuffer(self.feature_offsets, numpy.int64)
+        if family == POINT:
+            if not multi:
+                return POINT, coords, ()
+            return MULTIPOINT, coords, (rings[parts[features]],)
+        if family == LINESTRING:
+            if not multi:
+                return LINESTRING, coords, (rings,)
+            return MULTILINESTRING, coords, (rings, parts[features])
+        if not multi:
+            return POLYGON, coords, (rings, parts)
+        return MULTIPOLYGON, coords, (rings, parts, features)
+
+    def to_shapely(self):
+        """The features as a NumPy array of Shapely 2 geometries, in the
+        order of :attr:`fids`.
+
+        :raises ImportError: If Shapely 2 is not installed.
+        """
+        import shapely
+        geometry_type, coords, offsets = self.ragged_array()
+        return shapely.from_ragged_array(shapely.GeometryType[_NAMES[geometry_type]], coords, offsets or None)
+
+    def to_geoarrow(self):
+        """The features as a pyarrow Table of a ``fid`` column and a
+        ``geometry`` column of GeoArrow native type, with interleaved
+        coordinates and 64 bit offsets.
+
+        :raises ImportError: If pyarrow is not installed.
+        """
+        import numpy
+        import pyarrow
+        geometry_type, coords, offsets = self.ragged_array()
+        geometry = pyarrow.FixedSizeListArray.from_arrays(
+            pyarrow.array(coords.reshape(-1)), type=pyarrow.list_(pyarrow.field('xy', pyarrow.float64()), 2))
+        for offset in offsets:
+            geometry = pyarrow.LargeListArray.from_arrays(pyarrow.array(offset), geometry)
+        field = pyarrow.field('geometry', geometry.type, nullable=False, metadata={
+            'ARROW:extension:name': 'geoarrow.' + _NAMES[geometry_type].lower(),
+            'ARROW:extension:metadata': '{}'})
+        fids = pyarrow.array(numpy.frombuffer(self.fids, numpy.int64))
+        return pyarrow.Table.from_arrays([fids, geometry], schema=pyarrow.schema([('fid', pyarrow.int64()), field]))
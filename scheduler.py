@@ -0,0 +1,462 @@
+# -*- coding: utf-8 -*-
+"""
+/***************************************************************************
+ GeodesicDensifier
+                                 A QGIS plugin
+ Adds vertices to geometry along geodesic lines
+                              -------------------
+        copyright            : (C) 2018 by Jonah Sullivan
+        email                : jonah.sullivan@ga.gov.au
+ ***************************************************************************/
+
+/***************************************************************************
+ *                                                                         *
+ *   This program is free software; you can redistribute it and/or modify  *
+ *   it under the terms of the Apache 2.0 License.                         *
+ *                                                                         *
+ ***************************************************************************/
+
+ Cost-aware scheduling of densification work on threads.  Features are
+ costed from their vertex counts and approximate lengths, the largest are
+ split into pieces, and the pieces are handed out longest first with idle
+ threads stealing from busy ones.  Streams that are not scheduled in
+ windows, the pipeline and the process batches, split features with
+ split_stream and join them back with a Joiner.
+"""
+from array import array
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+
+from .engine import LENGTH_MARGIN, as_doubles, default_workers
+from .spill import SpillBuffer
+
+# predicted seconds of a piece of a feature split by split_stream
+PIECE_SECONDS = 0.05
+
+
+class Piece:
+    """A run of consecutive vertices of one feature, densified on its own.
+
+    :param feature: Index of the feature in its window.
+    :type feature: int
+
+    :param offsets: Part offsets of the piece, global vertex indices into
+        the feature's coordinates.
+    :type offsets: list
+
+    :param parts: Index in the feature of each part of the piece.
+    :type parts: list
+
+    :param cost: Predicted seconds.
+    :type cost: float
+
+    :param fid: Feature id used when reporting budget adaptations, None
+        when it is *feature*.
+    """
+
+    def __init__(self, feature, offsets, parts, cost, fid=None):
+        self.feature = feature
+        self.offsets = offsets
+        self.parts = parts
+        self.cost = cost
+        self.fid = feature if fid is None else fid
+        # parts of the whole feature, and whether this is its last piece
+        self.part_count = len(offsets) - 1
+        self.last = True
+        # set by cut_feature: the piece's slice of the plan of the feature
+        # when it was planned whole, otherwise whether the caps cut the
+        # piece short once densified
+        self.split = False
+        self.plan = None
+        self.planned = False
+        self.adapted = False
+        self.result = None
+
+
+def split_feature(feature, offsets, costs, target):
+    """Cut a feature into pieces of about *target* seconds.
+
+    Pieces end at a part end, or in the middle of a part, in which case the
+    next piece starts at the same vertex.
+
+    :param feature: Index of the feature in its window.
+    :type feature: int
+
+    :param offsets: Part offsets of the feature.
+    :type offsets: sequence of int
+
+    :param costs: Cost of each segment, from
+        :meth:`Densifier.segment_costs`.
+    :type costs: sequence of float
+
+    :param target: Cost of a piece.
+    :type target: float
+
+    :rtype: list of Piece
+    """
+    pieces = []
+    piece_offsets = [offsets[0]]
+    parts = []
+    cost = 0.0
+    i = 0
+    last = len(offsets) - 2
+    for p in range(len(offsets) - 1):
+        start, end = offsets[p], offsets[p + 1]
+        parts.append(p)
+        for j in range(start + 1, end):
+            cost += costs[i]
+            i += 1
+            if cost >= target and not (p == last and j == end - 1):
+                # cut after vertex j and start the next piece on it
+                piece_offsets.append(j + 1)
+                pieces.append(Piece(feature, piece_offsets, parts, cost))
+                if j == end - 1:
+                    piece_offsets, parts = [end], []
+                else:
+                    piece_offsets, parts = [j], [p]
+                cost = 0.0
+        if p not in parts:
+            # the part started with the last cut
+            continue
+        piece_offsets.append(end)
+    if parts:
+        pieces.append(Piece(feature, piece_offsets, parts, cost))
+    return pieces
+
+
+def cut_feature(densifier, feature, xy, offsets, costs, target, fid=None):
+    """Split a feature as :func:`split_feature` does, for
+    :func:`densify_piece`.
+
+    A feature that may not fit the feature vertex cap, or the budget left,
+    is planned whole here, on the calling thread, and each piece gets its
+    slice of the plan, so the waypoints are fitted as for the unsplit
+    feature.  The pieces of other features are planned on their own where
+    they are densified, which gives the same waypoints since none are cut.
+
+    :param densifier: The densifier of the run.
+    :type densifier: engine.Densifier
+
+    :param xy: Coordinates of the feature.
+    :type xy: buffer
+
+    :param fid: Feature id, as for :class:`Piece`.
+
+    :rtype: list of Piece
+    """
+    pieces = split_feature(feature, offsets, costs, target)
+    for piece in pieces:
+        piece.fid = feature if fid is None else fid
+        piece.part_count = len(offsets) - 1
+        piece.split = True
+        piece.last = False
+    pieces[-1].last = True
+    budget = densifier.budget
+    bound = offsets[-1] - offsets[0] + sum(densifier.segment_waypoints(xy, offsets, LENGTH_MARGIN))
+    if bound <= min(budget.feature_vertices, budget.remaining()):
+        return pieces
+    plan = densifier.plan(xy, offsets)
+    if plan.adapted:
+        densifier.adapted.append(pieces[0].fid)
+    # index of the first segment of each part
+    first = [0]
+    for p in range(len(offsets) - 1):
+        first.append(first[-1] + max(offsets[p + 1] - offsets[p] - 1, 0))
+    for piece in pieces:
+        ranges = []
+        for k, p in enumerate(piece.parts):
+            start = first[p] + piece.offsets[k] - offsets[p]
+            ranges.append((start, start + max(piece.offsets[k + 1] - piece.offsets[k] - 1, 0)))
+        piece.plan = plan.take(ranges)
+        piece.planned = True
+    return pieces
+
+
+def plan_piece(densifier, xy, piece):
+    """The fid and plan to densify a piece with, as passed to
+    :meth:`Densifier.stream`.
+
+    A whole feature is planned by the densifier as usual.  The piece of a
+    feature planned whole has its slice of the plan, and the piece of any
+    other feature is planned here, recording in :attr:`Piece.adapted`
+    whether the caps cut it short.
+
+    :rtype: (int, engine.Plan)
+    """
+    if not piece.split:
+        return piece.fid, None
+    plan = piece.plan
+    if plan is None:
+        plan = densifier.plan(xy, piece.offsets)
+        piece.adapted = plan.adapted
+    # the piece only keeps its coordinates from here
+    piece.plan = None
+    return None, plan
+
+
+def densify_piece(densifier, xy, piece):
+    """Densify a piece from :func:`split_stream` or :func:`cut_feature`.
+
+    :param xy: Coordinates of the whole feature.
+    :type xy: buffer
+
+    :returns: Coordinates and part offsets, as from
+        :meth:`Densifier.densify_array`, for :func:`join_pieces` or a
+        :class:`Joiner`.
+    :rtype: (array('d'), array('q'))
+    """
+    fid, plan = plan_piece(densifier, xy, piece)
+    return densifier.densify_array(xy, piece.offsets, fid, plan)
+
+
+def split_stream(densifier, features, target=PIECE_SECONDS, fid=None):
+    """Cut the features of a stream that cost more than twice *target*
+    into pieces, and keep the others whole.
+
+    :param densifier: The densifier that costs the features.
+    :type densifier: engine.Densifier
+
+    :param features: Iterable of (key, xy, offsets), as for
+        :meth:`Densifier.densify_all`.  The key is kept in
+        :attr:`Piece.feature`.
+    :type features: iterable
+
+    :param target: Predicted seconds of a piece.
+    :type target: float
+
+    :param fid: Function giving the feature id of a key, None when the
+        keys are the ids.
+    :type fid: callable
+
+    :returns: A generator of (xy, piece) in input order, a whole feature
+        being a single last piece.  The pieces are densified with
+        :func:`densify_piece` and passed in order to a :class:`Joiner`.
+    """
+    for key, xy, offsets in features:
+        xy = as_doubles(xy)
+        if offsets is None:
+            offsets = (0, len(xy) // 2)
+        costs = densifier.segment_costs(xy, offsets)
+        cost = sum(costs)
+        feature_id = key if fid is None else fid(key)
+        if cost > 2 * target:
+            for piece in cut_feature(densifier, key, xy, offsets, costs, target, feature_id):
+                yield xy, piece
+        else:
+            yield xy, Piece(key, offsets, list(range(len(offsets) - 1)), cost, feature_id)
+
+
+def join_pieces(densifier, pieces):
+    """Stitch the densified pieces of a feature.
+
+    Pieces planned on their own each took their vertices from the budget,
+    so the vertices they shared are given back, and the feature goes into
+    the densifier's adapted list once if the caps cut any of them short.
+    A feature planned whole was charged and recorded by
+    :func:`cut_feature`.
+
+    :rtype: (array('d'), array('q'))
+    """
+    dense, offsets, dropped = stitch(pieces, pieces[0].part_count, densifier.memory_budget)
+    if not pieces[0].planned:
+        with densifier.budget.lock:
+            densifier.budget.used -= dropped
+        if any(piece.adapted for piece in pieces):
+            densifier.adapted.append(pieces[0].fid)
+    return dense, offsets
+
+
+class Joiner:
+    """Join split features from their densified pieces, taken in the
+    order :func:`split_stream` made them.
+
+    :param densifier: The densifier of the run, whose budget gets back the
+        vertices the pieces shared.
+    :type densifier: engine.Densifier
+    """
+
+    def __init__(self, densifier):
+        self.densifier = densifier
+        self.pieces = []
+
+    def add(self, piece, xy, offsets):
+        """Take the result of a piece.
+
+        :returns: The coordinates and part offsets of the feature once its
+            last piece is in, None before.
+        :rtype: (array('d'), array('q'))
+        """
+        if piece.last and not self.pieces:
+            return xy, offsets
+        piece.result = xy, offsets
+        self.pieces.append(piece)
+        if not piece.last:
+            return None
+        pieces, self.pieces = self.pieces, []
+        return join_pieces(self.densifier, pieces)
+
+
+def stitch(pieces, part_count, memory_budget=None):
+    """Join the densified pieces of a feature.
+
+    The pieces cover the parts in order, so they are joined into a single
+    buffer.
+
+    :param pieces: The pieces of one feature, in order, with their results.
+    :type pieces: list of Piece
+
+    :param part_count: Number of parts of the feature.
+    :type part_count: int
+
+    :param memory_budget: Budget the joined coordinates are kept within,
+        see :attr:`Densifier.memory_budget`.
+    :type memory_budget: spill.MemoryBudget
+
+    :returns: Coordinates, part offsets and the number of vertices that
+        appeared in two pieces and were dropped.
+    :rtype: (array('d'), array('q'), int)
+    """
+    xy = SpillBuffer('d', memory_budget)
+    counts = [0] * part_count
+    dropped = 0
+    for piece in pieces:
+        dense, offsets = piece.result
+        # release the piece as soon as it is copied
+        piece.result = None
+        for k, p in enumerate(piece.parts):
+            start, end = 2 * offsets[k], 2 * offsets[k + 1]
+            if counts[p] and end > start:
+                # the piece starts on the vertex the previous one ended on
+                start += 2
+                dropped += 1
+            xy.extend(dense[start:end])
+            counts[p] += (end - start) // 2
+    offsets = array('q', [0])
+    for count in counts:
+        offsets.append(offsets[-1] + count)
+    return xy.result(), offsets, dropped
+
+
+class Scheduler:
+    """Densify features on threads, balancing the load by predicted cost.
+
+    Features are taken *window* at a time.  Those costing more than a fair
+    share of their window are split into pieces, every piece is assigned
+    to the thread with the least work so far, longest first, and each
+    thread works through its own queue from the longest piece down.  A
+    thread that runs out steals the shortest piece of the thread with the
+    most queued.
+
+    :param densifier: The densification engine, shared by the threads.
+    :type densifier: engine.Densifier
+
+    :param workers: Number of threads, None for
+        :func:`engine.default_workers`.
+    :type workers: int
+
+    :param window: Number of features scheduled together.
+    :type window: int
+
+    :param pieces_per_worker: How finely a window is cut: a piece costs
+        at most the window's cost over workers * pieces_per_worker.
+    :type pieces_per_worker: int
+    """
+
+    def __init__(self, densifier, workers=None, window=4096, pieces_per_worker=4):
+        self.densifier = densifier
+        self.workers = workers if workers is not None else default_workers()
+        self.window = int(window)
+        self.pieces_per_worker = int(pieces_per_worker)
+        # number of features split, for the run report
+        self.split = 0
+
+    def run(self, features):
+        """Densify features and return them in input order.
+
+        :param features: Iterable of (fid, xy, offsets), as for
+            :meth:`Densifier.densify_all`.
+        :type features: iterable
+
+        :returns: A generator of (fid, xy, offsets).
+        """
+        window = []
+        for feature in features:
+            window.append(feature)
+            if len(window) >= self.window:
+                for result in self._run_window(window):
+                    yield result
+                window = []
+        if window:
+            for result in self._run_window(window):
+                yield result
+
+    def _run_window(self, window):
+        densifier = self.densifier
+        if self.workers <= 1:
+            for fid, xy, offsets in window:
+                dense, dense_offsets = densifier.densify_array(xy, offsets, fid)
+                yield fid, dense, dense_offsets
+            return
+
+        # cost every feature, then split those above a fair share
+        features = []
+        costs = []
+        for fid, xy, offsets in window:
+            xy = as_doubles(xy)
+            if offsets is None:
+                offsets = (0, len(xy) // 2)
+            features.append((fid, xy, offsets))
+            costs.append(densifier.segment_costs(xy, offsets))
+        total = sum(sum(c) for c in costs)
+        target = total / (self.workers * self.pieces_per_worker)
+        pieces = []
+        for i, (fid, xy, offsets) in enumerate(features):
+            cost = sum(costs[i])
+            if target > 0 and cost > 2 * target:
+                pieces.extend(cut_feature(densifier, i, xy, offsets, costs[i], target, fid))
+                self.split += 1
+            else:
+                pieces.append(Piece(i, list(offsets), list(range(len(offsets) - 1)), cost, fid))
+
+        # longest processing time first onto the least loaded queue
+        queues = [deque() for _ in range(self.workers)]
+        loads = [0.0] * self.workers
+        for piece in sorted(pieces, key=lambda piece: piece.cost, reverse=True):
+            w = loads.index(min(loads))
+            queues[w].append(piece)
+            loads[w] += piece.cost
+
+        def take(w):
+            """ the next piece for thread w, stolen from another thread when its own queue is empty """
+            try:
+                return queues[w].popleft()
+            except IndexError:
+                pass
+            while True:
+                victim = max(queues, key=len)
+                try:
+                    return victim.pop()
+                except IndexError:
+                    if not any(queues):
+                        return None
+
+        def work(w):
+            while True:
+                piece = take(w)
+                if piece is None:
+                    return
+                piece.result = densify_piece(densifier, features[piece.feature][1], piece)
+
+        with ThreadPoolExecutor(self.workers) as pool:
+            for future in [pool.submit(work, w) for w in range(self.workers)]:
+                future.result()
+
+        by_feature = [[] for _ in features]
+        for piece in pieces:
+            by_feature[piece.feature].append(piece)
+        for i, (fid, xy, offsets) in enumerate(features):
+            if len(by_feature[i]) == 1:
+                dense, dense_offsets = by_feature[i][0].result
+            else:
+                dense, dense_offsets = join_pieces(densifier, by_feature[i])
+            yield fid, dense, dense_offsets
@@ -0,0 +1,167 @@
+# -*- coding: utf-8 -*-
+"""
+/***************************************************************************
+ GeodesicDensifier
+                                 A QGIS plugin
+ Adds vertices to geometry along geodesic lines
+                              -------------------
+        copyright            : (C) 2018 by Jonah Sullivan
+        email                : jonah.sullivan@ga.gov.au
+ ***************************************************************************/
+
+/***************************************************************************
+ *                                                                         *
+ *   This program is free software; you can redistribute it and/or modify  *
+ *   it under the terms of the Apache 2.0 License.                         *
+ *                                                                         *
+ ***************************************************************************/
+
+ A memory budget for the intermediate buffers of a run: the segment
+ caches and densified coordinates of each feature, the results held for
+ the output order and the pieces of split features.  Buffers that would
+ take the run over the budget are moved to temporary files and read back
+ through memory maps, whose pages the system can drop at any time.
+"""
+from array import array
+import mmap
+import sys
+import tempfile
+import threading
+import weakref
+
+# buffers smaller than this stay in memory even over the budget, so a run
+# over budget doesn't open a file per feature
+MIN_SPILL_BYTES = 1048576
+
+
+class MemoryBudget:
+    """Bytes of intermediate buffers a run may keep in memory.
+
+    :param limit: Bytes held in memory before buffers spill to files.
+    :type limit: int
+
+    :param directory: Directory of the temporary files, None for the
+        system temporary directory.
+    :type directory: str
+    """
+
+    def __init__(self, limit, directory=None):
+        self.limit = int(limit)
+        self.directory = directory or None
+        # bytes held now and at most, and written to files, for the run report
+        self.used = 0
+        self.peak = 0
+        self.spilled = 0
+        self.files = 0
+        self.lock = threading.Lock()
+
+    def reserve(self, nbytes, force=False):
+        """ take nbytes from the budget, False when they don't fit unless force """
+        with self.lock:
+            if not force and self.used + nbytes > self.limit:
+                return False
+            self.used += nbytes
+            self.peak = max(self.peak, self.used)
+            return True
+
+    def release(self, nbytes):
+        """ give back bytes taken by reserve """
+        with self.lock:
+            self.used -= nbytes
+
+    def report(self):
+        """ peak memory and spilled bytes as text """
+        return "memory budget: peak {:.1f} of {:.1f} MB, {:.1f} MB spilled to {} files".format(
+            self.peak / 1048576.0, self.limit / 1048576.0, self.spilled / 1048576.0, self.files)
+
+
+class SpillBuffer:
+    """A growing buffer of numbers, kept in memory within a budget and
+    moved to a temporary file beyond it.
+
+    Values are added with :meth:`extend`; :meth:`result` then returns them
+    as an array, or as a memoryview over a read only map of the file.
+    Either way the bytes go back to the budget when the result is garbage
+    collected, and the file is deleted.
+
+    :param typecode: Array type code of the values.
+    :type typecode: str
+
+    :param budget: The budget to draw on, None to keep the values in
+        memory.
+    :type budget: MemoryBudget
+    """
+
+    def __init__(self, typecode, budget=None):
+        self.typecode = typecode
+        self.budget = budget
+        self._array = array(typecode)
+        self._itemsize = self._array.itemsize
+        self._reserved = 0
+        self._file = None
+        self._length = 0
+
+    def __len__(self):
+        return self._length
+
+    def extend(self, values):
+        """ append an array or a buffer of values of the type code """
+        count = len(values)
+        if self._file is None:
+            size = count * self._itemsize
+            if self.budget is None:
+                self._add(values)
+                self._length += count
+                return
+            if self.budget.reserve(size, self._reserved + size < MIN_SPILL_BYTES):
+                self._reserved += size
+                self._add(values)
+                self._length += count
+                return
+            self._spill()
+        data = memoryview(values).cast('B')
+        self._file.write(data)
+        with self.budget.lock:
+            self.budget.spilled += len(data)
+        self._length += count
+
+    def _add(self, values):
+        if isinstance(values, array):
+            self._array.extend(values)
+        else:
+            self._array.frombytes(memoryview(values).cast('B'))
+
+    def _spill(self):
+        """ move the values to a temporary file and give their bytes back """
+        self._file = tempfile.TemporaryFile(prefix='geodesic-spill-', dir=self.budget.directory)
+        data = memoryview(self._array).cast('B')
+        self._file.write(data)
+        with self.budget.lock:
+            self.budget.files += 1
+            self.budget.spilled += len(data)
+        data.release()
+        self._array = None
+        self.budget.release(self._reserved)
+        self._reserved = 0
+
+    def result(self):
+        """The values, which can't be extended afterwards.
+
+        :returns: An array when the values stayed in memory, a memoryview
+            of the type code over the mapped file otherwise.
+        :rtype: array or memoryview
+        """
+        if self._file is None:
+            values, self._array = self._array, None
+            if self._reserved:
+                weakref.finalize(values, self.budget.release, self._reserved)
+                self._reserved = 0
+            return values
+        self._file.flush()
+        # without its own handle the map doesn't keep a file open per result
+        options = {'trackfd': False} if sys.version_info >= (3, 13) else {}
+        mapped = mmap.mmap(self._file.fileno(), 0, access=mmap.ACCESS_READ, **options)
+        # the map keeps the data of the already deleted file
+        self._file.close()
+        self._file = None
+        return memoryview(mapped).cast(self.typecode)
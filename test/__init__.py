@@ -0,0 +1,37 @@
+# -*- coding: utf-8 -*-
+"""
+/***************************************************************************
+ GeodesicDensifier
+                                 A QGIS plugin
+ Adds vertices to geometry along geodesic lines
+                              -------------------
+        copyright            : (C) 2018 by Jonah Sullivan
+        email                : jonah.sullivan@ga.gov.au
+ ***************************************************************************/
+
+/***************************************************************************
+ *                                                                         *
+ *   This program is free software; you can redistribute it and/or modify  *
+ *   it under the terms of the Apache 2.0 License.                         *
+ *                                                                         *
+ ***************************************************************************/
+
+ Tests of the plugin modules.  They import the modules relatively, so run
+ them with the plugin as a package, from the directory holding it:
+
+     python3 -m unittest discover -s GeodesicDensifier/test -t .
+
+ or with pytest from the plugin directory.  Tests of modules built on QGIS
+ are skipped when it can't be imported.
+"""
+import os
+import site
+
+# only imported to make geographiclib importable for the backends
+try:
+    # use system version of geographiclib
+    import geographiclib
+except ImportError:
+    # use version of geographiclib distributed with plugin, as the plugin does
+    site.addsitedir(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+    import geographiclib
@@ -0,0 +1,62 @@
+# -*- coding: utf-8 -*-
+"""
+ Conformance of the geodesic backends with the geographiclib test cases.
+ Backends whose libraries are not installed are skipped.
+"""
+import unittest
+
+from geographiclib.geodesic import Geodesic
+from geographiclib.test import test_geodesic
+
+from .. import backends
+
+
+class BackendTest(unittest.TestCase):
+
+    def check(self, name):
+        if name not in backends.available_backends():
+            self.skipTest("{} is not installed".format(name))
+        backend = backends.make_backend(name, Geodesic.WGS84.a, Geodesic.WGS84.f)
+        self.assertEqual(backend.name, name)
+        for case in test_geodesic.GeodesicTest.testcases:
+            (lat1, lon1, azi1, lat2, lon2, azi2,
+             s12, a12, m12, M12, M21, S12) = case
+            inv_s12, inv_azi1 = backend.inverse(lat1, lon1, lat2, lon2)
+            self.assertAlmostEqual(azi1, inv_azi1, delta=1e-12)
+            self.assertAlmostEqual(s12, inv_s12, delta=1e-8)
+            # the midpoint and the end point, with the longitude unrolled
+            xy = backend.positions(backend.line(lat1, lon1, azi1), s12 / 2, 1, 2)
+            self.assertEqual(len(xy), 4)
+            self.assertAlmostEqual(lon2, xy[2], delta=1e-12)
+            self.assertAlmostEqual(lat2, xy[3], delta=1e-12)
+
+    def test_system(self):
+        self.check('system')
+
+    def test_bundled(self):
+        self.check('bundled')
+
+    def test_numpy(self):
+        self.check('numpy')
+
+    def test_pyproj(self):
+        self.check('pyproj')
+
+    def test_auto(self):
+        backend = backends.make_backend('auto', Geodesic.WGS84.a, Geodesic.WGS84.f)
+        self.assertIn(backend.name, ('system', 'bundled'))
+
+    def test_unknown(self):
+        with self.assertRaises(ValueError):
+            backends.make_backend('nonesuch', Geodesic.WGS84.a, Geodesic.WGS84.f)
+
+    def test_positions_offset(self):
+        backend = backends.make_backend('bundled', Geodesic.WGS84.a, Geodesic.WGS84.f)
+        line = backend.line(-33.9, 151.2, 45)
+        xy = backend.positions(line, 1000, 1, 5)
+        self.assertEqual(list(backend.positions(line, 1000, 3, 2)), list(xy[4:8]))
+        self.assertEqual(len(backend.positions(line, 1000, 1, 0)), 0)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,43 @@
+# -*- coding: utf-8 -*-
+"""
+ Tests of the checkpoints of long runs.
+"""
+import os
+import tempfile
+import unittest
+
+from ..checkpoint import Checkpoint, fingerprint
+
+
+class CheckpointTest(unittest.TestCase):
+
+    def setUp(self):
+        self.directory = tempfile.TemporaryDirectory()
+        self.parameters = {'layer': 'roads', 'spacing': 900.0, 'fids': fingerprint([1, 2, 3])}
+
+    def tearDown(self):
+        self.directory.cleanup()
+
+    def test_save_load(self):
+        path = Checkpoint.sidecar_path(self.directory.name, 'roads out', self.parameters)
+        saved = Checkpoint(path, self.parameters, 'out.gpkg', max_pending=2)
+        self.assertFalse(saved.done(0, 10))
+        self.assertTrue(saved.done(1, 11))
+        saved.save(2, 345)
+        self.assertFalse(os.path.exists(path + '.tmp'))
+        loaded = Checkpoint.load(path, self.parameters)
+        self.assertEqual((loaded.position, loaded.fid, loaded.rows, loaded.vertices, loaded.output),
+                         (2, 11, 2, 345, 'out.gpkg'))
+        self.assertIsNone(Checkpoint.load(path, dict(self.parameters, spacing=1000.0)))
+        loaded.remove()
+        self.assertIsNone(Checkpoint.load(path, self.parameters))
+
+    def test_corrupt(self):
+        path = os.path.join(self.directory.name, 'bad.checkpoint.json')
+        with open(path, 'w') as f:
+            f.write('{"format": ')
+        self.assertIsNone(Checkpoint.load(path, self.parameters))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,142 @@
+# -*- coding: utf-8 -*-
+"""
+ Tests of the densification engine: the flat buffer and streaming APIs
+ against one Inverse and one Line per segment, as the plugin densified
+ before them.
+"""
+from array import array
+import unittest
+
+from geographiclib.geodesic import Geodesic
+
+from ..engine import Densifier, VertexBudget, pack_parts, quantize, quantize_points, unpack_parts
+
+# a line across the antimeridian, and a ring
+LINE = [(170.0, -10.0), (-175.0, 5.0), (-160.0, 40.0), (-150.0, 40.5)]
+RING = [(0.0, 0.0), (20.0, 0.0), (20.0, 20.0), (0.0, 20.0), (0.0, 0.0)]
+
+
+def reference(densifier, parts):
+    """ the densified parts, from one Inverse and one Line per segment """
+    geod = Geodesic.WGS84
+    result = []
+    for part in parts:
+        out = [part[0]]
+        for (lon1, lat1), (lon2, lat2) in zip(part[:-1], part[1:]):
+            inverse = geod.Inverse(lat1, lon1, lat2, lon2)
+            n = densifier.waypoint_count(inverse['s12'])
+            line = geod.Line(lat1, lon1, inverse['azi1'])
+            for k in range(1, n + 1):
+                position = line.Position(k * inverse['s12'] / (n + 1), Geodesic.STANDARD | Geodesic.LONG_UNROLL)
+                out.append((position['lon2'], position['lat2']))
+            out.append((lon2, lat2))
+        result.append(out)
+    return result
+
+
+class DensifyTest(unittest.TestCase):
+
+    def setUp(self):
+        self.densifier = Densifier(Geodesic.WGS84, spacing=200000)
+
+    def assertPartsAlmostEqual(self, parts, expected):
+        self.assertEqual([len(part) for part in parts], [len(part) for part in expected])
+        for part, other in zip(parts, expected):
+            for (x, y), (ex, ey) in zip(part, other):
+                self.assertAlmostEqual(x, ex, delta=1e-9)
+                self.assertAlmostEqual(y, ey, delta=1e-9)
+
+    def test_densify_array(self):
+        xy, offsets = pack_parts([LINE, RING])
+        dense, dense_offsets = self.densifier.densify_array(xy, offsets, 1)
+        self.assertPartsAlmostEqual(unpack_parts(dense, dense_offsets), reference(self.densifier, [LINE, RING]))
+        self.assertEqual(self.densifier.budget.used, dense_offsets[-1])
+        self.assertEqual(self.densifier.adapted, [])
+
+    def test_buffers(self):
+        xy, offsets = pack_parts([LINE])
+        dense, _ = self.densifier.densify_array(xy, offsets)
+        self.assertEqual(self.densifier.densify_array(memoryview(xy), offsets)[0], dense)
+        self.assertEqual(self.densifier.densify_array(xy.tobytes(), None)[0], dense)
+
+    def test_densify(self):
+        self.assertPartsAlmostEqual(self.densifier.densify([LINE, RING]), reference(self.densifier, [LINE, RING]))
+
+    def test_stream(self):
+        xy, offsets = pack_parts([LINE, RING])
+        dense, _ = self.densifier.densify_array(xy, offsets)
+        chunks = list(self.densifier.stream(xy, offsets, None, 7))
+        self.assertTrue(all(len(chunk) <= 14 for _, chunk in chunks))
+        self.assertEqual([p for p, _ in chunks], sorted(p for p, _ in chunks))
+        joined = array('d')
+        for _, chunk in chunks:
+            joined.extend(chunk)
+        self.assertEqual(joined, dense)
+
+    def test_count(self):
+        densifier = Densifier(Geodesic.WGS84, 'count', count=4)
+        _, dense_offsets = densifier.densify_array(*pack_parts([LINE]))
+        self.assertEqual(list(dense_offsets), [0, 3 * 4 + 1])
+
+
+class BudgetTest(unittest.TestCase):
+
+    def densify(self, budget, fid):
+        densifier = Densifier(Geodesic.WGS84, spacing=1000, budget=budget)
+        _, offsets = densifier.densify_array(*pack_parts([LINE]), fid=fid)
+        return densifier, offsets[-1]
+
+    def test_feature_cap(self):
+        densifier, vertices = self.densify(VertexBudget(feature_vertices=100), 7)
+        self.assertLessEqual(vertices, 100)
+        self.assertEqual(densifier.adapted, [7])
+
+    def test_segment_cap(self):
+        densifier, vertices = self.densify(VertexBudget(segment_waypoints=10), 8)
+        self.assertEqual(vertices, len(LINE) + 3 * 10)
+        self.assertEqual(densifier.adapted, [8])
+
+    def test_total_cap(self):
+        densifier, vertices = self.densify(VertexBudget(total_vertices=50), 9)
+        self.assertLessEqual(vertices, 50)
+        self.assertEqual(densifier.budget.used, vertices)
+        # the original vertices are kept once the run total is used up
+        _, offsets = densifier.densify_array(*pack_parts([LINE]), fid=10)
+        self.assertEqual(offsets[-1], len(LINE))
+        self.assertEqual(densifier.adapted, [9, 10])
+
+
+class QuantizeTest(unittest.TestCase):
+
+    def test_decimals(self):
+        xy, offsets = pack_parts([[(0.04, 0.0), (0.01, 0.02), (1.26, 1.0)], [(5.0, 5.0), (5.02, 5.01)]])
+        snapped, snapped_offsets, dropped = quantize(xy, offsets, decimals=1)
+        # the second part snapped to one point keeps two vertices
+        self.assertEqual(list(snapped), [0.0, 0.0, 1.3, 1.0, 5.0, 5.0, 5.0, 5.0])
+        self.assertEqual(list(snapped_offsets), [0, 2, 4])
+        self.assertEqual(dropped, 1)
+
+    def test_step(self):
+        snapped, _, dropped = quantize(array('d', [1.0, 1.0, 9.0, 1.0, 11.0, 9.0]), step=10)
+        self.assertEqual(list(snapped), [0.0, 0.0, 10.0, 0.0, 10.0, 10.0])
+        self.assertEqual(dropped, 0)
+
+    def test_collapsed_ring(self):
+        ring = [(0.0, 0.0), (0.01, 0.0), (0.01, 0.01), (0.0, 0.0)]
+        xy, offsets = pack_parts([RING, ring])
+        snapped, snapped_offsets, dropped = quantize(xy, offsets, decimals=1, rings=True)
+        # the small ring would be left with two vertices, so it is kept as it was
+        self.assertEqual(list(snapped[2 * len(RING):]), list(xy[2 * len(RING):]))
+        self.assertEqual(list(snapped_offsets), list(offsets))
+        self.assertEqual(dropped, 0)
+
+    def test_points(self):
+        xy = array('d', [0.04, 0.0, 0.01, 0.02, 1.0, 1.0, 2.0, 2.0])
+        snapped, dropped = quantize_points(xy, decimals=1, previous=(-0.01, 0.0), following=(2.04, 2.0))
+        # the first two repeat the point before the run and the last the one after it
+        self.assertEqual(list(snapped), [1.0, 1.0])
+        self.assertEqual(dropped, 3)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,79 @@
+# -*- coding: utf-8 -*-
+"""
+ Tests of the GeodesicDensify SQL function on GeoPackage blobs and WKB,
+ on a plain sqlite3 connection.
+"""
+import sqlite3
+import unittest
+
+from geographiclib.geodesic import Geodesic
+
+from .. import gpkg
+from ..engine import Densifier, VertexBudget, pack_parts
+from ..wkb import LINESTRING, POLYGON, read_wkb, write_wkb
+
+# a square with a hole
+SQUARE = [(0.0, 0.0), (10.0, 0.0), (10.0, 10.0), (0.0, 10.0), (0.0, 0.0)]
+HOLE = [(2.0, 2.0), (2.0, 3.0), (3.0, 3.0), (2.0, 2.0)]
+
+
+class GeoPackageTest(unittest.TestCase):
+
+    def setUp(self):
+        self.connection = sqlite3.connect(':memory:')
+        gpkg.register(self.connection, 'bundled')
+        self.densifier = Densifier(Geodesic.WGS84, spacing=100000)
+
+    def tearDown(self):
+        self.connection.close()
+
+    def blob(self, geometry_type, parts, polygons=None):
+        xy, offsets = pack_parts(parts)
+        return gpkg.write_gpkg(4326, write_wkb(geometry_type, xy, offsets, polygons), xy)
+
+    def densify(self, blob, *args):
+        return self.connection.execute("SELECT GeodesicDensify(?, 100000{})".format(", ?" * len(args)),
+                                       (blob,) + args).fetchone()[0]
+
+    def test_polygon(self):
+        blob = self.densify(self.blob(POLYGON, [SQUARE, HOLE], [0, 2]))
+        srs_id, envelope, empty, data = gpkg.read_gpkg(blob)
+        self.assertEqual((srs_id, empty), (4326, False))
+        geometry_type, xy, offsets, polygons = read_wkb(data)
+        dense, dense_offsets = self.densifier.densify_array(*pack_parts([SQUARE, HOLE]))
+        self.assertEqual(geometry_type, POLYGON)
+        self.assertEqual(list(polygons), [0, 2])
+        self.assertEqual(list(offsets), list(dense_offsets))
+        for value, expected in zip(xy, dense):
+            self.assertAlmostEqual(value, expected, delta=1e-12)
+        self.assertEqual(envelope, (min(xy[0::2]), max(xy[0::2]), min(xy[1::2]), max(xy[1::2])))
+        self.assertEqual(self.connection.execute("SELECT ST_MinX(?), ST_MaxY(?), ST_IsEmpty(?)",
+                                                 (blob, blob, blob)).fetchone(), (envelope[0], envelope[3], 0))
+
+    def test_ellipsoid(self):
+        blob = self.blob(LINESTRING, [SQUARE])
+        self.assertEqual(self.densify(blob, 6378137, 298.257223563), self.densify(blob))
+        self.assertNotEqual(self.densify(blob, 6371000, 0), self.densify(blob))
+
+    def test_wkb_and_null(self):
+        xy, offsets = pack_parts([SQUARE])
+        data = self.densify(write_wkb(LINESTRING, xy, offsets))
+        self.assertEqual(read_wkb(data)[2][-1], self.densifier.densify_array(xy, offsets)[1][-1])
+        self.assertIsNone(self.densify(None))
+        with self.assertRaises(sqlite3.Error):
+            self.densify(b'\x01\x02')
+
+    def test_adapted_cleared(self):
+        connection = sqlite3.connect(':memory:')
+        function = gpkg.register(connection, 'bundled', VertexBudget(segment_waypoints=2))
+        blob = self.blob(LINESTRING, [SQUARE])
+        for _ in range(3):
+            connection.execute("SELECT GeodesicDensify(?, 1000)", (blob,)).fetchone()
+        connection.close()
+        # capped on every row, but nothing is kept from one row to the next
+        densifier = function.densifier(1000.0, gpkg.WGS84_A, gpkg.WGS84_F)
+        self.assertEqual(densifier.adapted, [])
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,87 @@
+# -*- coding: utf-8 -*-
+"""
+ Tests of the output sinks, skipped when QGIS can't be imported: a
+ buffered GeoPackage holds its features until each commit, and a resumed
+ run appends to it.
+"""
+import os
+import tempfile
+import unittest
+
+try:
+    from PyQt5.QtCore import QVariant
+    from qgis.core import (QgsCoordinateReferenceSystem,
+                           QgsFeature,
+                           QgsField,
+                           QgsFields,
+                           QgsGeometry,
+                           QgsPointXY,
+                           QgsVectorLayer,
+                           QgsWkbTypes)
+    from qgis.testing import start_app
+    from ..output import OutputSink
+except ImportError:
+    start_app = None
+
+
+@unittest.skipIf(start_app is None, "QGIS can't be imported")
+class OutputSinkTest(unittest.TestCase):
+
+    @classmethod
+    def setUpClass(cls):
+        start_app()
+
+    def setUp(self):
+        self.directory = tempfile.TemporaryDirectory()
+        self.path = os.path.join(self.directory.name, 'out.gpkg')
+        self.fields = QgsFields()
+        self.fields.append(QgsField("id", QVariant.Int))
+
+    def tearDown(self):
+        self.directory.cleanup()
+
+    def sink(self, append=False):
+        return OutputSink(QgsWkbTypes.LineString, QgsCoordinateReferenceSystem("EPSG:4326"), "out", self.fields,
+                          self.path, spatial_index=False, buffered=True, append=append)
+
+    def features(self, first, count):
+        features = []
+        for i in range(first, first + count):
+            feature = QgsFeature(self.fields)
+            feature.setGeometry(QgsGeometry.fromPolylineXY([QgsPointXY(i, 0), QgsPointXY(i, 1)]))
+            feature.setAttributes([i])
+            features.append(feature)
+        return features
+
+    def written(self):
+        """ the ids in the GeoPackage, read through a layer of its own """
+        layer = QgsVectorLayer(self.path, "check", "ogr")
+        return sorted(feature["id"] for feature in layer.getFeatures())
+
+    def test_commit(self):
+        sink = self.sink()
+        sink.addFeatures(self.features(0, 3))
+        self.assertEqual((sink.rows, self.written()), (0, []))
+        sink.commit()
+        self.assertEqual((sink.rows, self.written()), (3, [0, 1, 2]))
+        sink.addFeatures(self.features(3, 2))
+        self.assertEqual(self.written(), [0, 1, 2])
+        layer = sink.finish()
+        self.assertEqual(layer.featureCount(), 5)
+
+    def test_resume(self):
+        sink = self.sink()
+        sink.addFeatures(self.features(0, 3))
+        sink.commit()
+        # a crash: the features after the last commit are lost
+        sink.addFeatures(self.features(3, 2))
+        del sink
+        resumed = self.sink(append=True)
+        self.assertEqual(resumed.rows, 3)
+        resumed.addFeatures(self.features(3, 2))
+        resumed.finish()
+        self.assertEqual(self.written(), [0, 1, 2, 3, 4])
+
+
+if __name__ == '__main__':
+    unittest.main()
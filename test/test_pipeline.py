@@ -0,0 +1,108 @@
+# -*- coding: utf-8 -*-
+"""
+ Tests of the pipeline: results written in read order, back-pressure on
+ a slow stage, and failures of any stage raised from run.
+"""
+import random
+import threading
+import time
+import unittest
+
+from ..pipeline import Pipeline
+
+
+class Failure(Exception):
+    pass
+
+
+def fail_at(count, function=lambda item: item):
+    """ a stage function raising Failure on its count-th call """
+    calls = []
+
+    def stage(item=None):
+        calls.append(item)
+        if len(calls) == count:
+            raise Failure(count)
+        return function(item)
+    return stage
+
+
+class PipelineTest(unittest.TestCase):
+
+    def run_pipeline(self, pipeline, poll=None):
+        threads = threading.active_count()
+        try:
+            pipeline.run(poll, interval=0.01)
+        finally:
+            # every stage thread has stopped, on failure too
+            self.assertEqual(threading.active_count(), threads)
+
+    def test_order(self):
+        written = []
+
+        def densify(item):
+            time.sleep(random.random() * 0.002)
+            # odd items are dropped
+            return item if item % 2 == 0 else None
+
+        pipeline = Pipeline(lambda: range(300), densify, written.append, workers=4, queue_size=8)
+        self.run_pipeline(pipeline)
+        self.assertEqual(written, list(range(0, 300, 2)))
+        self.assertEqual([stage.items for stage in pipeline.stages], [300, 300, 150])
+
+    def test_back_pressure(self):
+        queue_size, workers = 4, 3
+        counts = {'read': 0, 'written': 0, 'ahead': 0}
+
+        def read():
+            for item in range(200):
+                counts['read'] += 1
+                yield item
+
+        def write(result):
+            counts['ahead'] = max(counts['ahead'], counts['read'] - counts['written'])
+            counts['written'] += 1
+            time.sleep(0.001)
+
+        pipeline = Pipeline(read, lambda item: item, write, workers, queue_size)
+        self.run_pipeline(pipeline)
+        self.assertEqual(counts['written'], 200)
+        # the items between reading and writing, and the one read next
+        self.assertLessEqual(counts['ahead'], 2 * queue_size + workers + 1)
+        for metrics in pipeline.queues:
+            self.assertLessEqual(metrics.maximum, queue_size)
+
+    def test_read_fails(self):
+        def read():
+            for item in range(100):
+                if item == 50:
+                    raise Failure(item)
+                yield item
+
+        written = []
+        with self.assertRaises(Failure):
+            self.run_pipeline(Pipeline(read, lambda item: item, written.append, workers=2, queue_size=4))
+        self.assertEqual(written, list(range(len(written))))
+        self.assertLessEqual(len(written), 50)
+
+    def test_densify_fails(self):
+        with self.assertRaises(Failure):
+            self.run_pipeline(Pipeline(lambda: range(1000), fail_at(10), lambda result: None,
+                                       workers=3, queue_size=4))
+
+    def test_write_fails(self):
+        with self.assertRaises(Failure):
+            self.run_pipeline(Pipeline(lambda: range(1000), lambda item: item, fail_at(10),
+                                       workers=2, queue_size=4))
+
+    def test_poll_fails(self):
+        def write(result):
+            time.sleep(0.001)
+
+        with self.assertRaises(Failure):
+            self.run_pipeline(Pipeline(lambda: range(1000), lambda item: item, write, queue_size=4),
+                              poll=fail_at(2))
+
+
+if __name__ == '__main__':
+    unittest.main()
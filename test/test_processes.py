@@ -0,0 +1,117 @@
+# -*- coding: utf-8 -*-
+"""
+ Tests of densifying on worker processes: batches in shared memory, and
+ output, budget and adaptations matching the threaded run.
+"""
+import unittest
+
+from geographiclib.geodesic import Geodesic
+
+from ..engine import Densifier, VertexBudget, pack_parts
+from ..processes import SharedBatch, densify_processes
+from ..tuning import processes_supported
+
+# a line across the antimeridian, and a ring with a second part
+LINE = [(170.0, -10.0), (-175.0, 5.0), (-160.0, 40.0), (-150.0, 40.5)]
+RING = [(0.0, 0.0), (20.0, 0.0), (20.0, 20.0), (0.0, 20.0), (0.0, 0.0)]
+
+
+def features(count):
+    """ (fid, xy, offsets) of count features of various sizes """
+    result = []
+    for i in range(count):
+        parts = [[(lon + i, lat) for lon, lat in LINE]]
+        if i % 3 == 0:
+            parts.append([(lon - 60, lat + i) for lon, lat in RING])
+        if i % 5 == 0:
+            # a long run of vertices, to be split
+            parts.append([(-100.0 + 0.5 * k, -30.0 + 0.1 * k) for k in range(80)])
+        xy, offsets = pack_parts(parts)
+        result.append((i, xy, offsets))
+    return result
+
+
+class SharedBatchTest(unittest.TestCase):
+
+    def test_round_trip(self):
+        items = [(xy, offsets) for _, xy, offsets in features(4)]
+        batch = SharedBatch.pack(items)
+        try:
+            self.assertEqual(batch.vertices, sum(offsets[-1] for _, offsets in items))
+            self.assertEqual(batch.features, 4)
+            attached = SharedBatch(batch.vertices, batch.parts, batch.features, batch.names())
+            try:
+                for i, (xy, offsets) in enumerate(items):
+                    copied_xy, copied_offsets = attached.copy_feature(i)
+                    self.assertEqual(list(copied_xy), list(xy))
+                    self.assertEqual(list(copied_offsets), list(offsets))
+                    view_xy, view_offsets = attached.feature(i)
+                    start, end = view_offsets[0], view_offsets[-1]
+                    self.assertEqual(list(view_xy[2 * start:2 * end]), list(xy))
+                    self.assertEqual([offset - start for offset in view_offsets], list(offsets))
+                    view_xy = view_offsets = None
+            finally:
+                attached.close()
+        finally:
+            batch.close(unlink=True)
+
+
+@unittest.skipUnless(processes_supported(), "worker processes can't be started")
+class ProcessesTest(unittest.TestCase):
+
+    spacing = 100000
+    budget = {}
+
+    def setUp(self):
+        densifier = self.make_densifier()
+        self.threaded = list(densifier.densify_all(features(11), workers=1))
+        self.used = densifier.budget.used
+        self.adapted = densifier.adapted
+
+    def make_densifier(self):
+        return Densifier(Geodesic.WGS84, spacing=self.spacing, budget=VertexBudget(**self.budget))
+
+    def assertThreaded(self, densifier, results):
+        self.assertEqual(len(results), len(self.threaded))
+        for (fid, xy, offsets), (threaded_fid, threaded_xy, threaded_offsets) in zip(results, self.threaded):
+            self.assertEqual(fid, threaded_fid)
+            self.assertEqual(list(offsets), list(threaded_offsets))
+            self.assertEqual(list(xy), list(threaded_xy))
+        self.assertEqual(densifier.budget.used, self.used)
+        self.assertEqual(sorted(densifier.adapted), sorted(self.adapted))
+
+    def test_densify_all(self):
+        densifier = self.make_densifier()
+        results = list(densifier.densify_all(features(11), workers=2, processes=True, batch_vertices=50))
+        self.assertThreaded(densifier, results)
+
+    def test_split_batches(self):
+        # batches of a fraction of a feature, so the long ones are split
+        densifier = self.make_densifier()
+        results = list(densify_processes(densifier, features(11), 2, batch_vertices=20, batch_seconds=1e-4))
+        self.assertThreaded(densifier, results)
+
+
+class CappedProcessesTest(ProcessesTest):
+
+    spacing = 5000
+    budget = {'feature_vertices': 2000, 'segment_waypoints': 600}
+
+    def test_capped(self):
+        self.assertTrue(self.adapted)
+
+
+@unittest.skipUnless(processes_supported(), "worker processes can't be started")
+class TotalCapTest(unittest.TestCase):
+
+    def test_within_total(self):
+        densifier = Densifier(Geodesic.WGS84, spacing=5000, budget=VertexBudget(total_vertices=6000))
+        results = list(densify_processes(densifier, features(11), 2, batch_vertices=20, batch_seconds=1e-4))
+        self.assertEqual([fid for fid, _, _ in results], list(range(11)))
+        # original vertices are kept past the total
+        self.assertLessEqual(densifier.budget.used, 6000 + sum(offsets[-1] for _, _, offsets in features(11)))
+        self.assertEqual(densifier.budget.used, sum(offsets[-1] for _, _, offsets in results))
+
+
+if __name__ == '__main__':
+    unittest.main()
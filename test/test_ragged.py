@@ -0,0 +1,66 @@
+# -*- coding: utf-8 -*-
+"""
+ Tests of the columnar ragged output: what RaggedWriter writes,
+ RaggedArrays maps back to the same WKB.
+"""
+import os
+import tempfile
+import unittest
+
+from geographiclib.geodesic import Geodesic
+
+from ..engine import Densifier, pack_parts
+from ..ragged import RaggedArrays, RaggedWriter
+from ..wkb import LINESTRING, MULTILINESTRING, MULTIPOLYGON, POLYGON, write_wkb
+
+# a square with a hole, and a second polygon
+SQUARE = [(0.0, 0.0), (10.0, 0.0), (10.0, 10.0), (0.0, 10.0), (0.0, 0.0)]
+HOLE = [(2.0, 2.0), (2.0, 3.0), (3.0, 3.0), (2.0, 2.0)]
+TRIANGLE = [(20.0, 0.0), (30.0, 0.0), (25.0, 5.0), (20.0, 0.0)]
+
+
+class RaggedTest(unittest.TestCase):
+
+    def setUp(self):
+        self.directory = tempfile.TemporaryDirectory()
+        self.path = os.path.join(self.directory.name, 'out.ragged')
+
+    def tearDown(self):
+        self.directory.cleanup()
+
+    def test_polygons(self):
+        polygon = pack_parts([SQUARE, HOLE]) + ([0, 2],)
+        multipolygon = pack_parts([SQUARE, HOLE, TRIANGLE]) + ([0, 2, 3],)
+        with RaggedWriter(self.path) as writer:
+            writer.extend([(1,) + polygon], POLYGON)
+            writer.add(2, multipolygon[0], multipolygon[1], POLYGON, multipolygon[2])
+            with self.assertRaises(ValueError):
+                writer.extend([(3,) + polygon[:2]], POLYGON)
+        with RaggedArrays(self.path) as dataset:
+            self.assertEqual(len(dataset), 2)
+            self.assertEqual(list(dataset.fids), [1, 2])
+            self.assertEqual(list(dataset.types), [POLYGON, MULTIPOLYGON])
+            self.assertEqual((dataset.vertices, dataset.rings, dataset.parts), (5 + 4 + 5 + 4 + 4, 5, 3))
+            self.assertEqual(dataset.wkb(0), write_wkb(POLYGON, *polygon))
+            self.assertEqual(dataset.wkb(1), write_wkb(MULTIPOLYGON, *multipolygon))
+
+    def test_lines(self):
+        densifier = Densifier(Geodesic.WGS84, spacing=500000)
+        features = [(fid,) + pack_parts(parts) for fid, parts in enumerate([[SQUARE], [SQUARE, TRIANGLE]])]
+        with RaggedWriter(self.path) as writer:
+            writer.extend(densifier.densify_all(features, 1))
+        with RaggedArrays(self.path) as dataset:
+            self.assertEqual(list(dataset.types), [LINESTRING, MULTILINESTRING])
+            for i, (fid, xy, offsets) in enumerate(features):
+                dense, dense_offsets = densifier.densify_array(xy, offsets)
+                self.assertEqual(dataset.wkb(i), write_wkb(dataset.types[i], dense, dense_offsets))
+
+    def test_incomplete(self):
+        writer = RaggedWriter(self.path)
+        with self.assertRaises(ValueError):
+            RaggedArrays(self.path)
+        writer.close()
+
+
+if __name__ == '__main__':
+    unittest.main()
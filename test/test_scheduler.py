@@ -0,0 +1,101 @@
+# -*- coding: utf-8 -*-
+"""
+ Tests of the scheduler: features cut into pieces, densified apart and
+ joined again come out as if densified whole, budget and adaptations
+ included.
+"""
+import unittest
+
+from geographiclib.geodesic import Geodesic
+
+from ..engine import Densifier, VertexBudget, pack_parts
+from ..scheduler import Joiner, Scheduler, cut_feature, densify_piece, join_pieces, split_stream
+
+# a line across the antimeridian, and a ring with a second part
+LINE = [(170.0, -10.0), (-175.0, 5.0), (-160.0, 40.0), (-150.0, 40.5)]
+RING = [(0.0, 0.0), (20.0, 0.0), (20.0, 20.0), (0.0, 20.0), (0.0, 0.0)]
+
+
+def features(count):
+    """ (fid, xy, offsets) of count features of various sizes """
+    result = []
+    for i in range(count):
+        parts = [[(lon + i, lat) for lon, lat in LINE]]
+        if i % 3 == 0:
+            parts.append([(lon - 60, lat + i) for lon, lat in RING])
+        if i % 5 == 0:
+            # a long run of vertices, to be split
+            parts.append([(-100.0 + 0.5 * k, -30.0 + 0.1 * k) for k in range(80)])
+        xy, offsets = pack_parts(parts)
+        result.append((i, xy, offsets))
+    return result
+
+
+class SplitTest(unittest.TestCase):
+
+    spacing = 100000
+    budget = {}
+
+    def setUp(self):
+        densifier = self.make_densifier()
+        self.whole = [(fid,) + densifier.densify_array(xy, offsets, fid) for fid, xy, offsets in features(11)]
+        self.used = densifier.budget.used
+        self.adapted = densifier.adapted
+        self.densifier = self.make_densifier()
+
+    def make_densifier(self):
+        return Densifier(Geodesic.WGS84, spacing=self.spacing, budget=VertexBudget(**self.budget))
+
+    def assertWhole(self, results):
+        self.assertEqual(len(results), len(self.whole))
+        for (fid, xy, offsets), (whole_fid, whole_xy, whole_offsets) in zip(results, self.whole):
+            self.assertEqual(fid, whole_fid)
+            self.assertEqual(list(offsets), list(whole_offsets))
+            self.assertEqual(list(xy), list(whole_xy))
+        self.assertEqual(self.densifier.budget.used, self.used)
+        self.assertEqual(sorted(self.densifier.adapted), self.adapted)
+
+    def test_split_stitch(self):
+        densifier = self.densifier
+        results = []
+        for fid, xy, offsets in features(11):
+            costs = densifier.segment_costs(xy, offsets)
+            pieces = cut_feature(densifier, fid, xy, offsets, costs, sum(costs) / 5)
+            self.assertGreater(len(pieces), 1)
+            for piece in pieces:
+                piece.result = densify_piece(densifier, xy, piece)
+            results.append((fid,) + join_pieces(densifier, pieces))
+        self.assertWhole(results)
+
+    def test_split_stream(self):
+        densifier = self.densifier
+        joiner = Joiner(densifier)
+        results = []
+        count = 0
+        for xy, piece in split_stream(densifier, features(11), 0.002):
+            count += 1
+            joined = joiner.add(piece, *densify_piece(densifier, xy, piece))
+            if joined is not None:
+                results.append((piece.feature,) + joined)
+        self.assertGreater(count, 11)
+        self.assertWhole(results)
+
+    def test_scheduler(self):
+        scheduler = Scheduler(self.densifier, 3, window=6)
+        results = list(scheduler.run(features(11)))
+        self.assertGreater(scheduler.split, 0)
+        self.assertWhole(results)
+
+
+class CappedSplitTest(SplitTest):
+    """ the same with features cut short by the feature and segment caps, each recorded once """
+
+    spacing = 5000
+    budget = {'feature_vertices': 2000, 'segment_waypoints': 600}
+
+    def test_adapted(self):
+        self.assertEqual(self.adapted, list(range(11)))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,72 @@
+# -*- coding: utf-8 -*-
+"""
+ Tests of the memory budget: buffers past it spill to temporary files
+ and read back the same.
+"""
+from array import array
+import os
+import tempfile
+import unittest
+
+from geographiclib.geodesic import Geodesic
+
+from .. import spill
+from ..engine import Densifier, pack_parts
+
+# a line across the antimeridian, and a ring
+LINE = [(170.0, -10.0), (-175.0, 5.0), (-160.0, 40.0), (-150.0, 40.5)]
+RING = [(0.0, 0.0), (20.0, 0.0), (20.0, 20.0), (0.0, 20.0), (0.0, 0.0)]
+
+
+class SpillTest(unittest.TestCase):
+
+    def setUp(self):
+        # spill buffers of any size
+        self.min_spill = spill.MIN_SPILL_BYTES
+        spill.MIN_SPILL_BYTES = 0
+        self.directory = tempfile.TemporaryDirectory()
+
+    def tearDown(self):
+        spill.MIN_SPILL_BYTES = self.min_spill
+        self.directory.cleanup()
+
+    def test_spill(self):
+        budget = spill.MemoryBudget(800, self.directory.name)
+        buffer = spill.SpillBuffer('d', budget)
+        values = array('d', range(300))
+        for start in range(0, 300, 50):
+            buffer.extend(values[start:start + 50])
+        self.assertEqual(len(buffer), 300)
+        result = buffer.result()
+        self.assertIsInstance(result, memoryview)
+        self.assertEqual(result.tolist(), values.tolist())
+        self.assertEqual(budget.files, 1)
+        self.assertEqual(budget.spilled, 300 * 8)
+        self.assertEqual(budget.used, 0)
+        # the temporary file is already deleted
+        self.assertEqual(os.listdir(self.directory.name), [])
+
+    def test_in_memory(self):
+        budget = spill.MemoryBudget(8000, self.directory.name)
+        buffer = spill.SpillBuffer('d', budget)
+        buffer.extend(array('d', range(100)))
+        result = buffer.result()
+        self.assertIsInstance(result, array)
+        self.assertEqual(budget.used, 800)
+        del result
+        self.assertEqual(budget.used, 0)
+
+    def test_densify(self):
+        xy, offsets = pack_parts([LINE, RING])
+        densifier = Densifier(Geodesic.WGS84, spacing=10000)
+        dense, dense_offsets = densifier.densify_array(xy, offsets)
+        densifier.memory_budget = spill.MemoryBudget(1024, self.directory.name)
+        spilled, spilled_offsets = densifier.densify_array(xy, offsets)
+        self.assertIsInstance(spilled, memoryview)
+        self.assertGreater(densifier.memory_budget.files, 0)
+        self.assertEqual(list(spilled_offsets), list(dense_offsets))
+        self.assertEqual(spilled.tolist(), dense.tolist())
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,72 @@
+# -*- coding: utf-8 -*-
+"""
+ Tests of the tuning of a run: its settings text, the key it is kept
+ under, and the autotuning.
+"""
+import unittest
+
+from geographiclib.geodesic import Geodesic
+
+from ..engine import Densifier, Estimate, pack_parts
+from ..tuning import Tuning, autotune, profile_key
+
+# a line across the antimeridian
+LINE = [(170.0, -10.0), (-175.0, 5.0), (-160.0, 40.0), (-150.0, 40.5)]
+
+
+def features(count):
+    """ (fid, xy, offsets) of count copies of the line, shifted """
+    return [(i,) + pack_parts([[(lon + i, lat) for lon, lat in LINE]]) for i in range(count)]
+
+
+class TuningTest(unittest.TestCase):
+
+    def test_round_trip(self):
+        tuning = Tuning('numpy', 8192, 4, True, 2048)
+        text = tuning.dumps()
+        self.assertEqual(text, "backend=numpy;chunk_size=8192;workers=4;processes=1;batch_vertices=2048")
+        loaded = Tuning.loads(text)
+        self.assertEqual([getattr(loaded, key) for key in Tuning.KEYS], ['numpy', 8192, 4, True, 2048])
+        self.assertEqual(loaded.summary(), "numpy backend, chunks of 8,192 vertices, "
+                                           "4 processes in batches of 2,048 vertices")
+
+    def test_not_a_tuning(self):
+        for text in ("", "backend=numpy", Tuning().dumps() + ";colour=red", Tuning().dumps().replace("=", ":")):
+            with self.assertRaises(ValueError):
+                Tuning.loads(text)
+
+    def test_profile_key(self):
+        estimate = Estimate()
+        self.assertEqual(profile_key(estimate), "v0-s0")
+        estimate.vertices, estimate.segments = 2500000, 1000
+        self.assertEqual(profile_key(estimate), "v6-s3")
+        estimate.segments = 2500000
+        self.assertEqual(profile_key(estimate), "v6-s0")
+
+
+class AutotuneTest(unittest.TestCase):
+
+    def setUp(self):
+        self.densifier = Densifier(Geodesic.WGS84, spacing=20000)
+
+    def labels(self, tuning):
+        return [label for label, _ in tuning.trials]
+
+    def test_threads(self):
+        # threads are timed whether the GIL is enabled or not
+        tuning = autotune(self.densifier, features(50), run_seconds=100.0, backends=['bundled'], max_workers=2,
+                          seconds=0.01)
+        self.assertIn("2 threads", self.labels(tuning))
+        self.assertIn(tuning.workers, (1, 2))
+        self.assertFalse(tuning.processes)
+
+    def test_small_run(self):
+        tuning = autotune(self.densifier, features(50), run_seconds=0.01, backends=['bundled'], max_workers=2,
+                          seconds=0.01)
+        self.assertEqual(self.labels(tuning), ["bundled backend", "chunks of 1,024", "chunks of 8,192"])
+        self.assertEqual(tuning.workers, 1)
+        self.assertGreater(tuning.sample_features, 0)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,88 @@
+# -*- coding: utf-8 -*-
+"""
+ Tests of the WKB reader and writer, which take QGIS geometries into the
+ flat arrays of the engine and back.
+"""
+from array import array
+import struct
+import unittest
+
+from .. import wkb
+from ..engine import pack_parts
+
+# a square with a hole, and a second polygon
+SQUARE = [(0.0, 0.0), (10.0, 0.0), (10.0, 10.0), (0.0, 10.0), (0.0, 0.0)]
+HOLE = [(2.0, 2.0), (2.0, 3.0), (3.0, 3.0), (2.0, 2.0)]
+TRIANGLE = [(20.0, 0.0), (30.0, 0.0), (25.0, 5.0), (20.0, 0.0)]
+
+
+class ReadTest(unittest.TestCase):
+
+    def test_polygon(self):
+        # a square with a triangular hole, little endian
+        data = struct.pack('<BIII10dI8d', 1, 3, 2,
+                           5, 0, 0, 10, 0, 10, 10, 0, 10, 0, 0,
+                           4, 2, 2, 2, 3, 3, 3, 2, 2)
+        geometry_type, xy, offsets, polygons = wkb.read_wkb(data)
+        self.assertEqual(geometry_type, wkb.POLYGON)
+        self.assertEqual(list(offsets), [0, 5, 9])
+        self.assertEqual(list(polygons), [0, 2])
+        self.assertEqual(list(xy[10:]), [2, 2, 2, 3, 3, 3, 2, 2])
+
+    def test_big_endian(self):
+        data = struct.pack('>BII4d', 0, 2, 2, 1, 2, 3, 4)
+        geometry_type, xy, offsets, polygons = wkb.read_wkb(data)
+        self.assertEqual((geometry_type, list(xy), list(offsets), polygons),
+                         (wkb.LINESTRING, [1, 2, 3, 4], [0, 2], None))
+
+    def test_z_dropped(self):
+        data = struct.pack('<BII6d', 1, 1002, 2, 1, 2, 9, 3, 4, 9)
+        geometry_type, xy, offsets, _ = wkb.read_wkb(data)
+        self.assertEqual(geometry_type, wkb.LINESTRING)
+        self.assertEqual(list(xy), [1, 2, 3, 4])
+
+    def test_invalid(self):
+        for data in (b'', b'\x01\x02\x00\x00\x00\x05\x00\x00\x00', struct.pack('<BI', 1, 7)):
+            with self.assertRaises(ValueError):
+                wkb.read_wkb(data)
+
+
+class RoundTripTest(unittest.TestCase):
+
+    def round_trip(self, geometry_type, parts, polygons=None):
+        xy, offsets = pack_parts(parts)
+        data = wkb.write_wkb(geometry_type, xy, offsets, polygons)
+        read_type, read_xy, read_offsets, read_polygons = wkb.read_wkb(data)
+        self.assertEqual(read_type, geometry_type)
+        self.assertEqual(read_xy, xy)
+        self.assertEqual(list(read_offsets), list(offsets))
+        self.assertEqual(list(read_polygons) if read_polygons is not None else None, polygons)
+        # and back to the same bytes
+        self.assertEqual(wkb.write_wkb(read_type, read_xy, read_offsets, read_polygons), data)
+
+    def test_point(self):
+        self.round_trip(wkb.POINT, [[(1.5, -2.5)]])
+
+    def test_linestring(self):
+        self.round_trip(wkb.LINESTRING, [SQUARE])
+
+    def test_polygon(self):
+        self.round_trip(wkb.POLYGON, [SQUARE, HOLE], [0, 2])
+
+    def test_multipoint(self):
+        self.round_trip(wkb.MULTIPOINT, [[(1.0, 2.0)], [(3.0, 4.0)]])
+
+    def test_multilinestring(self):
+        self.round_trip(wkb.MULTILINESTRING, [SQUARE, HOLE])
+
+    def test_multipolygon(self):
+        self.round_trip(wkb.MULTIPOLYGON, [SQUARE, HOLE, TRIANGLE], [0, 2, 3])
+
+    def test_linestring_bytes(self):
+        data = wkb.write_wkb(wkb.LINESTRING, array('d', [1, 2, 3, 4]), [0, 2])
+        self.assertIn(data, (struct.pack('<BII4d', 1, 2, 2, 1, 2, 3, 4),
+                             struct.pack('>BII4d', 0, 2, 2, 1, 2, 3, 4)))
+
+
+if __name__ == '__main__':
+    unittest.main()
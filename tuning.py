@@ -0,0 +1,333 @@
+# -*- coding: utf-8 -*-
+"""
+/***************************************************************************
+ GeodesicDensifier
+                                 A QGIS plugin
+ Adds vertices to geometry along geodesic lines
+                              -------------------
+        copyright            : (C) 2018 by Jonah Sullivan
+        email                : jonah.sullivan@ga.gov.au
+ ***************************************************************************/
+
+/***************************************************************************
+ *                                                                         *
+ *   This program is free software; you can redistribute it and/or modify  *
+ *   it under the terms of the Apache 2.0 License.                         *
+ *                                                                         *
+ ***************************************************************************/
+
+ Runtime autotuning.  A short calibration on a sample of the input picks
+ the geodesic backend, the chunk size, the number of workers and, for
+ scripts, whether they are threads or processes.  The plugin keeps the
+ choices in its settings.
+"""
+import math
+import multiprocessing
+import os
+import platform
+import re
+import sys
+import time
+
+from .backends import available_backends, make_backend
+from .engine import Densifier, VertexBudget, as_doubles
+from .pipeline import Pipeline
+from .scheduler import Joiner, densify_piece, split_feature, split_stream
+
+# predicted seconds of the calibration sample, with the cost model of
+# Densifier.estimate
+SAMPLE_SECONDS = 0.2
+# chunk sizes tried for the fastest backend, besides Densifier.chunk_size
+CHUNK_SIZES = (1024, 8192)
+# parallel modes are only tried for runs predicted to take longer than this
+# on one thread, below it starting the workers costs more than they save
+PARALLEL_SECONDS = 2.0
+# seconds of work in each process batch
+BATCH_SECONDS = 0.1
+# a candidate must be this much faster to replace the current choice, so
+# timing noise doesn't flip the choice between runs
+MARGIN = 0.95
+
+
+class Tuning:
+    """Configuration of a densification run.
+
+    :param backend: Name of the geodesic backend.
+    :type backend: str
+
+    :param chunk_size: Vertices per positions() call, see
+        :attr:`Densifier.chunk_size`.
+    :type chunk_size: int
+
+    :param workers: Number of threads, or of processes when *processes*.
+    :type workers: int
+
+    :param processes: True to densify on a pool of processes.
+    :type processes: bool
+
+    :param batch_vertices: Input vertices per batch sent to a process.
+    :type batch_vertices: int
+    """
+
+    KEYS = ('backend', 'chunk_size', 'workers', 'processes', 'batch_vertices')
+
+    def __init__(self, backend='auto', chunk_size=65536, workers=1, processes=False, batch_vertices=65536):
+        self.backend = backend
+        self.chunk_size = int(chunk_size)
+        self.workers = int(workers)
+        self.processes = bool(processes)
+        self.batch_vertices = int(batch_vertices)
+        # how the choice was made, for the run report
+        self.sample_features = 0
+        self.calibration_seconds = 0.0
+        self.trials = []
+
+    def dumps(self):
+        """ the configuration as text, for the settings """
+        return ";".join("{}={}".format(key, int(value) if isinstance(value, bool) else value)
+                        for key, value in ((key, getattr(self, key)) for key in self.KEYS))
+
+    @classmethod
+    def loads(cls, text):
+        """Read a configuration written by :meth:`dumps`.
+
+        :raises ValueError: If the text is not a configuration.
+        """
+        values = {}
+        for item in text.split(";"):
+            key, sep, value = item.partition("=")
+            if not sep or key not in cls.KEYS:
+                raise ValueError("not a tuning: {!r}".format(text))
+            values[key] = value
+        if set(values) != set(cls.KEYS):
+            raise ValueError("not a tuning: {!r}".format(text))
+        return cls(values['backend'], int(values['chunk_size']), int(values['workers']),
+                   values['processes'] == '1', int(values['batch_vertices']))
+
+    def apply(self, densifier):
+        """ switch a densifier to the backend and chunk size of the tuning """
+        if densifier.backend.name != self.backend:
+            densifier.backend = make_backend(self.backend, densifier.backend.a, densifier.backend.f)
+        densifier.chunk_size = self.chunk_size
+
+    def summary(self):
+        """ one line description of the configuration """
+        if self.processes:
+            workers = "{} processes in batches of {:,} vertices".format(self.workers, self.batch_vertices)
+        else:
+            workers = "{} thread{}".format(self.workers, "s" if self.workers > 1 else "")
+        return "{} backend, chunks of {:,} vertices, {}".format(self.backend, self.chunk_size, workers)
+
+    def report(self):
+        """ the configuration and the calibration trials as text """
+        if not self.trials:
+            return "tuning: " + self.summary()
+        lines = ["tuning: {} (calibrated on {:,} features in {:.2f} s)".format(
+            self.summary(), self.sample_features, self.calibration_seconds)]
+        lines += ["  {}: {:.3f} s".format(label, seconds) for label, seconds in self.trials]
+        return "\n".join(lines)
+
+
+def machine_key():
+    """ name of the machine, CPU count, Python build and backends the tuning applies to """
+    gil_enabled = getattr(sys, '_is_gil_enabled', lambda: True)()
+    text = "{}-{}-{}cpu-py{}.{}{}-{}".format(
+        platform.node(), platform.machine(), os.cpu_count() or 1, sys.version_info[0], sys.version_info[1],
+        "" if gil_enabled else "t", ".".join(available_backends()))
+    return re.sub(r'[^A-Za-z0-9_.-]+', '_', text)
+
+
+def profile_key(estimate):
+    """Coarse description of a run, since the best configuration depends on
+    the data as well as on the machine.
+
+    :param estimate: Estimate of the whole run.
+    :type estimate: engine.Estimate
+
+    :returns: The orders of magnitude of the output vertices and of the
+        vertices per segment, e.g. 'v6-s3'.
+    :rtype: str
+    """
+    per_segment = estimate.vertices / float(max(estimate.segments, 1))
+    return "v{}-s{}".format(int(math.log10(max(estimate.vertices, 1))), int(math.log10(max(per_segment, 1))))
+
+
+def processes_supported():
+    """True when worker processes can be started.
+
+    Forked workers always can.  Spawned ones run sys.executable, which is
+    the QGIS application rather than Python on Windows and macOS.
+    """
+    if multiprocessing.get_start_method() == 'fork':
+        return True
+    return os.path.basename(sys.executable).lower().startswith('python')
+
+
+def sample_features(densifier, features, seconds=SAMPLE_SECONDS):
+    """Take features until their predicted cost reaches *seconds*.
+
+    A feature too large for what is left is cut to a piece of about that
+    cost, so one huge polygon doesn't make the calibration slow.
+
+    :param features: Iterable of (fid, xy, offsets), as for
+        :meth:`Densifier.densify_all`.
+    :type features: iterable
+
+    :returns: The sample, as a list of (fid, xy, offsets), and its
+        predicted cost.
+    :rtype: (list, float)
+    """
+    sample = []
+    total = 0.0
+    for fid, xy, offsets in features:
+        xy = as_doubles(xy)
+        if offsets is None:
+            offsets = (0, len(xy) // 2)
+        costs = densifier.segment_costs(xy, offsets)
+        cost = sum(costs)
+        if total + cost > seconds:
+            piece = split_feature(0, offsets, costs, seconds - total)[0]
+            sample.append((fid, xy, piece.offsets))
+            total += piece.cost
+            break
+        sample.append((fid, xy, offsets))
+        total += cost
+    return sample, total
+
+
+def _time(densifier, sample, workers=1):
+    """ seconds to densify the sample through a Pipeline, as the plugin does """
+    if workers > 1:
+        joiner = Joiner(densifier)
+
+        def densify(item):
+            xy, piece = item
+            return (piece,) + densify_piece(densifier, xy, piece)
+
+        pipeline = Pipeline(lambda: split_stream(densifier, sample), densify,
+                            lambda result: joiner.add(*result), workers)
+    else:
+        pipeline = Pipeline(lambda: sample, lambda item: densifier.densify_array(item[1], item[2], item[0]),
+                            lambda result: None)
+    started = time.time()
+    pipeline.run()
+    return time.time() - started
+
+
+def _time_processes(densifier, sample, workers, batch_vertices):
+    # imported here since the process pool isn't needed otherwise
+    from .processes import densify_processes
+    started = time.time()
+    for _ in densify_processes(densifier, sample, workers, batch_vertices):
+        pass
+    return time.time() - started
+
+
+def autotune(densifier, features, run_seconds=None, backends=None, max_workers=None, seconds=SAMPLE_SECONDS,
+             processes=False):
+    """Choose the configuration of a run from a calibration on a sample.
+
+    Each backend densifies the sample once, then the fastest is timed with
+    the other chunk sizes.  Runs predicted to take more than
+    PARALLEL_SECONDS on one thread also try all the cores, on threads and,
+    if asked, on processes when they can be started, and the mode with the
+    shortest predicted run time is kept, pool start up included.  Threads
+    are timed with the GIL too, where overlapping reading and writing with
+    the geodesics may still win.  Tiny layers stay on one thread.
+
+    :param densifier: Method, spacing, caps and ellipsoid of the run.  It
+        is not modified; the trials run on copies with their own budgets.
+    :type densifier: engine.Densifier
+
+    :param features: Iterable of (fid, xy, offsets) from the input, as for
+        :meth:`Densifier.densify_all`.  Only a sample of about *seconds*
+        is used.
+    :type features: iterable
+
+    :param run_seconds: Predicted seconds of the whole run, from
+        :meth:`Densifier.estimate`, None to skip the parallel trials.
+    :type run_seconds: float
+
+    :param backends: Names of the backends to try, None for all the
+        available ones.
+    :type backends: list
+
+    :param max_workers: Largest number of workers, None for one per CPU.
+    :type max_workers: int
+
+    :param seconds: Predicted cost of the sample.
+    :type seconds: float
+
+    :param processes: True to also try a pool of processes.  Not for use
+        inside QGIS, whose process must not be forked.
+    :type processes: bool
+
+    :rtype: Tuning
+    """
+    started = time.time()
+    backend = densifier.backend
+    budget = densifier.budget
+
+    def trial_densifier(name, chunk_size):
+        trial = Densifier(make_backend(name, backend.a, backend.f), densifier.method, densifier.spacing,
+                          densifier.count, VertexBudget(budget.segment_waypoints, budget.feature_vertices,
+                                                        sys.maxsize))
+        trial.chunk_size = chunk_size
+        return trial
+
+    sample, cost = sample_features(densifier, features, seconds)
+    tuning = Tuning(backend.name, densifier.chunk_size)
+    tuning.sample_features = len(sample)
+    if not sample:
+        return tuning
+
+    # backends, at the default chunk size
+    best = None
+    for name in backends if backends is not None else available_backends():
+        trial = trial_densifier(name, densifier.chunk_size)
+        # the first feature again warms up caches and lazy imports
+        _time(trial, sample[:1])
+        elapsed = _time(trial, sample)
+        tuning.trials.append(("{} backend".format(name), elapsed))
+        if best is None or elapsed < best * MARGIN:
+            best = elapsed
+            tuning.backend = name
+    # chunk sizes, for the chosen backend
+    for chunk_size in CHUNK_SIZES:
+        elapsed = _time(trial_densifier(tuning.backend, chunk_size), sample)
+        tuning.trials.append(("chunks of {:,}".format(chunk_size), elapsed))
+        if elapsed < best * MARGIN:
+            best = elapsed
+            tuning.chunk_size = chunk_size
+
+    # workers, scaling the single thread time of the sample up to the run
+    workers = max_workers or os.cpu_count() or 1
+    if run_seconds is None or cost <= 0 or run_seconds * best / cost <= PARALLEL_SECONDS or workers <= 1:
+        tuning.calibration_seconds = time.time() - started
+        return tuning
+    run_seconds *= best / cost
+    predicted = run_seconds
+    trial = trial_densifier(tuning.backend, tuning.chunk_size)
+    elapsed = _time(trial, sample, workers)
+    tuning.trials.append(("{} threads".format(workers), elapsed))
+    if run_seconds * elapsed / best < predicted * MARGIN:
+        predicted = run_seconds * elapsed / best
+        tuning.workers = workers
+    if processes and processes_supported():
+        vertices = sum(offsets[-1] - offsets[0] for _, _, offsets in sample)
+        # a pool densifying one feature is almost all start up
+        startup = _time_processes(trial, sample[:1], workers, 1)
+        # repeat the sample until the work outweighs the start up, with at
+        # least two batches per process so they all get work
+        repeats = min(max(int(math.ceil(4 * startup / best)), 1), 20)
+        elapsed = _time_processes(trial, sample * repeats, workers,
+                                  max(repeats * vertices // (2 * workers), 1))
+        tuning.trials.append(("{} processes, sample x{}, start up {:.3f} s".format(
+            workers, repeats, startup), elapsed))
+        speedup = repeats * best / max(elapsed - startup, 1e-6)
+        if startup + run_seconds / speedup < predicted * MARGIN:
+            tuning.processes = True
+            tuning.workers = workers
+            tuning.batch_vertices = max(int(BATCH_SECONDS * vertices / best), 1024)
+    tuning.calibration_seconds = time.time() - started
+    return tuning
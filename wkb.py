@@ -0,0 +1,226 @@
+# -*- coding: utf-8 -*-
+"""
+/***************************************************************************
+ GeodesicDensifier
+                                 A QGIS plugin
+ Adds vertices to geometry along geodesic lines
+                              -------------------
+        copyright            : (C) 2018 by Jonah Sullivan
+        email                : jonah.sullivan@ga.gov.au
+ ***************************************************************************/
+
+/***************************************************************************
+ *                                                                         *
+ *   This program is free software; you can redistribute it and/or modify  *
+ *   it under the terms of the Apache 2.0 License.                         *
+ *                                                                         *
+ ***************************************************************************/
+
+ Well-known binary geometries to and from the flat coordinate buffers of
+ the engine, without a Python object per vertex.
+"""
+from array import array
+import struct
+import sys
+
+# flat geometry types of the WKB specification
+POINT = 1
+LINESTRING = 2
+POLYGON = 3
+MULTIPOINT = 4
+MULTILINESTRING = 5
+MULTIPOLYGON = 6
+
+# flags of the extended (PostGIS) WKB types
+_EWKB_Z = 0x80000000
+_EWKB_M = 0x40000000
+_EWKB_SRID = 0x20000000
+
+_LITTLE_ENDIAN = sys.byteorder == 'little'
+
+
+class _Reader:
+    """ position in a WKB buffer, reading in the byte order of the current geometry """
+
+    def __init__(self, data):
+        self.data = memoryview(data).cast('B')
+        self.pos = 0
+        self.little = True
+
+    def header(self):
+        """ read a byte order and type, return the flat type and the number of values per vertex """
+        self.little = self.data[self.pos] == 1
+        self.pos += 1
+        code = self.uint32()
+        dims = 2
+        if code & (_EWKB_Z | _EWKB_M | _EWKB_SRID):
+            dims += bool(code & _EWKB_Z) + bool(code & _EWKB_M)
+            if code & _EWKB_SRID:
+                self.pos += 4
+            code &= 0xffff
+        else:
+            # ISO types: 1000 for Z, 2000 for M and 3000 for both
+            dims += (0, 1, 1, 2)[code // 1000 % 4]
+            code %= 1000
+        return code, dims
+
+    def uint32(self):
+        value, = struct.unpack_from('<I' if self.little else '>I', self.data, self.pos)
+        self.pos += 4
+        return value
+
+    def vertices(self, xy, count, dims):
+        """ append count vertices of dims values to xy, keeping x and y """
+        size = 8 * count * dims
+        if self.pos + size > len(self.data):
+            raise ValueError("truncated WKB")
+        values = array('d')
+        values.frombytes(self.data[self.pos:self.pos + size])
+        self.pos += size
+        if self.little != _LITTLE_ENDIAN:
+            values.byteswap()
+        if dims == 2:
+            xy.extend(values)
+        else:
+            start = len(xy)
+            xy.extend(values[:2 * count])
+            xy[start::2] = values[0::dims]
+            xy[start + 1::2] = values[1::dims]
+
+
+def read_wkb(data):
+    """Read a WKB geometry into flat coordinate buffers.
+
+    Only x and y are kept.  Points, lines and polygons and their multi
+    types are supported, in ISO or extended WKB.
+
+    :param data: The WKB, e.g. ``bytes(geometry.asWkb())``.
+    :type data: buffer
+
+    :returns: The flat geometry type, the interleaved x, y values, the
+        offsets of the parts (the points, lines or rings, ring after ring
+        for polygons) as taken by :meth:`Densifier.densify_array`, and for
+        polygon types the index of the first ring of each polygon followed
+        by the number of rings, None otherwise.
+    :rtype: (int, array('d'), array('q'), array('q'))
+
+    :raises ValueError: If the geometry is empty, truncated or of another
+        type.
+    """
+    reader = _Reader(data)
+    if not len(reader.data):
+        raise ValueError("empty WKB")
+    try:
+        geometry_type, dims = reader.header()
+        xy = array('d')
+        offsets = array('q', [0])
+        polygons = None
+        if geometry_type == POINT:
+            reader.vertices(xy, 1, dims)
+            offsets.append(1)
+        elif geometry_type == LINESTRING:
+            reader.vertices(xy, reader.uint32(), dims)
+            offsets.append(len(xy) // 2)
+        elif geometry_type == POLYGON:
+            polygons = array('q', [0])
+            _read_rings(reader, xy, offsets, dims)
+            polygons.append(len(offsets) - 1)
+        elif geometry_type in (MULTIPOINT, MULTILINESTRING, MULTIPOLYGON):
+            if geometry_type == MULTIPOLYGON:
+                polygons = array('q', [0])
+            for _ in range(reader.uint32()):
+                member_type, dims = reader.header()
+                if member_type != geometry_type - 3:
+                    raise ValueError("unsupported WKB member type {}".format(member_type))
+                if member_type == POINT:
+                    reader.vertices(xy, 1, dims)
+                    offsets.append(len(xy) // 2)
+                elif member_type == LINESTRING:
+                    reader.vertices(xy, reader.uint32(), dims)
+                    offsets.append(len(xy) // 2)
+                else:
+                    _read_rings(reader, xy, offsets, dims)
+                    polygons.append(len(offsets) - 1)
+        else:
+            raise ValueError("unsupported WKB geometry type {}".format(geometry_type))
+    except struct.error:
+        raise ValueError("truncated WKB")
+    return geometry_type, xy, offsets, polygons
+
+
+def _read_rings(reader, xy, offsets, dims):
+    for _ in range(reader.uint32()):
+        reader.vertices(xy, reader.uint32(), dims)
+        offsets.append(len(xy) // 2)
+
+
+def write_wkb(geometry_type, xy, offsets, polygons=None):
+    """Write flat coordinate buffers as a little endian 2D WKB geometry.
+
+    The coordinates of each part are copied into the WKB in one slice, so
+    no Python object is created per vertex.
+
+    :param geometry_type: Flat geometry type, as returned by
+        :func:`read_wkb`.
+    :type geometry_type: int
+
+    :param xy: Interleaved x, y values.
+    :type xy: array('d')
+
+    :param offsets: Part offsets, as returned by
+        :meth:`Densifier.densify_array`.
+    :type offsets: sequence of int
+
+    :param polygons: For polygon types, the ring ranges of each polygon as
+        returned by :func:`read_wkb`.
+    :type polygons: sequence of int
+
+    :returns: The WKB, e.g. for ``QgsGeometry.fromWkb``.
+    :rtype: bytes
+
+    :raises ValueError: If the geometry type is not supported.
+    """
+    if _LITTLE_ENDIAN:
+        data = memoryview(xy).cast('B')
+    else:
+        data = array('d', xy)
+        data.byteswap()
+        data = memoryview(data).cast('B')
+    out = bytearray()
+
+    def vertices(p):
+        start, end = offsets[p], offsets[p + 1]
+        out.extend(data[16 * start:16 * end])
+
+    def rings(first, last):
+        out.extend(struct.pack('<BII', 1, POLYGON, last - first))
+        for p in range(first, last):
+            out.extend(struct.pack('<I', offsets[p + 1] - offsets[p]))
+            vertices(p)
+
+    parts = len(offsets) - 1
+    if geometry_type == POINT:
+        out.extend(struct.pack('<BI', 1, POINT))
+        vertices(0)
+    elif geometry_type == LINESTRING:
+        out.extend(struct.pack('<BII', 1, LINESTRING, offsets[1] - offsets[0]))
+        vertices(0)
+    elif geometry_type == POLYGON:
+        rings(0, parts)
+    elif geometry_type == MULTIPOINT:
+        out.extend(struct.pack('<BII', 1, MULTIPOINT, parts))
+        for p in range(parts):
+            out.extend(struct.pack('<BI', 1, POINT))
+            vertices(p)
+    elif geometry_type == MULTILINESTRING:
+        out.extend(struct.pack('<BII', 1, MULTILINESTRING, parts))
+        for p in range(parts):
+            out.extend(struct.pack('<BII', 1, LINESTRING, offsets[p + 1] - offsets[p]))
+            vertices(p)
+    elif geometry_type == MULTIPOLYGON:
+        out.extend(struct.pack('<BII', 1, MULTIPOLYGON, len(polygons) - 1))
+        for k in range(len(polygons) - 1):
+            rings(polygons[k], polygons[k + 1])
+    else:
+        raise ValueError("unsupported WKB geometry type {}".format(geometry_type))
+    return bytes(out)